@@ -0,0 +1,31 @@
+"""
+回合循环基准测试
+按场景（NPC数、规则数、历史事件数）测量回合各阶段的耗时和内存，
+并与保存的基线对比
+
+用法: python -m benchmarks --scenario medium --baseline benchmarks/baselines/medium.json
+"""
+from .runner import (
+    PHASES,
+    PhaseResult,
+    Regression,
+    compare,
+    load_results,
+    run_suite,
+    save_results,
+)
+from .scenarios import SCENARIOS, Scenario, ScenarioLLMClient, build_game_manager
+
+__all__ = [
+    "PHASES",
+    "PhaseResult",
+    "Regression",
+    "SCENARIOS",
+    "Scenario",
+    "ScenarioLLMClient",
+    "build_game_manager",
+    "compare",
+    "load_results",
+    "run_suite",
+    "save_results",
+]
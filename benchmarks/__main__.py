@@ -0,0 +1,96 @@
+"""
+基准测试命令行入口
+
+用法:
+    python -m benchmarks --scenario medium --output results.json
+    python -m benchmarks --scenario medium --baseline benchmarks/baselines/medium.json
+    python -m benchmarks --scenario medium --baseline benchmarks/baselines/medium.json --update-baseline
+    python -m benchmarks --npcs 100 --rules 500 --events 50000 --phase rules.check_all_rules
+
+存在超过阈值的回退时以退出码 1 结束，可直接用于CI。
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+from .runner import PHASES, compare, load_results, run_suite, save_results
+from .scenarios import SCENARIOS, Scenario
+
+
+def _build_scenario(args: argparse.Namespace) -> Scenario:
+    preset = SCENARIOS[args.scenario]
+    if args.npcs is None and args.rules is None and args.events is None:
+        return preset
+    return Scenario(
+        name="custom",
+        npcs=preset.npcs if args.npcs is None else args.npcs,
+        rules=preset.rules if args.rules is None else args.rules,
+        events=preset.events if args.events is None else args.events,
+        seed=args.seed,
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="RuleK 回合循环基准测试")
+    parser.add_argument(
+        "--scenario", choices=sorted(SCENARIOS), default="small", help="预设场景"
+    )
+    parser.add_argument("--npcs", type=int, default=None, help="覆盖NPC数量")
+    parser.add_argument("--rules", type=int, default=None, help="覆盖规则数量")
+    parser.add_argument("--events", type=int, default=None, help="覆盖历史事件数量")
+    parser.add_argument("--seed", type=int, default=0, help="自定义场景的随机种子")
+    parser.add_argument(
+        "--phase", action="append", choices=sorted(PHASES), help="只运行指定阶段，可重复"
+    )
+    parser.add_argument("--repeat", type=int, default=20, help="每个阶段的计时次数")
+    parser.add_argument("--output", type=Path, default=None, help="结果JSON输出路径")
+    parser.add_argument("--baseline", type=Path, default=None, help="基线JSON路径")
+    parser.add_argument(
+        "--update-baseline", action="store_true", help="用本次结果覆盖基线"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=0.25, help="允许的相对增幅（0.25 即 25%%）"
+    )
+    args = parser.parse_args()
+
+    scenario = _build_scenario(args)
+    with tempfile.TemporaryDirectory(prefix="rulek_bench_") as workdir:
+        results = run_suite(scenario, Path(workdir), repeat=args.repeat, phases=args.phase)
+
+    print(
+        f"场景 {scenario.name}: {scenario.npcs} NPC, {scenario.rules} 规则, "
+        f"{scenario.events} 历史事件"
+    )
+    print(f"{'阶段':<24}{'中位数(ms)':>12}{'最小(ms)':>12}{'峰值内存(KB)':>14}")
+    for phase, result in results["phases"].items():
+        print(
+            f"{phase:<24}{result['median_ms']:>12.3f}"
+            f"{result['min_ms']:>12.3f}{result['peak_kb']:>14.1f}"
+        )
+
+    if args.output:
+        save_results(results, args.output)
+        print(f"结果已保存: {args.output}")
+
+    if args.baseline is None:
+        return 0
+
+    if args.update_baseline or not args.baseline.exists():
+        save_results(results, args.baseline)
+        print(f"基线已更新: {args.baseline}")
+        return 0
+
+    regressions = compare(results, load_results(args.baseline), args.threshold)
+    if not regressions:
+        print(f"与基线相比没有超过 {args.threshold:.0%} 的回退")
+        return 0
+
+    print(f"发现 {len(regressions)} 项性能回退:")
+    for regression in regressions:
+        print(f"  {regression}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
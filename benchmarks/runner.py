@@ -0,0 +1,289 @@
+"""
+回合循环基准运行器
+分阶段测量耗时和内存峰值，结果保存为JSON，并与基线对比发现性能回退
+"""
+import asyncio
+import inspect
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+from src.ai.turn_pipeline import AITurnPipeline
+from src.core.rule_executor import RuleContext, RuleExecutor
+from src.managers.save_manager import SaveManager
+from src.sim.simulator import quiet_simulation
+
+from .scenarios import (
+    RULE_ACTIONS,
+    Scenario,
+    ScenarioLLMClient,
+    build_game_manager,
+    make_events,
+    make_rules,
+)
+
+# 被测函数：同步函数或返回协程的函数
+BenchFn = Callable[[], Union[None, Any, Awaitable[Any]]]
+
+# 阶段名称 -> 准备函数（接收场景和工作目录，返回被测函数）
+PhaseSetup = Callable[[Scenario, Path, asyncio.AbstractEventLoop], BenchFn]
+
+
+@dataclass
+class PhaseResult:
+    """单个阶段的测量结果"""
+
+    phase: str
+    repeat: int
+    mean_ms: float
+    median_ms: float
+    min_ms: float
+    max_ms: float
+    peak_kb: float
+
+
+@dataclass
+class Regression:
+    """相对基线的性能回退"""
+
+    phase: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline else float("inf")
+
+    def __str__(self) -> str:
+        return (
+            f"{self.phase} {self.metric}: {self.baseline:.3f} -> {self.current:.3f} "
+            f"(+{(self.ratio - 1) * 100:.1f}%)"
+        )
+
+
+# ========== 各阶段准备函数 ==========
+
+
+def _setup_check_all_rules(
+    scenario: Scenario, workdir: Path, loop: asyncio.AbstractEventLoop
+) -> BenchFn:
+    """每个存活NPC各做一次动作，逐个执行 check_all_rules"""
+    gm = build_game_manager(scenario, str(workdir))
+    executor = RuleExecutor(gm)
+    assert gm.state is not None
+    state = gm.state.view()
+    contexts = [
+        RuleContext(npc, RULE_ACTIONS[i % len(RULE_ACTIONS)], state)
+        for i, npc in enumerate(gm.get_alive_npcs())
+    ]
+
+    def run() -> None:
+        for context in contexts:
+            executor.check_all_rules(context)
+
+    return run
+
+
+def _setup_run_turn_ai(
+    scenario: Scenario, workdir: Path, loop: asyncio.AbstractEventLoop
+) -> BenchFn:
+    gm = build_game_manager(scenario, str(workdir))
+    pipeline = AITurnPipeline(gm, ScenarioLLMClient(scenario.seed))
+    return pipeline.run_turn_ai
+
+
+def _setup_advance_turn(
+    scenario: Scenario, workdir: Path, loop: asyncio.AbstractEventLoop
+) -> BenchFn:
+    # Web服务依赖较重，仅在需要时导入
+    from web.backend.services.game_service import GameService
+
+    service = GameService(
+        game_id=f"bench_{scenario.name}", npc_count=scenario.npcs, seed=scenario.seed
+    )
+    loop.run_until_complete(
+        service.initialize(llm_client=ScenarioLLMClient(scenario.seed))
+    )
+    service.game_state_manager.echo_log = False
+    service.game_state.fear_points = 100000
+    for rule in make_rules(scenario):
+        service.rule_manager.add_rule(rule)
+    names = [npc.get("name", "") for npc in service.game_state.npcs.values()]
+    service.game_state.events_history = make_events(scenario, names)
+    return service.advance_turn
+
+
+def _setup_save_game(
+    scenario: Scenario, workdir: Path, loop: asyncio.AbstractEventLoop
+) -> BenchFn:
+    gm = build_game_manager(scenario, str(workdir))
+
+    def run() -> None:
+        gm.save_game("bench_save")
+
+    return run
+
+
+def _setup_load_game(
+    scenario: Scenario, workdir: Path, loop: asyncio.AbstractEventLoop
+) -> BenchFn:
+    gm = build_game_manager(scenario, str(workdir))
+    save_manager = SaveManager(str(workdir))
+    filename = save_manager.save_game(gm, "bench_load")
+
+    def run() -> None:
+        save_manager.load_game(filename)
+
+    return run
+
+
+PHASES: Dict[str, PhaseSetup] = {
+    "rules.check_all_rules": _setup_check_all_rules,
+    "pipeline.run_turn_ai": _setup_run_turn_ai,
+    "service.advance_turn": _setup_advance_turn,
+    "state.save_game": _setup_save_game,
+    "saves.load_game": _setup_load_game,
+}
+
+
+# ========== 测量 ==========
+
+
+def _call(fn: BenchFn, loop: asyncio.AbstractEventLoop) -> None:
+    result = fn()
+    if inspect.isawaitable(result):
+        loop.run_until_complete(result)
+
+
+def measure(
+    phase: str,
+    fn: BenchFn,
+    loop: asyncio.AbstractEventLoop,
+    repeat: int = 20,
+    warmup: int = 2,
+) -> PhaseResult:
+    """测量被测函数的耗时分布和内存峰值
+
+    内存在单独的一次调用中用 tracemalloc 统计，避免追踪开销污染计时。
+    """
+    for _ in range(warmup):
+        _call(fn, loop)
+
+    samples: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _call(fn, loop)
+        samples.append((time.perf_counter() - start) * 1000)
+
+    tracemalloc.start()
+    try:
+        _call(fn, loop)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return PhaseResult(
+        phase=phase,
+        repeat=repeat,
+        mean_ms=statistics.fmean(samples),
+        median_ms=statistics.median(samples),
+        min_ms=min(samples),
+        max_ms=max(samples),
+        peak_kb=peak / 1024,
+    )
+
+
+def run_suite(
+    scenario: Scenario,
+    workdir: Path,
+    repeat: int = 20,
+    phases: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """在给定场景上运行全部（或指定）阶段的基准
+
+    Args:
+        scenario: 基准场景
+        workdir: 存档等临时文件的目录
+        repeat: 每个阶段的计时次数
+        phases: 只运行这些阶段，默认全部
+
+    Returns:
+        Dict: 可直接写入JSON的结果
+    """
+    selected = phases or list(PHASES)
+    unknown = [name for name in selected if name not in PHASES]
+    if unknown:
+        raise ValueError(f"未知的基准阶段: {', '.join(unknown)}")
+
+    workdir.mkdir(parents=True, exist_ok=True)
+    results: Dict[str, Any] = {}
+    loop = asyncio.new_event_loop()
+    try:
+        with quiet_simulation():
+            for name in selected:
+                fn = PHASES[name](scenario, workdir, loop)
+                results[name] = asdict(measure(name, fn, loop, repeat=repeat))
+    finally:
+        loop.close()
+
+    return {
+        "scenario": scenario.to_dict(),
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "phases": results,
+    }
+
+
+# ========== 结果存取与对比 ==========
+
+
+def save_results(results: Dict[str, Any], path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def load_results(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    threshold: float = 0.25,
+    metrics: tuple = ("median_ms", "peak_kb"),
+) -> List[Regression]:
+    """对比当前结果和基线，返回超过阈值的回退
+
+    Args:
+        current: 本次结果
+        baseline: 基线结果
+        threshold: 允许的相对增幅，0.25 表示超过基线 25% 视为回退
+        metrics: 参与对比的指标
+
+    Returns:
+        List[Regression]: 回退列表，为空表示没有回退
+    """
+    if current.get("scenario") != baseline.get("scenario"):
+        raise ValueError("基线和本次结果的场景参数不一致，无法对比")
+
+    regressions = []
+    baseline_phases = baseline.get("phases", {})
+    for phase, result in current.get("phases", {}).items():
+        base = baseline_phases.get(phase)
+        if base is None:
+            continue
+        for metric in metrics:
+            before, after = base.get(metric), result.get(metric)
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold):
+                regressions.append(Regression(phase, metric, before, after))
+    return regressions
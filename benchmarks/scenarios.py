@@ -0,0 +1,180 @@
+"""
+基准测试场景生成
+按 NPC 数量、规则数量和历史事件数量构造可复现的游戏状态，
+供各阶段基准共享
+"""
+import random
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List
+
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.api.schemas import DialogueTurn, PlannedAction, TurnPlan
+from src.core.game_state import GameStateManager
+from src.models.event import EventType
+from src.models.npc import generate_random_npc
+from src.models.rule import EffectType, Rule, RuleEffect, TriggerCondition
+
+# 规则触发动作，取自 NPCBehavior 的行动集合
+RULE_ACTIONS = (
+    "look_mirror",
+    "turn_around",
+    "open_door",
+    "investigate",
+    "search",
+    "talk",
+    "move",
+    "hide",
+)
+
+LOCATIONS = ("living_room", "kitchen", "bedroom", "bathroom", "corridor", "basement")
+
+# AI计划中使用的行动，需满足 PlannedAction 的取值范围
+PLANNED_ACTIONS = ("search", "investigate", "talk", "hide", "wait", "move")
+
+
+@dataclass
+class Scenario:
+    """基准场景参数
+
+    Attributes:
+        name: 场景名称，作为基线对比的键
+        npcs: NPC 数量
+        rules: 规则数量
+        events: 预置的历史事件数量
+        seed: 随机种子，保证每次生成的场景一致
+    """
+
+    name: str
+    npcs: int
+    rules: int
+    events: int
+    seed: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "small": Scenario("small", npcs=4, rules=5, events=100),
+    "medium": Scenario("medium", npcs=12, rules=40, events=2000),
+    "large": Scenario("large", npcs=40, rules=200, events=20000),
+}
+
+
+def make_rules(scenario: Scenario) -> List[Rule]:
+    """生成规则，效果只加恐惧，避免NPC死亡改变后续回合的开销"""
+    rng = random.Random(scenario.seed)
+    rules = []
+    for i in range(scenario.rules):
+        location = None
+        if rng.random() < 0.5:
+            location = rng.sample(LOCATIONS, rng.randint(1, 3))
+        rules.append(
+            Rule(
+                id=f"bench_rule_{i}",
+                name=f"基准规则{i}",
+                trigger=TriggerCondition(
+                    action=RULE_ACTIONS[i % len(RULE_ACTIONS)],
+                    location=location,
+                    probability=rng.choice((0.1, 0.3, 0.5)),
+                ),
+                effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=5),
+                base_cost=10,
+            )
+        )
+    return rules
+
+
+def make_npcs(scenario: Scenario) -> List[Dict[str, Any]]:
+    """生成NPC字典（与无界面模拟器相同的扁平格式）"""
+    rng = random.Random(scenario.seed)
+    npcs = []
+    for i in range(scenario.npcs):
+        npc = generate_random_npc(rng=rng).to_dict()
+        npc.update(npc.pop("personality"))
+        npc["id"] = f"npc_{i + 1}"
+        npc["name"] = f"{npc['name']}{i + 1}"
+        npc["status"] = npc["status"].value
+        npc["location"] = LOCATIONS[i % len(LOCATIONS)]
+        npcs.append(npc)
+    return npcs
+
+
+def make_events(scenario: Scenario, npc_names: List[str]) -> List[Dict[str, Any]]:
+    """生成历史事件，约三分之一为NPC之间的交谈（影响关系计算）"""
+    rng = random.Random(scenario.seed)
+    events = []
+    for i in range(scenario.events):
+        turn = i // max(1, scenario.npcs)
+        actor = rng.choice(npc_names) if npc_names else "未知"
+        if i % 3 == 0 and len(npc_names) > 1:
+            target = rng.choice([name for name in npc_names if name != actor])
+            events.append(
+                {
+                    "type": EventType.NPC_ACTION.value,
+                    "turn": turn,
+                    "description": f"{actor}和{target}交谈",
+                    "meta": {"action": "talk", "actor": actor, "target": target},
+                }
+            )
+        else:
+            events.append(
+                {
+                    "type": EventType.NPC_ACTION.value,
+                    "turn": turn,
+                    "description": f"{actor}四处查看",
+                    "meta": {"action": rng.choice(RULE_ACTIONS), "actor": actor},
+                }
+            )
+    return events
+
+
+def build_game_manager(scenario: Scenario, save_dir: str) -> GameStateManager:
+    """构造包含场景中全部NPC、规则和历史事件的游戏状态管理器"""
+    gm = GameStateManager(
+        save_dir=save_dir, config={"seed": scenario.seed, "echo_log": False}
+    )
+    gm.new_game(f"bench_{scenario.name}", {"initial_fear_points": 100000})
+    npcs = make_npcs(scenario)
+    for npc in npcs:
+        gm.add_npc(npc)
+    for rule in make_rules(scenario):
+        gm.add_rule(rule)
+    assert gm.state is not None
+    gm.state.events_history = make_events(scenario, [npc["name"] for npc in npcs])
+    return gm
+
+
+class ScenarioLLMClient(MockDeepSeekClient):
+    """为每个NPC都安排行动的模拟客户端，使行动阶段的开销随NPC数量增长"""
+
+    def __init__(self, seed: int = 0):
+        self.rng = random.Random(seed)
+
+    async def generate_turn_plan(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        available_places: List[str],
+        time_of_day: str,
+        min_dialogue: int = 1,
+    ) -> TurnPlan:
+        dialogue = [
+            DialogueTurn(speaker=npc["name"], text="这里好像有什么东西")
+            for npc in npc_states[: max(1, min_dialogue)]
+        ]
+        names = [npc["name"] for npc in npc_states]
+        actions = []
+        for npc in npc_states:
+            action = self.rng.choice(PLANNED_ACTIONS)
+            target = None
+            if action == "move":
+                target = self.rng.choice(available_places)
+            elif action == "talk":
+                others = [name for name in names if name != npc["name"]]
+                if not others:
+                    action = "wait"
+                else:
+                    target = self.rng.choice(others)
+            actions.append(PlannedAction(npc=npc["name"], action=action, target=target))
+        return TurnPlan(dialogue=dialogue, actions=actions, atmosphere="tense")
@@ -0,0 +1,66 @@
+"""
+规则时间范围检查微基准
+对比旧的 strptime 实现与预解析的分钟窗口
+
+用法: python scripts/dev/bench_time_range.py
+"""
+import re
+import sys
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.models.rule import parse_time_window, time_in_window  # noqa: E402
+
+TIME_RANGE = {"from": "23:00", "to": "02:00"}
+SAMPLES = ["22:59", "23:30", "00:30", "02:00", "12:00"]
+
+
+def legacy_check(current_time: str, time_range: Dict[str, str]) -> bool:
+    """旧版 RuleExecutor._check_time_range 的实现"""
+    try:
+        start_time = time_range.get("from", "")
+        end_time = time_range.get("to", "")
+        pattern = re.compile(r"^\d{2}:\d{2}$")
+        for t in (current_time, start_time, end_time):
+            if not pattern.match(t):
+                return False
+        current = datetime.strptime(current_time, "%H:%M")
+        start = datetime.strptime(start_time, "%H:%M")
+        end = datetime.strptime(end_time, "%H:%M")
+        today = datetime.now().date()
+        current = current.replace(year=today.year, month=today.month, day=today.day)
+        start = start.replace(year=today.year, month=today.month, day=today.day)
+        end = end.replace(year=today.year, month=today.month, day=today.day)
+        if start > end:
+            if current >= start:
+                return True
+            return current + timedelta(days=1) <= end + timedelta(days=1)
+        return start <= current <= end
+    except ValueError:
+        return False
+
+
+def main(number: int = 20000) -> None:
+    window = parse_time_window(TIME_RANGE)
+    assert window is not None
+    for sample in SAMPLES:
+        assert legacy_check(sample, TIME_RANGE) == time_in_window(sample, window)
+
+    legacy = timeit.timeit(
+        lambda: [legacy_check(s, TIME_RANGE) for s in SAMPLES], number=number
+    )
+    fast = timeit.timeit(
+        lambda: [time_in_window(s, window) for s in SAMPLES], number=number
+    )
+    calls = number * len(SAMPLES)
+    print(f"strptime 实现:  {legacy / calls * 1e6:.3f} µs/次")
+    print(f"分钟窗口实现:   {fast / calls * 1e6:.3f} µs/次")
+    print(f"加速比:         {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
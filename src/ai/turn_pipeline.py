@@ -5,7 +5,7 @@ AI 驱动的回合管线
 import logging
 import random
 from types import SimpleNamespace
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from src.api.deepseek_client import DeepSeekClient
 from src.api.llm_client import LLMClient
@@ -23,7 +23,7 @@ from src.api.prompts import (
     create_mock_rule_eval,
 )
 from src.core.dialogue_system import DialogueSystem
-from src.core.rule_executor import RuleContext
+from src.core.llm_fanout import LLMTaskGraph
 from src.models.event import Event, EventType
 
 if TYPE_CHECKING:
@@ -31,6 +31,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger("deepseek.pipeline")
 
+# 流式输出回调：收到一段对话或叙事增量时调用
+StreamCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
 
 class AITurnPipeline:
     """AI回合处理管线"""
@@ -48,15 +51,22 @@ class AITurnPipeline:
         """
         self.game_mgr = game_mgr
         self.ds_client = ds_client or DeepSeekClient()
+        self.rng = game_mgr.rng  # 游戏会话的随机数服务
         self.last_plan: Optional[TurnPlan] = None
         self.narrative_cache: Dict[int, str] = {}  # 回合->叙事的缓存
+        # 本回合预先并发生成的交谈对话：id(行动) -> 对话
+        self._prefetched_dialogue: Dict[int, List[Dict[str, Any]]] = {}
 
-    async def run_turn_ai(self, force_dialogue: bool = True) -> TurnPlan:
+    async def run_turn_ai(
+        self, force_dialogue: bool = True, on_dialogue: Optional[StreamCallback] = None
+    ) -> TurnPlan:
         """
         执行AI驱动的回合
 
         Args:
             force_dialogue: 是否强制生成对话（即使NPC数量不足）
+            on_dialogue: 对话增量回调；提供时以流式请求生成计划，
+                每收到一段对话文本就调用一次
 
         Returns:
             TurnPlan: 回合计划（对话+行动）
@@ -81,13 +91,24 @@ class AITurnPipeline:
 
             # 5. 调用AI生成计划
             logger.info("🤖 AI正在生成回合计划...")
-            plan = await self.ds_client.generate_turn_plan(
+            request = dict(
                 npc_states=npc_states,
                 scene_context=scene_context,
                 available_places=available_places,
                 time_of_day=state.time_of_day,
                 min_dialogue=2 if len(npc_states) >= 2 else 0,
             )
+            if on_dialogue is not None and hasattr(self.ds_client, "stream_turn_plan"):
+                plan = None
+                async for event in self.ds_client.stream_turn_plan(**request):
+                    if event["type"] == "plan":
+                        plan = event["plan"]
+                    else:
+                        await on_dialogue(event)
+                if plan is None:
+                    raise RuntimeError("流式回合计划没有返回完整计划")
+            else:
+                plan = await self.ds_client.generate_turn_plan(**request)
 
             # 6. 验证计划合法性
             issues = validate_turn_plan(plan)
@@ -114,12 +135,16 @@ class AITurnPipeline:
             mock_plan_data = create_mock_turn_plan()
             return TurnPlan.model_validate(mock_plan_data)
 
-    async def generate_turn_narrative(self, include_hidden_events: bool = False) -> str:
+    async def generate_turn_narrative(
+        self, include_hidden_events: bool = False, on_delta: Optional[StreamCallback] = None
+    ) -> str:
         """
         生成回合叙事
 
         Args:
             include_hidden_events: 是否包含隐藏事件
+            on_delta: 叙事增量回调；提供时以流式请求生成，
+                参数为 ``{"delta": 新增文本}``
 
         Returns:
             str: 叙事文本
@@ -156,13 +181,21 @@ class AITurnPipeline:
             logger.info("📖 AI正在生成叙事...")
             survivor_count = len(self.game_mgr.get_alive_npcs())
 
-            narrative = await self.ds_client.generate_narrative_text(
+            request = dict(
                 events=event_descriptions,
                 time_of_day=state.time_of_day,
                 survivor_count=survivor_count,
                 ambient_fear=self._calculate_ambient_fear(),
                 min_len=200,
             )
+            if on_delta is not None and hasattr(self.ds_client, "stream_narrative_text"):
+                parts = []
+                async for delta in self.ds_client.stream_narrative_text(**request):
+                    parts.append(delta)
+                    await on_delta({"delta": delta})
+                narrative = "".join(parts)
+            else:
+                narrative = await self.ds_client.generate_narrative_text(**request)
 
             # 缓存结果
             self.narrative_cache[current_turn] = narrative
@@ -258,7 +291,7 @@ class AITurnPipeline:
 
         # 获取最近事件描述
         recent_events = []
-        for event in state.events_history[-5:]:
+        for event in state.events_history.recent(5):
             if hasattr(event, "to_dict"):
                 event_dict = event.to_dict()
                 desc = event_dict.get("description", "")
@@ -349,19 +382,72 @@ class AITurnPipeline:
             self.game_mgr.log(f"{emoji} {turn.speaker}: {turn.text}")
 
     async def _process_actions(self, actions: List[PlannedAction]):
-        """处理并执行NPC行动"""
+        """处理并执行NPC行动
+
+        交谈行动的对话先并发生成，再按计划顺序逐个执行行动，
+        事件顺序与逐个生成时一致。行动按轮次批量判定规则：一轮内
+        每个NPC至多一个行动，某个NPC的下一个行动开始前先结算本轮
+        触发的规则，因此被规则杀死或击昏的NPC不会继续行动，后面的
+        行动也能看到之前规则的效果。
+        """
+        wave: List[Tuple[PlannedAction, Dict[str, Any]]] = []
+        self._prefetched_dialogue = await self._prefetch_talk_dialogue(actions)
         for action in actions:
+            if any(done.npc == action.npc for done, _ in wave):
+                await self._check_rule_triggers(wave)
+                wave = []
+
             # 验证行动合法性
             if not self._validate_action(action):
                 logger.warning(f"非法行动被阻止: {action.model_dump()}")
                 self._log_blocked_action(action)
                 continue
 
-            # 执行行动
-            await self._execute_action(action)
+            # 执行行动，记录行动完成时行动者的快照
+            snapshot = await self._execute_action(action)
+            if snapshot is not None:
+                wave.append((action, snapshot))
+
+        self._prefetched_dialogue = {}
+        await self._check_rule_triggers(wave)
+
+    async def _prefetch_talk_dialogue(
+        self, actions: List[PlannedAction]
+    ) -> Dict[int, List[Dict[str, Any]]]:
+        """并发生成本回合各交谈行动的对话
 
-            # 检查规则触发
-            await self._check_rule_triggers(action)
+        只预取双方在此之前没有其他行动的交谈（之前的行动可能改变
+        位置等上下文），其余交谈在执行时再生成。每个交谈按计划顺序
+        派生独立的随机数生成器，结果不受完成先后影响。
+        """
+        if self.game_mgr.state is None:
+            return {}
+        graph = LLMTaskGraph(getattr(self.game_mgr, "llm_semaphore", None))
+        talks: Dict[str, PlannedAction] = {}
+        acted: set = set()
+        for action in actions:
+            if (
+                action.action == "talk"
+                and action.target
+                and action.npc not in acted
+                and action.target not in acted
+                and self._validate_action(action)
+            ):
+                npc = self._find_npc_by_name(action.npc)
+                target_npc = self._find_npc_by_name(action.target)
+                if npc and target_npc:
+                    name = str(len(talks))
+                    talks[name] = action
+                    rng = self.rng.fork("dialogue")
+                    graph.add(
+                        name,
+                        lambda _results, npc=npc, target_npc=target_npc, rng=rng: (
+                            self._generate_talk_dialogue(npc, target_npc, rng)
+                        ),
+                    )
+            acted.add(action.npc)
+        results = await graph.run()
+        return {id(talks[name]): dialogue for name, dialogue in results.items()}
 
     def _validate_action(self, action: PlannedAction) -> bool:
         """验证行动是否合法"""
@@ -389,11 +475,15 @@ class AITurnPipeline:
 
         return True
 
-    async def _execute_action(self, action: PlannedAction):
-        """执行单个行动"""
+    async def _execute_action(self, action: PlannedAction) -> Optional[Dict[str, Any]]:
+        """执行单个行动
+
+        Returns:
+            行动完成时行动者的快照（供批量规则判定），NPC不存在时为 None
+        """
         npc = self._find_npc_by_name(action.npc)
         if not npc:
-            return
+            return None
 
         # 根据行动类型执行
         action_handlers = {
@@ -415,30 +505,24 @@ class AITurnPipeline:
         # 记录行动事件
         self._log_action_event(npc, action)
 
+        rule_executor = getattr(self.game_mgr, "rule_executor", None)
+        if rule_executor is None:
+            return dict(npc)
+        return rule_executor.snapshot_actor(npc)
+
     # ========== 行动处理器 ==========
 
     async def _handle_move(self, npc: Dict[str, Any], action: PlannedAction):
         """处理移动行动"""
         if self.game_mgr.state is None:
             raise RuntimeError("游戏状态未初始化")
-        prev_location = npc.get("location")
         target_id = self._resolve_area_id(action.target)
-        npc["location"] = target_id
 
-        # 更新游戏状态
-        self.game_mgr.update_npc(npc["id"], {"location": target_id})
+        # 更新游戏状态（区域的NPC列表由位置索引提供）
+        self.game_mgr.move_npc(npc["id"], target_id)
 
-        # 更新地图信息
         if hasattr(self.game_mgr, "map_manager"):
-            map_mgr = self.game_mgr.map_manager
-            if prev_location:
-                old_area = map_mgr.get_area(prev_location)
-                if old_area and npc["id"] in old_area.npcs:
-                    old_area.npcs.remove(npc["id"])
-            new_area = map_mgr.get_area(target_id)
-            if new_area and npc["id"] not in new_area.npcs:
-                new_area.npcs.append(npc["id"])
-            map_mgr.current_area = target_id
+            self.game_mgr.map_manager.current_area = target_id
 
         # 可能触发位置相关事件
         state: GameState = self.game_mgr.state
@@ -449,9 +533,9 @@ class AITurnPipeline:
     async def _handle_search(self, npc: Dict[str, Any], action: PlannedAction):
         """处理搜索行动"""
         # 随机决定是否找到物品
-        if random.random() < 0.3:
+        if self.rng.events.random() < 0.3:
             items = ["手电筒", "绳子", "钥匙", "笔记", "照片"]
-            found_item = random.choice(items)
+            found_item = self.rng.events.choice(items)
 
             # 添加到物品栏
             inventory = npc.get("inventory", [])
@@ -480,7 +564,27 @@ class AITurnPipeline:
         if not target_npc:
             raise NotImplementedError("目标NPC不存在")
 
-        dialogue_system = DialogueSystem(self.ds_client)
+        dialogue = self._prefetched_dialogue.pop(id(action), None)
+        if dialogue is None:
+            dialogue = await self._generate_talk_dialogue(npc, target_npc)
+
+        for turn in dialogue:
+            self._create_event(
+                EventType.NPC_DIALOGUE,
+                f"{turn['speaker']}: {turn['text']}",
+                {"speaker": turn["speaker"], "text": turn["text"]},
+            )
+
+    async def _generate_talk_dialogue(
+        self,
+        npc: Dict[str, Any],
+        target_npc: Dict[str, Any],
+        rng: Optional[random.Random] = None,
+    ) -> List[Dict[str, Any]]:
+        """生成两名NPC之间的交谈"""
+        if self.game_mgr.state is None:
+            raise RuntimeError("游戏状态未初始化")
+        dialogue_system = DialogueSystem(self.ds_client, rng=rng or self.rng.dialogue)
 
         participants = [
             SimpleNamespace(**npc),
@@ -491,15 +595,7 @@ class AITurnPipeline:
             "time": self.game_mgr.state.time_of_day,
             "participants": [npc["name"], target_npc["name"]],
         }
-
-        dialogue = await dialogue_system.generate_dialogue(participants, context)
-
-        for turn in dialogue:
-            self._create_event(
-                EventType.NPC_DIALOGUE,
-                f"{turn['speaker']}: {turn['text']}",
-                {"speaker": turn["speaker"], "text": turn["text"]},
-            )
+        return await dialogue_system.generate_dialogue(participants, context)
 
     async def _handle_use_item(self, npc: Dict[str, Any], action: PlannedAction):
         """处理使用物品行动"""
@@ -530,9 +626,9 @@ class AITurnPipeline:
     async def _handle_investigate(self, npc: Dict[str, Any], action: PlannedAction):
         """处理调查行动"""
         # 可能发现线索或触发事件
-        if random.random() < 0.4:
+        if self.rng.events.random() < 0.4:
             clues = ["血迹", "奇怪的符号", "日记残页", "划痕", "脚印"]
-            found_clue = random.choice(clues)
+            found_clue = self.rng.events.choice(clues)
 
             self._create_event(
                 EventType.CLUE_FOUND,
@@ -557,24 +653,14 @@ class AITurnPipeline:
         """处理逃跑行动"""
         # 快速移动但增加恐惧
         if action.target:
-            prev_location = npc.get("location")
             target_id = self._resolve_area_id(action.target)
-            npc["location"] = target_id
-            npc["fear"] = min(100, npc.get("fear", 0) + 20)
             self.game_mgr.update_npc(
-                npc["id"], {"location": npc["location"], "fear": npc["fear"]}
+                npc["id"],
+                {"location": target_id, "fear": min(100, npc.get("fear", 0) + 20)},
             )
 
             if hasattr(self.game_mgr, "map_manager"):
-                map_mgr = self.game_mgr.map_manager
-                if prev_location:
-                    old_area = map_mgr.get_area(prev_location)
-                    if old_area and npc["id"] in old_area.npcs:
-                        old_area.npcs.remove(npc["id"])
-                new_area = map_mgr.get_area(target_id)
-                if new_area and npc["id"] not in new_area.npcs:
-                    new_area.npcs.append(npc["id"])
-                map_mgr.current_area = target_id
+                self.game_mgr.map_manager.current_area = target_id
 
     async def _handle_custom(self, npc: Dict[str, Any], action: PlannedAction):
         """处理自定义行动"""
@@ -585,29 +671,46 @@ class AITurnPipeline:
             {"action": action.model_dump()},
         )
 
-    async def _check_rule_triggers(self, action: PlannedAction):
-        """检查行动是否触发规则"""
+    async def _check_rule_triggers(
+        self, actions: List[Tuple[PlannedAction, Dict[str, Any]]]
+    ):
+        """批量检查一轮行动是否触发规则
+
+        Args:
+            actions: (行动, 行动完成时行动者的快照) 列表，按快照判定条件
+        """
         if self.game_mgr.state is None:
             raise RuntimeError("游戏状态未初始化")
 
         rule_executor = getattr(self.game_mgr, "rule_executor", None)
-        if not rule_executor:
-            return
-
-        npc = self._find_npc_by_name(action.npc)
-        if not npc:
+        if not rule_executor or not actions:
             return
 
-        context = RuleContext(npc, action.action, self.game_mgr.state.to_dict())
-        triggered = rule_executor.check_all_rules(context)
-        for rule, probability in triggered:
-            if random.random() <= probability:
-                result = rule_executor.execute_rule(rule, context)
-                self._create_event(
-                    EventType.RULE_TRIGGER,
-                    f"规则触发: {rule.name}",
-                    {"rule_id": rule.id, "actor": npc.get("name"), "result": result},
-                )
+        pairs = []
+        snapshots = []
+        for action, snapshot in actions:
+            npc = self._find_npc_by_name(action.npc)
+            if npc:
+                pairs.append((npc, action.action))
+                snapshots.append(snapshot)
+
+        batch = rule_executor.check_rules_batch(pairs, snapshots=snapshots)
+        for row in range(len(batch)):
+            context = batch.context_for(row)
+            for rule, probability in batch.triggered_for(row):
+                if not rule_executor.can_fire(rule, context):
+                    continue
+                if rule_executor.rng.random() <= probability:
+                    result = rule_executor.execute_rule(rule, context)
+                    self._create_event(
+                        EventType.RULE_TRIGGER,
+                        f"规则触发: {rule.name}",
+                        {
+                            "rule_id": rule.id,
+                            "actor": context.actor_name,
+                            "result": result,
+                        },
+                    )
 
     async def _post_turn_processing(self):
         """回合后处理"""
@@ -625,67 +728,27 @@ class AITurnPipeline:
 
     def _find_npc_by_name(self, name: str) -> Optional[Dict[str, Any]]:
         """根据名字查找NPC"""
-        for npc in self.game_mgr.npcs:
-            if npc.get("name") == name:
-                return npc
-        return None
+        return self.game_mgr.get_npc_by_name(name)
 
     def _find_rule_by_id(self, rule_id: str) -> Any:
         """根据ID查找规则"""
-        for rule in self.game_mgr.rules:
-            if getattr(rule, "id", None) == rule_id:
-                return rule
-        return None
+        return self.game_mgr.get_rule(rule_id)
 
     def _calculate_npc_relationships(self, npc: Dict[str, Any]) -> Dict[str, int]:
-        """计算NPC之间的关系值"""
+        """获取NPC对其他存活NPC的关系值（名字 -> 分数）
+
+        关系由游戏状态管理器的关系图在交谈事件写入时增量维护，这里只做读取。
+        """
         if self.game_mgr.state is None:
             return {}
 
-        state: GameState = self.game_mgr.state
-        npc_name = npc.get("name")
-
-        relationships: Dict[str, int] = {}
-        base_score = 50
-
-        alive_npcs = self.game_mgr.get_alive_npcs()
-        for other in alive_npcs:
-            if other.get("id") == npc.get("id"):
-                continue
-            relationships[other.get("name", "未知")] = base_score
-
-        # 根据事件历史调整关系
-        for event in state.events_history:
-            evt_type = (
-                event.get("type")
-                if isinstance(event, dict)
-                else getattr(event, "type", None)
-            )
-            meta = (
-                event.get("meta", {})
-                if isinstance(event, dict)
-                else getattr(event, "meta", {}) or {}
-            )
-
-            if evt_type == EventType.NPC_ACTION.value and meta.get("action") == "talk":
-                actor = meta.get("actor")
-                target = meta.get("target")
-                if actor == npc_name and target in relationships:
-                    relationships[target] = min(100, relationships[target] + 5)
-                elif target == npc_name and actor in relationships:
-                    relationships[actor] = min(100, relationships[actor] + 5)
-
-        # 更新NPC的关系图（使用ID存储）
-        id_relationships: Dict[str, int] = {}
-        for other in alive_npcs:
-            if other.get("id") == npc.get("id"):
-                continue
-            name = other.get("name", "未知")
-            id_relationships[other.get("id")] = relationships.get(name, base_score)
-
-        self.game_mgr.update_npc(npc.get("id"), {"relationships": id_relationships})
-
-        return relationships
+        npc_id = npc.get("id")
+        relationships = self.game_mgr.relationships
+        return {
+            other.get("name", "未知"): relationships.get(npc_id, other.get("id"))
+            for other in self.game_mgr.get_alive_npcs()
+            if other.get("id") != npc_id
+        }
 
     def _calculate_ambient_fear(self) -> int:
         """计算环境恐惧等级"""
@@ -700,32 +763,20 @@ class AITurnPipeline:
         if self.game_mgr.state is None:
             raise RuntimeError("游戏状态未初始化")
         state: GameState = self.game_mgr.state
-        current_turn = state.current_turn
         turn_events = []
 
-        for event in reversed(state.events_history):
-            # 判断事件的回合
-            if hasattr(event, "turn"):
-                event_turn = event.turn
+        for event in state.events_history.for_turn(state.current_turn):
+            # 检查是否包含隐藏事件
+            is_hidden = False
+            if hasattr(event, "meta"):
+                is_hidden = (event.meta or {}).get("hidden", False)
             elif isinstance(event, dict):
-                event_turn = event.get("turn", 0)
-            else:
-                continue
-
-            if event_turn == current_turn:
-                # 检查是否包含隐藏事件
-                is_hidden = False
-                if hasattr(event, "meta"):
-                    is_hidden = event.meta.get("hidden", False)
-                elif isinstance(event, dict):
-                    is_hidden = event.get("meta", {}).get("hidden", False)
+                is_hidden = (event.get("meta") or {}).get("hidden", False)
 
-                if not is_hidden or include_hidden:
-                    turn_events.append(event)
-            elif event_turn < current_turn:
-                break
+            if not is_hidden or include_hidden:
+                turn_events.append(event)
 
-        return list(reversed(turn_events))
+        return turn_events
 
     def _save_narrative(self, narrative: str):
         """保存叙事文本"""
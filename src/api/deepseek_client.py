@@ -8,7 +8,7 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 import re
 
 from src.api.schemas import (
@@ -22,9 +22,21 @@ from src.api.schemas import (
 from src.api.prompts import PromptManager, RULE_EVAL_SYSTEM
 from .deepseek_http_client import APIConfig, DeepSeekHTTPClient
 from .llm_client import LLMClient
+from .scheduler import Priority, request_scope
+from .streaming import DialogueStreamParser
 
 logger = logging.getLogger("deepseek.client")
 
+# 叙事生成失败时的默认文本
+NARRATIVE_FALLBACK = "在这个诡异的空间里，恐惧正在悄然蔓延……"
+
+# 各类请求的响应缓存时间（秒），0 表示不缓存
+DEFAULT_CACHE_TTLS: Dict[str, int] = {
+    "turn_plan": 300,
+    "narrative": 600,
+    "rule_eval": 3600,
+}
+
 
 
 
@@ -35,17 +47,21 @@ class DeepSeekClient(LLMClient):
         self,
         config: Optional[APIConfig] = None,
         http_client: DeepSeekHTTPClient | None = None,
+        cache_ttls: Optional[Dict[str, int]] = None,
     ):
         """初始化客户端
 
         Args:
             config: API配置
             http_client: 可注入的HTTP客户端
+            cache_ttls: 覆盖各类请求的缓存时间，设为 0 的类型不缓存
+                （例如希望每次生成都不同的叙事）
         """
 
         self.config = config or APIConfig()
         self.http = http_client or DeepSeekHTTPClient(self.config)
         self.cache = self.http.cache
+        self.cache_ttls = {**DEFAULT_CACHE_TTLS, **(cache_ttls or {})}
         self.prompt_mgr = PromptManager()
 
     async def __aenter__(self):
@@ -54,9 +70,18 @@ class DeepSeekClient(LLMClient):
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.close()
 
-    async def _make_request(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        """发送API请求，实际调用底层HTTP客户端"""
-        return await self.http.post(endpoint, data)
+    async def _make_request(
+        self, endpoint: str, data: Dict[str, Any], kind: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """发送API请求，实际调用底层HTTP客户端
+
+        Args:
+            kind: 请求类型，决定响应的缓存时间；None 表示不缓存
+        """
+        return await self.http.post(endpoint, data, cache_ttl=self._cache_ttl(kind))
+
+    def _cache_ttl(self, kind: Optional[str]) -> Optional[int]:
+        return self.cache_ttls.get(kind) if kind else None
 
     def _ensure_len_text(self, text: str, min_len: int = 200) -> str:
         """确保文本长度不少于 ``min_len`` 字符"""
@@ -87,23 +112,65 @@ class DeepSeekClient(LLMClient):
             npc.setdefault("status", "normal")
             npc.setdefault("location", default_location)
 
-        # 检查缓存
-        cache_key = f"turn_plan_{time_of_day}_{len(npc_states)}"
-        if self.cache:
-            cached = self.cache.get(cache_key, {"npcs": len(npc_states)})
-            if cached:
-                try:
-                    plan = TurnPlan.model_validate(cached)
-                    logger.info(
-                        "turn_plan cache dialogue=%d actions=%d",
-                        len(plan.dialogue),
-                        len(plan.actions),
-                    )
-                    return plan
-                except Exception:
-                    logger.exception("Failed to validate cached turn plan")
+        data = self._turn_plan_request(
+            npc_states, scene_context, available_places, time_of_day
+        )
+        content = ""
+        try:
+            # 发送请求（相同的提示词直接使用缓存的响应）
+            response = await self._make_request("chat/completions", data, "turn_plan")
+            content = response["choices"][0]["message"]["content"]
+            plan = self._parse_turn_plan(content)
+        except Exception as e:
+            logger.exception(f"生成回合计划失败: {str(e)}")
+            self.http.forget("chat/completions", data)
+            return self._fallback_turn_plan(npc_states, content)
+        return plan
 
-        # 构建prompt
+    async def stream_turn_plan(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        available_places: List[str],
+        time_of_day: str,
+        min_dialogue: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式生成回合计划，边生成边输出对话
+
+        依次产出 ``{"type": "dialogue", "speaker", "delta", "done"}`` 事件，
+        最后产出 ``{"type": "plan", "plan": TurnPlan}``。
+        """
+        default_location = scene_context.get("current_location", "未知地点")
+        for npc in npc_states:
+            npc.setdefault("traits", [])
+            npc.setdefault("status", "normal")
+            npc.setdefault("location", default_location)
+
+        data = self._turn_plan_request(
+            npc_states, scene_context, available_places, time_of_day
+        )
+        parser = DialogueStreamParser()
+        try:
+            async for delta in self.http.stream(
+                "chat/completions", data, cache_ttl=self._cache_ttl("turn_plan")
+            ):
+                for event in parser.feed(delta):
+                    yield {"type": "dialogue", **event}
+            plan = self._parse_turn_plan(parser.buffer)
+        except Exception as e:
+            logger.exception(f"流式生成回合计划失败: {str(e)}")
+            self.http.forget("chat/completions", data)
+            plan = self._fallback_turn_plan(npc_states, parser.buffer)
+        yield {"type": "plan", "plan": plan}
+
+    def _turn_plan_request(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        available_places: List[str],
+        time_of_day: str,
+    ) -> Dict[str, Any]:
+        """构建回合计划的请求体"""
         system_prompt, user_prompt = self.prompt_mgr.build_turn_plan_prompt(
             npcs=npc_states,
             time_of_day=time_of_day,
@@ -114,9 +181,7 @@ class DeepSeekClient(LLMClient):
             ambient_fear=scene_context.get("ambient_fear_level", 50),
             special_conditions=scene_context.get("special_conditions", []),
         )
-
-        # 构建请求
-        data = {
+        return {
             "model": self.config.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
@@ -126,57 +191,71 @@ class DeepSeekClient(LLMClient):
             "max_tokens": 1500,
         }
 
-        try:
-            # 发送请求
-            response = await self._make_request("chat/completions", data)
-            content = response["choices"][0]["message"]["content"]
+    def _parse_turn_plan(self, content: str) -> TurnPlan:
+        """解析并验证回合计划"""
+        success, parsed_data, error = self.prompt_mgr.validate_json_response(
+            content, "turn_plan"
+        )
+        if not success:
+            logger.error(f"解析回合计划失败: {error}")
+            # 尝试直接解析
+            parsed_data = json.loads(self._extract_json(content))
 
-            # 解析响应
-            success, parsed_data, error = self.prompt_mgr.validate_json_response(
-                content, "turn_plan"
-            )
-            if not success:
-                logger.error(f"解析回合计划失败: {error}")
-                # 尝试直接解析
-                parsed_data = json.loads(self._extract_json(content))
+        plan = TurnPlan.model_validate(parsed_data)
+        logger.info(
+            "turn_plan generated dialogue=%d actions=%d",
+            len(plan.dialogue),
+            len(plan.actions),
+        )
+        return plan
+
+    def _fallback_turn_plan(self, npc_states: List[Dict[str, Any]], content: str) -> TurnPlan:
+        """生成失败时，把返回的文本当作一句对话"""
+        speaker = npc_states[0]["name"] if npc_states else "系统"
+        text = content.strip()
+        if "：" in text:
+            speaker, text = text.split("：", 1)
+        elif ":" in text:
+            speaker, text = text.split(":", 1)
+
+        return TurnPlan(
+            dialogue=[
+                DialogueTurn(
+                    speaker=speaker.strip(), text=text.strip() or "[AI生成失败，使用默认对话]"
+                )
+            ],
+            actions=[],
+            atmosphere="error",
+        )
 
-            # 验证并创建对象
-            plan = TurnPlan.model_validate(parsed_data)
+    async def generate_narrative_text(
+        self,
+        events: List[Dict[str, Any]],
+        time_of_day: str,
+        survivor_count: int,
+        ambient_fear: int = 50,
+        location: str = "未知地点",
+        npc_states: Optional[List[Dict[str, Any]]] = None,
+        min_len: int = 200,
+    ) -> str:
+        """生成叙事文本"""
+        data = self._narrative_request(events, time_of_day, survivor_count, ambient_fear)
 
-            # 缓存结果
-            if self.cache:
-                self.cache.set(
-                    cache_key, {"npcs": len(npc_states)}, plan.model_dump(), ttl=300
-                )
+        try:
+            response = await self._make_request("chat/completions", data, "narrative")
+            narrative = response["choices"][0]["message"]["content"].strip()
 
-            logger.info(
-                "turn_plan generated dialogue=%d actions=%d",
-                len(plan.dialogue),
-                len(plan.actions),
-            )
+            narrative = self._ensure_len_text(narrative, min_len)
 
-            return plan
+            # 使用Schema验证
+            narrative_out = NarrativeOut(narrative=narrative)
+            return narrative_out.narrative
 
         except Exception as e:
-            logger.exception(f"生成回合计划失败: {str(e)}")
-            speaker = npc_states[0]["name"] if npc_states else "系统"
-            text = locals().get("content", "").strip()
-            if "：" in text:
-                speaker, text = text.split("：", 1)
-            elif ":" in text:
-                speaker, text = text.split(":", 1)
-
-            return TurnPlan(
-                dialogue=[
-                    DialogueTurn(
-                        speaker=speaker.strip(), text=text.strip() or "[AI生成失败，使用默认对话]"
-                    )
-                ],
-                actions=[],
-                atmosphere="error",
-            )
+            logger.error(f"生成叙事失败: {str(e)}")
+            return NARRATIVE_FALLBACK
 
-    async def generate_narrative_text(
+    async def stream_narrative_text(
         self,
         events: List[Dict[str, Any]],
         time_of_day: str,
@@ -185,14 +264,42 @@ class DeepSeekClient(LLMClient):
         location: str = "未知地点",
         npc_states: Optional[List[Dict[str, Any]]] = None,
         min_len: int = 200,
-    ) -> str:
-        """生成叙事文本"""
-        # 格式化事件
-        formatted_events = []
-        for event in events:
-            formatted_events.append(self.prompt_mgr.format_event_for_narrative(event))
-
-        # 构建prompt
+    ) -> AsyncIterator[str]:
+        """流式生成叙事文本，逐段产出；拼接结果与 generate_narrative_text 一致"""
+        data = self._narrative_request(events, time_of_day, survivor_count, ambient_fear)
+        parts: List[str] = []
+        try:
+            async for delta in self.http.stream(
+                "chat/completions", data, cache_ttl=self._cache_ttl("narrative")
+            ):
+                if not parts:
+                    # 与非流式一致，去掉开头的空白
+                    delta = delta.lstrip()
+                    if not delta:
+                        continue
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            logger.error(f"流式生成叙事失败: {str(e)}")
+            if not parts:
+                yield NARRATIVE_FALLBACK
+                return
+        text = "".join(parts).rstrip()
+        padded = self._ensure_len_text(text, min_len)
+        if len(padded) > len(text):
+            yield padded[len(text):]
+
+    def _narrative_request(
+        self,
+        events: List[Dict[str, Any]],
+        time_of_day: str,
+        survivor_count: int,
+        ambient_fear: int,
+    ) -> Dict[str, Any]:
+        """构建叙事的请求体"""
+        formatted_events = [
+            self.prompt_mgr.format_event_for_narrative(event) for event in events
+        ]
         system_prompt, user_prompt = self.prompt_mgr.build_narrative_prompt(
             events=formatted_events,
             time_of_day=time_of_day,
@@ -200,8 +307,7 @@ class DeepSeekClient(LLMClient):
             ambient_fear=ambient_fear,
             special_conditions=None,
         )
-
-        data = {
+        return {
             "model": self.config.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
@@ -211,20 +317,6 @@ class DeepSeekClient(LLMClient):
             "max_tokens": 600,
         }
 
-        try:
-            response = await self._make_request("chat/completions", data)
-            narrative = response["choices"][0]["message"]["content"].strip()
-
-            narrative = self._ensure_len_text(narrative, min_len)
-
-            # 使用Schema验证
-            narrative_out = NarrativeOut(narrative=narrative)
-            return narrative_out.narrative
-
-        except Exception as e:
-            logger.error(f"生成叙事失败: {str(e)}")
-            return "在这个诡异的空间里，恐惧正在悄然蔓延……"
-
     async def evaluate_rule_nl(
         self, rule_nl: str, world_ctx: Dict[str, Any]
     ) -> RuleEvalResult:
@@ -249,7 +341,8 @@ class DeepSeekClient(LLMClient):
         }
 
         try:
-            response = await self._make_request("chat/completions", data)
+            with request_scope(priority=Priority.RULE_EVALUATION):
+                response = await self._make_request("chat/completions", data, "rule_eval")
             content = response["choices"][0]["message"]["content"]
 
             # 解析响应
@@ -273,6 +366,7 @@ class DeepSeekClient(LLMClient):
 
         except Exception as e:
             logger.error(f"评估规则失败: {str(e)}")
+            self.http.forget("chat/completions", data)
             # 返回默认评估
             return RuleEvalResult(
                 name="未知规则",
@@ -316,6 +410,33 @@ class DeepSeekClient(LLMClient):
 
         return [{"speaker": d.speaker, "text": d.text} for d in plan.dialogue]
 
+    async def stream_dialogue(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        dialogue_type: str = "normal",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """流式生成对话，边生成边输出（generate_dialogue 的流式版本）
+
+        依次产出 ``{"type": "dialogue", "speaker", "delta", "done"}`` 事件，
+        最后产出 ``{"type": "result", "dialogue": [{"speaker", "text"}, ...]}``。
+        """
+        async for event in self.stream_turn_plan(
+            npc_states=npc_states,
+            scene_context=scene_context,
+            available_places=scene_context.get("available_places", []),
+            time_of_day=scene_context.get("time", "未知"),
+        ):
+            if event["type"] == "plan":
+                yield {
+                    "type": "result",
+                    "dialogue": [
+                        {"speaker": d.speaker, "text": d.text} for d in event["plan"].dialogue
+                    ],
+                }
+            else:
+                yield event
+
     async def generate_dialogue_async(
         self,
         context: str,
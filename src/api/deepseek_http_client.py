@@ -4,20 +4,55 @@ import asyncio
 import json
 import logging
 import hashlib
-from datetime import datetime, timedelta
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any, Dict, Optional, List
+from typing import Any, AsyncIterator, Dict, Optional, List, Tuple
 
 import httpx
 from tenacity import (
     retry,
     stop_after_attempt,
     wait_exponential,
+    retry_if_exception,
     retry_if_exception_type,
 )
 
+from .http_pool import HTTPClientPool, http_pool
+from .response_store import ResponseStore, open_store
+from .scheduler import LLMScheduler, estimate_tokens, llm_scheduler
+from .streaming import iter_sse_content, sse_lines
+from ..utils.io_executor import io_executor
+
 logger = logging.getLogger("deepseek.http")
 
+# 默认的API响应缓存目录
+DEFAULT_CACHE_DIR = "data/cache/api"
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    """超时、网络错误和 429 可以重试（429 由调度器统一暂停后再排队）"""
+    if isinstance(exc, (httpx.TimeoutException, httpx.NetworkError)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429
+
+
+def _response_content(response: Any) -> Optional[str]:
+    """chat/completions 响应中的文本，格式不符时返回 None"""
+    try:
+        return response["choices"][0]["message"]["content"] or None
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """429 响应的 Retry-After 秒数"""
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
 
 class APIConfig:
     """Configuration for DeepSeek API access."""
@@ -30,7 +65,7 @@ class APIConfig:
         max_retries: int = 3,
         timeout: int = 30,
         cache_enabled: bool = True,
-        cache_dir: str | Path = "data/cache/api",
+        cache_dir: str | Path = DEFAULT_CACHE_DIR,
         mock_mode: bool = False,
     ) -> None:
         self.api_key = api_key
@@ -46,107 +81,290 @@ class APIConfig:
             self.mock_mode = True
 
 
+# 内存缓存默认上限
+DEFAULT_CACHE_ENTRIES = 1024
+DEFAULT_CACHE_BYTES = 16 * 1024 * 1024
+
+# 后台清理过期缓存的间隔（秒）
+DEFAULT_SWEEP_INTERVAL = 600
+
+
+@dataclass
+class _CacheEntry:
+    data: Any
+    expires_at: float  # time.monotonic() 时刻
+    size: int  # 序列化后的字节数
+
+
+@dataclass
+class CacheStats:
+    """缓存命中统计"""
+
+    hits: int = 0  # 内存命中
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0  # 超出容量被淘汰
+    expirations: int = 0  # 过期被移除
+
+
 class ResponseCache:
-    """Simple cache for API responses."""
+    """API响应缓存
 
-    def __init__(self, cache_dir: Path, default_ttl: int = 3600) -> None:
-        self.cache_dir = cache_dir
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    内存层是按条数和字节数限量的LRU，命中时不访问磁盘；未命中时再查
+    ``cache_dir`` 下共享的 SQLite 存储，写入由存储的后台线程批量提交。
+    存储在首次使用时打开（服务端在启动时于I/O线程中预先打开）。
+    过期条目由 :class:`CacheSweeper` 清理。
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        default_ttl: int = 3600,
+        max_entries: int = DEFAULT_CACHE_ENTRIES,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+    ) -> None:
+        self.cache_dir = Path(cache_dir)
+        self._response_store: Optional[ResponseStore] = None
         self.default_ttl = default_ttl
-        self.memory_cache: Dict[str, Dict[str, Any]] = {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory_cache: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self.memory_bytes = 0
+        self.stats = CacheStats()
+
+    @property
+    def store(self) -> ResponseStore:
+        if self._response_store is None:
+            self._response_store = open_store(self.cache_dir)
+        return self._response_store
 
     def _generate_key(self, prompt: str, params: Dict[str, Any]) -> str:
         content = json.dumps(
-            {"prompt": prompt, "params": params}, sort_keys=True, ensure_ascii=False
+            {"prompt": prompt, "params": params},
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
         )
-        return hashlib.md5(content.encode("utf-8")).hexdigest()
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
 
     def get(self, prompt: str, params: Dict[str, Any]) -> Optional[Any]:
         key = self._generate_key(prompt, params)
-        error_file = self.cache_dir / f"{key}.error"
-        if error_file.exists():
-            try:
-                error_file.unlink()
-            except OSError as exc:
-                logger.warning("删除错误标记失败: %s", exc)
-            return None
-        if key in self.memory_cache:
-            entry = self.memory_cache[key]
-            if datetime.now() < entry["expires_at"]:
-                logger.debug("缓存命中（内存）: %s", key[:8])
-                return entry["data"]
-        cache_file = self.cache_dir / f"{key}.json"
-        if cache_file.exists():
-            try:
-                with cache_file.open("r", encoding="utf-8") as fh:
-                    entry = json.load(fh)
-                expires_at = datetime.fromisoformat(entry["expires_at"])
-                if datetime.now() < expires_at:
-                    self.memory_cache[key] = {
-                        "data": entry["data"],
-                        "expires_at": expires_at,
-                    }
-                    logger.debug("缓存命中（文件）: %s", key[:8])
-                    return entry["data"]
-                cache_file.unlink()
-            except Exception as exc:
-                logger.error("读取缓存失败: %s", exc)
+        entry = self._memory_get(key)
+        if entry is not None:
+            return entry.data
+        return self._from_store(key, self._read_store(key))
+
+    async def aget(self, prompt: str, params: Dict[str, Any]) -> Optional[Any]:
+        """异步读取：内存命中直接返回，存储读取交给I/O线程"""
+        key = self._generate_key(prompt, params)
+        entry = self._memory_get(key)
+        if entry is not None:
+            return entry.data
+        return self._from_store(key, await io_executor.run(self._read_store, key))
+
+    def _memory_get(self, key: str) -> Optional[_CacheEntry]:
+        entry = self.memory_cache.get(key)
+        if entry is not None:
+            if time.monotonic() < entry.expires_at:
+                self.memory_cache.move_to_end(key)
+                self.stats.hits += 1
+                return entry
+            self._remove(key)
+            self.stats.expirations += 1
         return None
 
+    def _read_store(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            return self.store.get(key)
+        except Exception as exc:
+            logger.error("读取缓存失败: %s", exc)
+            return None
+
+    def _from_store(self, key: str, stored: Optional[Tuple[Any, float]]) -> Optional[Any]:
+        """记录存储层的读取结果，命中时回填内存层"""
+        if stored is None:
+            self.stats.misses += 1
+            return None
+        data, expires_at = stored
+        self._store(key, data, expires_at - time.time())
+        self.stats.disk_hits += 1
+        logger.debug("缓存命中（存储）: %s", key[:8])
+        return data
+
     def set(
         self, prompt: str, params: Dict[str, Any], data: Any, ttl: Optional[int] = None
     ) -> None:
         key = self._generate_key(prompt, params)
-        expires_at = datetime.now() + timedelta(seconds=ttl or self.default_ttl)
-        self.memory_cache[key] = {"data": data, "expires_at": expires_at}
-        cache_file = self.cache_dir / f"{key}.json"
+        ttl = ttl or self.default_ttl
+        self._store(key, data, ttl)
         try:
-            with cache_file.open("w", encoding="utf-8") as fh:
-                json.dump(
-                    {
-                        "data": data,
-                        "expires_at": expires_at.isoformat(),
-                        "prompt_hash": key,
-                        "created_at": datetime.now().isoformat(),
-                    },
-                    fh,
-                    ensure_ascii=False,
-                    indent=2,
-                )
+            self.store.set(key, data, time.time() + ttl)
         except Exception as exc:
             logger.error("保存缓存失败: %s", exc)
-            error_file = self.cache_dir / f"{key}.error"
+
+    def delete(self, prompt: str, params: Dict[str, Any]) -> None:
+        """删除一条缓存（内存和存储）"""
+        key = self._generate_key(prompt, params)
+        if key in self.memory_cache:
+            self._remove(key)
+        self.store.delete(key)
+
+    def _store(self, key: str, data: Any, ttl: float) -> None:
+        """写入内存层并按容量淘汰（先淘汰过期的，再淘汰最久未用的）"""
+        size = len(json.dumps(data, ensure_ascii=False, default=str).encode("utf-8"))
+        if key in self.memory_cache:
+            self._remove(key)
+        if size > self.max_bytes:
+            return  # 单条超过上限时只保存在存储层
+        self.memory_cache[key] = _CacheEntry(data, time.monotonic() + ttl, size)
+        self.memory_bytes += size
+        if len(self.memory_cache) > self.max_entries or self.memory_bytes > self.max_bytes:
+            self.purge_expired()
+        while len(self.memory_cache) > self.max_entries or self.memory_bytes > self.max_bytes:
+            self._remove(next(iter(self.memory_cache)))
+            self.stats.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self.memory_cache.pop(key)
+        self.memory_bytes -= entry.size
+
+    def purge_expired(self) -> int:
+        """移除内存层中已过期的条目，返回移除数"""
+        now = time.monotonic()
+        expired = [key for key, entry in self.memory_cache.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self.stats.expirations += len(expired)
+        return len(expired)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **asdict(self.stats),
+            "entries": len(self.memory_cache),
+            "bytes": self.memory_bytes,
+            "store": self._response_store.metrics() if self._response_store else None,
+        }
+
+
+def sweep_cache_dir(cache_dir: Path) -> int:
+    """删除缓存目录存储中已过期的条目，返回删除数"""
+    return open_store(cache_dir).sweep()
+
+
+class CacheSweeper:
+    """后台定期清理缓存存储中的过期条目
+
+    Args:
+        cache_dir: 缓存目录
+        interval: 清理间隔（秒）
+    """
+
+    def __init__(self, cache_dir: str | Path, interval: float = DEFAULT_SWEEP_INTERVAL) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.interval = interval
+        self.removed = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def sweep(self) -> int:
+        """立即清理一次（在I/O线程中等待存储的写线程完成）"""
+        removed = await io_executor.run(sweep_cache_dir, self.cache_dir)
+        self.removed += removed
+        if removed:
+            logger.info("清理过期缓存 %d 条", removed)
+        return removed
+
+    async def _run(self) -> None:
+        while True:
             try:
-                error_file.write_text(str(exc), encoding="utf-8")
-            except Exception as write_exc:
-                logger.error("创建错误标记失败: %s", write_exc)
+                await self.sweep()
+            except Exception as exc:
+                logger.error("清理缓存失败: %s", exc)
+            await asyncio.sleep(self.interval)
 
 
 class DeepSeekHTTPClient:
     """Low-level HTTP client for DeepSeek API."""
 
     def __init__(
-        self, config: APIConfig, http_client: httpx.AsyncClient | None = None
+        self,
+        config: APIConfig,
+        http_client: httpx.AsyncClient | None = None,
+        scheduler: LLMScheduler | None = None,
+        pool: HTTPClientPool | None = None,
     ) -> None:
         self.config = config
-        self.client = http_client or httpx.AsyncClient(timeout=config.timeout)
+        self.scheduler = scheduler or llm_scheduler
+        self.pool = pool or http_pool
+        self._own_client = http_client  # 注入的客户端由本对象关闭
         self.cache = (
             ResponseCache(self.config.cache_dir) if self.config.cache_enabled else None
         )
         self._mock_responses = self._init_mock_responses()
 
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """注入的客户端，未注入时使用进程共享的连接池"""
+        if self._own_client is not None:
+            return self._own_client
+        return self.pool.get()
+
     async def __aenter__(self) -> "DeepSeekHTTPClient":
         return self
 
     async def __aexit__(self, exc_type, exc, tb) -> None:
         await self.close()
 
+    async def post(
+        self, endpoint: str, data: Dict[str, Any], cache_ttl: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """发送请求
+
+        Args:
+            endpoint: 接口路径
+            data: 请求体
+            cache_ttl: 响应缓存秒数，None 或 0 表示不缓存。缓存键是接口和
+                完整请求体（模型、渲染后的提示词、采样参数）的哈希
+        """
+        cache = self._cache_for(cache_ttl)
+        if cache is not None:
+            cached = await cache.aget(endpoint, data)
+            if cached is not None:
+                logger.info("response %s cached", endpoint)
+                return cached
+        result = await self._post(endpoint, data)
+        if cache is not None and _response_content(result):
+            cache.set(endpoint, data, result, ttl=cache_ttl)
+        return result
+
+    def forget(self, endpoint: str, data: Dict[str, Any]) -> None:
+        """丢弃某个请求的缓存响应（例如返回内容无法解析时）"""
+        if self.cache is not None:
+            self.cache.delete(endpoint, data)
+
+    def _cache_for(self, cache_ttl: Optional[int]) -> Optional[ResponseCache]:
+        if not cache_ttl or self.config.mock_mode:
+            return None
+        return self.cache
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((httpx.TimeoutException, httpx.NetworkError)),
+        retry=retry_if_exception(_is_retryable),
     )
-    async def post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def _post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("request %s", endpoint)
         if self.config.mock_mode:
             await asyncio.sleep(0.1)
@@ -159,33 +377,113 @@ class DeepSeekHTTPClient:
         }
         try:
             json_data = json.dumps(data, ensure_ascii=False).encode("utf-8")
-            response = await self.client.post(
-                f"{self.config.base_url}/{endpoint}",
-                headers=headers,
-                content=json_data,
+            async with self.scheduler.slot(estimate_tokens(data)) as grant:
+                response = await self.client.post(
+                    f"{self.config.base_url}/{endpoint}",
+                    headers=headers,
+                    content=json_data,
+                    timeout=self.config.timeout,
+                )
+                if response.status_code == 429:
+                    self.scheduler.throttle(_retry_after(response))
+                response.raise_for_status()
+                if not response.content or not response.text.strip():
+                    logger.error("空响应: %s", endpoint)
+                    raise ValueError(f"Empty response from {endpoint}")
+                try:
+                    res_data = response.json()
+                except json.JSONDecodeError as exc:
+                    logger.error("非JSON响应: %s", response.text)
+                    raise ValueError(
+                        f"Invalid JSON response from {endpoint}: {response.text[:100]}"
+                    ) from exc
+                if isinstance(res_data, dict):
+                    grant.used_tokens = (res_data.get("usage") or {}).get("total_tokens")
+            logger.info(
+                "response %s %s (queued %.3fs)", endpoint, response.status_code, grant.queue_time
             )
-            response.raise_for_status()
-            if not response.content or not response.text.strip():
-                logger.error("空响应: %s", endpoint)
-                raise ValueError(f"Empty response from {endpoint}")
-            try:
-                res_data = response.json()
-                logger.info("response %s %s", endpoint, response.status_code)
-                return res_data
-            except json.JSONDecodeError as exc:
-                logger.error("非JSON响应: %s", response.text)
-                raise ValueError(
-                    f"Invalid JSON response from {endpoint}: {response.text[:100]}"
-                ) from exc
+            return res_data
         except httpx.HTTPStatusError as exc:
             logger.error("HTTP错误 %s: %s", exc.response.status_code, exc.response.text)
-            if exc.response.status_code == 429:
-                await asyncio.sleep(5)
             raise
         except Exception as exc:
             logger.error("请求失败: %s", exc)
             raise
 
+    async def stream(
+        self, endpoint: str, data: Dict[str, Any], cache_ttl: Optional[int] = None
+    ) -> AsyncIterator[str]:
+        """以SSE方式请求（``stream: true``），逐段返回生成的文本
+
+        连接阶段的超时和网络错误会重试；开始输出后不再重试，避免重复内容。
+        与 post 共用缓存：命中时一次返回全文，完整输出后按非流式响应缓存。
+        """
+        cache = self._cache_for(cache_ttl)
+        if cache is not None:
+            cached = _response_content(await cache.aget(endpoint, data))
+            if cached:
+                logger.info("stream %s cached", endpoint)
+                yield cached
+                return
+        parts: List[str] = []
+        async for delta in self._stream(endpoint, data):
+            parts.append(delta)
+            yield delta
+        if cache is not None and parts:
+            content = "".join(parts)
+            response = {"choices": [{"message": {"content": content}, "finish_reason": "stop"}]}
+            cache.set(endpoint, data, response, ttl=cache_ttl)
+
+    async def _stream(self, endpoint: str, data: Dict[str, Any]) -> AsyncIterator[str]:
+        logger.info("stream %s", endpoint)
+        if self.config.mock_mode:
+            response = self._generate_mock_response(endpoint, data)
+            content = response["choices"][0]["message"]["content"]
+
+            async def mock_lines() -> AsyncIterator[str]:
+                for line in sse_lines(content):
+                    await asyncio.sleep(0)
+                    yield line
+
+            async for delta in iter_sse_content(mock_lines()):
+                yield delta
+            return
+        headers = {
+            "Authorization": f"Bearer {self.config.api_key}",
+            "Content-Type": "application/json; charset=utf-8",
+            "Accept": "text/event-stream",
+        }
+        json_data = json.dumps({**data, "stream": True}, ensure_ascii=False).encode("utf-8")
+        request = self.client.build_request(
+            "POST",
+            f"{self.config.base_url}/{endpoint}",
+            headers=headers,
+            content=json_data,
+            timeout=self.config.timeout,
+        )
+        async with self.scheduler.slot(estimate_tokens(data)):
+            response = await self._send_stream(request)
+            try:
+                if response.is_error:
+                    body = (await response.aread()).decode("utf-8", "replace")
+                    logger.error("HTTP错误 %s: %s", response.status_code, body)
+                    if response.status_code == 429:
+                        self.scheduler.throttle(_retry_after(response))
+                    response.raise_for_status()
+                async for delta in iter_sse_content(response.aiter_lines()):
+                    yield delta
+                logger.info("stream %s done", endpoint)
+            finally:
+                await response.aclose()
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((httpx.TimeoutException, httpx.NetworkError)),
+    )
+    async def _send_stream(self, request: httpx.Request) -> httpx.Response:
+        return await self.client.send(request, stream=True)
+
     def _generate_mock_response(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         mock_payload = {
             "dialogue": [
@@ -223,4 +521,6 @@ class DeepSeekHTTPClient:
         }
 
     async def close(self) -> None:
-        await self.client.aclose()
+        # 共享连接池在应用关闭时统一关闭
+        if self._own_client is not None:
+            await self._own_client.aclose()
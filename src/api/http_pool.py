@@ -0,0 +1,149 @@
+"""
+进程级共享HTTP连接池
+所有游戏会话和服务共用一个 httpx.AsyncClient：连接保持存活、跨会话复用，
+不再每局重新握手。默认使用 HTTP/1.1 连接池；配置开启且安装了 h2 包时使用 HTTP/2。
+应用关闭时统一关闭一次。
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+import logging
+from typing import Any, Dict, Optional, Set
+
+import httpx
+
+logger = logging.getLogger("deepseek.pool")
+
+# 连接池默认参数
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_KEEPALIVE = 32
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = 30.0
+
+
+def http2_available() -> bool:
+    """httpx 的 HTTP/2 支持依赖可选的 h2 包"""
+    return importlib.util.find_spec("h2") is not None
+
+
+class HTTPClientPool:
+    """共享的 httpx.AsyncClient
+
+    客户端在首次使用时创建；所在事件循环关闭后（例如测试中每个用例一个循环）
+    下次使用时重新创建。
+
+    Args:
+        max_connections: 最大连接数
+        max_keepalive_connections: 最多保持的空闲连接数
+        keepalive_expiry: 空闲连接保持秒数
+        timeout: 默认超时秒数（请求可单独指定）
+        http2: 是否启用 HTTP/2（需要安装 h2 包）
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_keepalive_connections: int = DEFAULT_MAX_KEEPALIVE,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        timeout: float = DEFAULT_TIMEOUT,
+        http2: bool = False,
+    ) -> None:
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: Set["asyncio.Task[None]"] = set()
+        self.created = 0
+        self.configure(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+            timeout=timeout,
+            http2=http2,
+        )
+
+    def configure(
+        self,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        timeout: Optional[float] = None,
+        http2: Optional[bool] = None,
+    ) -> None:
+        """更新连接池参数（对之后创建的客户端生效）"""
+        if max_connections is not None:
+            self.max_connections = max_connections
+        if max_keepalive_connections is not None:
+            self.max_keepalive_connections = max_keepalive_connections
+        if keepalive_expiry is not None:
+            self.keepalive_expiry = keepalive_expiry
+        if timeout is not None:
+            self.timeout = timeout
+        if http2 is not None:
+            self.http2 = http2 and http2_available()
+            if http2 and not self.http2:
+                logger.info("未安装 h2，共享连接池使用 HTTP/1.1")
+
+    def get(self) -> httpx.AsyncClient:
+        """获取共享客户端"""
+        try:
+            loop: Optional[asyncio.AbstractEventLoop] = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        client = self._client
+        if client is not None and not client.is_closed:
+            if self._loop is None or loop is None or self._loop is loop:
+                self._loop = self._loop or loop
+                return client
+            if not self._loop.is_closed():
+                return client
+        self._client = self._create()
+        self._loop = loop
+        if client is not None and not client.is_closed and loop is not None:
+            # 旧客户端所在的事件循环已关闭，在当前循环中关闭它释放连接
+            task = loop.create_task(_aclose_quietly(client))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+        return self._client
+
+    def _create(self) -> httpx.AsyncClient:
+        self.created += 1
+        return httpx.AsyncClient(
+            http2=self.http2,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """关闭共享客户端"""
+        client, self._client, self._loop = self._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+        loop = asyncio.get_running_loop()
+        pending = [task for task in self._closing if task.get_loop() is loop]
+        if pending:
+            await asyncio.gather(*pending)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "open": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "clients_created": self.created,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+        }
+
+
+async def _aclose_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception as exc:
+        logger.debug("关闭旧的HTTP客户端失败: %s", exc)
+
+
+# 进程内共享的连接池
+http_pool = HTTPClientPool()
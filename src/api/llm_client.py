@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import Protocol, Any, Dict, List, Optional
+from typing import Protocol, Any, AsyncIterator, Dict, List, Optional
 
 
 class LLMClient(Protocol):
@@ -28,6 +28,28 @@ class LLMClient(Protocol):
     ) -> str:
         """Generate narrative text describing recent events."""
 
+    def stream_narrative_text(
+        self,
+        events: List[Dict[str, Any]],
+        time_of_day: str,
+        survivor_count: int,
+        ambient_fear: int = 50,
+        location: str | None = None,
+        npc_states: Optional[List[Dict[str, Any]]] = None,
+        min_len: int = 200,
+    ) -> AsyncIterator[str]:
+        """Stream narrative text piece by piece as it is generated."""
+
+    def stream_turn_plan(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        available_places: List[str],
+        time_of_day: str,
+        min_dialogue: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream dialogue events of a turn plan, ending with the full plan."""
+
     async def evaluate_rule_nl(
         self, rule_nl: str, world_ctx: Dict[str, Any]
     ) -> Any:
@@ -41,5 +63,13 @@ class LLMClient(Protocol):
     ) -> List[Dict[str, str]]:
         """Generate dialogue for NPCs."""
 
+    def stream_dialogue(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        dialogue_type: str = "normal",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream dialogue events as they are generated, ending with the full dialogue."""
+
     async def close(self) -> None:
         """Release any held resources."""
@@ -1,10 +1,18 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 from .llm_client import LLMClient
 from .schemas import DialogueTurn, TurnPlan, RuleEvalResult, RuleTrigger, RuleEffect
 
+# 模拟流式输出时每段的字符数（中文接口通常一到两个字一个增量）
+STREAM_CHUNK_SIZE = 2
+
+
+def _chunks(text: str, size: int = STREAM_CHUNK_SIZE) -> List[str]:
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
 
 class MockDeepSeekClient(LLMClient):
     """Mock implementation of :class:`LLMClient` for testing."""
@@ -34,6 +42,41 @@ class MockDeepSeekClient(LLMClient):
     ) -> str:
         return "在测试环境中，恐怖只是模拟。"
 
+    async def stream_narrative_text(
+        self,
+        events: List[Dict[str, Any]],
+        time_of_day: str,
+        survivor_count: int,
+        ambient_fear: int = 50,
+        location: str | None = None,
+        npc_states: Optional[List[Dict[str, Any]]] = None,
+        min_len: int = 200,
+    ) -> AsyncIterator[str]:
+        text = await self.generate_narrative_text(
+            events, time_of_day, survivor_count, ambient_fear, location, npc_states, min_len
+        )
+        for chunk in _chunks(text):
+            await asyncio.sleep(0)
+            yield chunk
+
+    async def stream_turn_plan(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        available_places: List[str],
+        time_of_day: str,
+        min_dialogue: int = 1,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        plan = await self.generate_turn_plan(
+            npc_states, scene_context, available_places, time_of_day, min_dialogue
+        )
+        for turn in plan.dialogue:
+            for chunk in _chunks(turn.text):
+                await asyncio.sleep(0)
+                yield {"type": "dialogue", "speaker": turn.speaker, "delta": chunk, "done": False}
+            yield {"type": "dialogue", "speaker": turn.speaker, "delta": "", "done": True}
+        yield {"type": "plan", "plan": plan}
+
     async def evaluate_rule_nl(
         self, rule_nl: str, world_ctx: Dict[str, Any]
     ) -> RuleEvalResult:
@@ -55,5 +98,19 @@ class MockDeepSeekClient(LLMClient):
     ) -> List[Dict[str, str]]:
         return [{"speaker": npc_states[0]["name"], "text": "测试对话"}]
 
+    async def stream_dialogue(
+        self,
+        npc_states: List[Dict[str, Any]],
+        scene_context: Dict[str, Any],
+        dialogue_type: str = "normal",
+    ) -> AsyncIterator[Dict[str, Any]]:
+        dialogue = await self.generate_dialogue(npc_states, scene_context)
+        for turn in dialogue:
+            for chunk in _chunks(turn["text"]):
+                await asyncio.sleep(0)
+                yield {"type": "dialogue", "speaker": turn["speaker"], "delta": chunk, "done": False}
+            yield {"type": "dialogue", "speaker": turn["speaker"], "delta": "", "done": True}
+        yield {"type": "result", "dialogue": dialogue}
+
     async def close(self) -> None:
         return None
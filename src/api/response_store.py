@@ -0,0 +1,288 @@
+"""
+LLM响应的持久化存储
+单个 SQLite 文件（WAL 模式）保存全部缓存响应，过期时间建索引；写入由
+后台线程批量提交，调用方不等待磁盘。同一数据库文件在进程内只打开一次，
+所有 ResponseCache 共用。首次打开时删除旧版每条一个 JSON 文件的缓存（只删除符合旧格式的文件）。
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("deepseek.store")
+
+# 缓存目录中的数据库文件名
+STORE_FILENAME = "responses.sqlite3"
+
+# 后台线程一次提交的最多写入数
+BATCH_SIZE = 256
+
+# 收到第一条写入后最多再等待多久凑成一批（秒）
+BATCH_WINDOW = 0.05
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at);
+"""
+
+# 旧版缓存文件名：md5 或 sha256 十六进制摘要
+_LEGACY_KEY = re.compile(r"[0-9a-f]{32}|[0-9a-f]{64}")
+
+# 写入队列中的操作：("set", key, data, expires_at) / ("delete", key) / 在写线程执行的函数
+_Op = Tuple[Any, ...]
+
+
+class ResponseStore:
+    """SQLite 响应存储
+
+    Args:
+        path: 数据库文件路径
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.write_errors = 0
+        self.written = 0
+        self.batches = 0
+        self._pending: Dict[str, Optional[Tuple[str, float]]] = {}  # 未提交的写入
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[_Op]]" = queue.Queue()
+
+        self._reader = self._connect()
+        self._reader.executescript(_SCHEMA)
+        self._remove_legacy_files()
+        self._thread = threading.Thread(
+            target=self._run_writer, name=f"response-store:{self.path.name}", daemon=True
+        )
+        self._closed = False
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    # ------------------------------------------------------------------
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """读取未过期的条目，返回 (数据, 过期时间戳)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if key in self._pending:
+                pending = self._pending[key]
+                if pending is None:
+                    return None
+                raw, expires_at = pending
+            else:
+                row = self._reader.execute(
+                    "SELECT data, expires_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                raw, expires_at = row
+        if expires_at <= now:
+            return None
+        return json.loads(raw), expires_at
+
+    def set(self, key: str, data: Any, expires_at: float) -> None:
+        """排队写入，立即返回"""
+        raw = json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            self._pending[key] = (raw, expires_at)
+        self._queue.put(("set", key, raw, expires_at))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._pending[key] = None
+        self._queue.put(("delete", key))
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """删除已过期的条目，返回删除数（按过期时间索引）"""
+        now = time.time() if now is None else now
+        return self.call(
+            lambda conn: conn.execute(
+                "DELETE FROM responses WHERE expires_at <= ?", (now,)
+            ).rowcount
+        )
+
+    def flush(self) -> None:
+        """等待此前排队的写入全部提交"""
+        self.call(lambda conn: None)
+
+    def call(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """在写线程中执行函数并等待结果（排在已有写入之后）"""
+        if self._closed:
+            raise RuntimeError("响应存储已关闭")
+        future: "Future[Any]" = Future()
+        self._queue.put(("call", fn, future))
+        return future.result()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._reader.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "pending": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "write_errors": self.write_errors,
+        }
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        self._reader.close()
+
+    # ------------------------------------------------------------------
+    def _run_writer(self) -> None:
+        conn = self._connect()
+        try:
+            while True:
+                op = self._queue.get()
+                if op is None:
+                    return
+                batch = [op]
+                deadline = time.monotonic() + BATCH_WINDOW
+                while len(batch) < BATCH_SIZE:
+                    try:
+                        op = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if op is None:
+                        self._commit(conn, batch)
+                        return
+                    batch.append(op)
+                self._commit(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List[_Op]) -> None:
+        writes = [op for op in batch if op[0] != "call"]
+        if writes:
+            try:
+                conn.execute("BEGIN")
+                now = time.time()
+                for op in writes:
+                    if op[0] == "set":
+                        conn.execute(
+                            "INSERT OR REPLACE INTO responses (key, data, expires_at, created_at)"
+                            " VALUES (?, ?, ?, ?)",
+                            (op[1], op[2], op[3], now),
+                        )
+                    else:
+                        conn.execute("DELETE FROM responses WHERE key = ?", (op[1],))
+                conn.execute("COMMIT")
+                self.written += len(writes)
+                self.batches += 1
+            except sqlite3.Error as exc:
+                logger.error("缓存写入失败: %s", exc)
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                self.write_errors += len(writes)
+                self._drop_stale(conn, writes)
+            with self._lock:
+                for op in writes:
+                    # 只清除仍是本批写入的值，之后排队的写入继续生效
+                    expected = (op[2], op[3]) if op[0] == "set" else None
+                    if op[1] in self._pending and self._pending[op[1]] == expected:
+                        del self._pending[op[1]]
+        for op in batch:
+            if op[0] == "call":
+                _, fn, future = op
+                try:
+                    future.set_result(fn(conn))
+                except Exception as exc:
+                    future.set_exception(exc)
+
+    def _drop_stale(self, conn: sqlite3.Connection, writes: List[_Op]) -> None:
+        """写入失败时删除这些键的旧值，避免之后读到过时的响应"""
+        try:
+            conn.executemany(
+                "DELETE FROM responses WHERE key = ?", [(op[1],) for op in writes]
+            )
+        except sqlite3.Error as exc:
+            logger.error("清除失败写入的旧值失败: %s", exc)
+
+    def _remove_legacy_files(self) -> None:
+        """删除旧版每条一个 JSON 文件的缓存
+
+        旧文件按旧的键命名，无法对应到按完整请求内容计算的新键，直接删除。
+        缓存目录可以配置，只删除文件名为旧键（十六进制摘要）、内容为旧格式的
+        ``.json`` 文件及同名的 ``.error`` 标记，目录中的其他文件不动。
+        """
+        removed = 0
+        for path in self.path.parent.iterdir():
+            if not _is_legacy_file(path):
+                continue
+            try:
+                path.unlink()
+                removed += 1
+            except OSError as exc:
+                logger.warning("删除旧缓存文件失败: %s", exc)
+        if removed:
+            logger.info("删除旧缓存文件 %d 个", removed)
+
+
+def _is_legacy_file(path: Path) -> bool:
+    """是否为旧版缓存文件：``<md5/sha256>.json``（含 data 和 expires_at）或 ``<摘要>.error``"""
+    if path.suffix not in (".json", ".error") or not _LEGACY_KEY.fullmatch(path.stem):
+        return False
+    if not path.is_file():
+        return False
+    if path.suffix == ".error":
+        return True
+    try:
+        with path.open("r", encoding="utf-8") as fh:
+            entry = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    return (
+        isinstance(entry, dict)
+        and "data" in entry
+        and isinstance(entry.get("expires_at"), str)
+    )
+
+
+_stores: Dict[Path, ResponseStore] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(cache_dir: str | Path) -> ResponseStore:
+    """获取缓存目录对应的共享存储"""
+    path = (Path(cache_dir) / STORE_FILENAME).resolve()
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None or store._closed:
+            store = ResponseStore(path)
+            _stores[path] = store
+        return store
+
+
+@atexit.register
+def close_stores() -> None:
+    """提交所有排队的写入并关闭存储"""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
@@ -0,0 +1,355 @@
+"""
+进程级LLM请求调度器
+所有 DeepSeekHTTPClient 的请求先在这里排队：令牌桶限制请求速率和
+token 预算，按优先级出队（交互叙事 > 规则评估 > 后台预取），同一优先级
+内按游戏轮转保证公平；遇到 429 时整体暂停而不是各请求各自重试。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, Optional
+
+# 未指定游戏的请求归入的队列
+DEFAULT_GAME = "_global"
+
+# 未给出 max_tokens 时按此估算输出 token 数
+DEFAULT_COMPLETION_TOKENS = 512
+
+# 429 响应未带 Retry-After 时的暂停秒数
+DEFAULT_RETRY_AFTER = 5.0
+
+
+class Priority(IntEnum):
+    """请求优先级，数值越小越先出队"""
+
+    INTERACTIVE = 0  # 玩家正在等待的叙事、对话、回合计划
+    RULE_EVALUATION = 1  # 规则评估
+    BACKGROUND = 2  # 后台预取、批量生成
+
+
+_current_game: ContextVar[str] = ContextVar("llm_game", default=DEFAULT_GAME)
+_current_priority: ContextVar[Priority] = ContextVar(
+    "llm_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def request_scope(
+    game_id: Optional[str] = None, priority: Optional[Priority] = None
+) -> Iterator[None]:
+    """设置当前上下文中LLM请求所属的游戏和优先级
+
+    未指定的项沿用外层设置；并发任务在创建时继承当前设置。
+    """
+    game_token = _current_game.set(game_id) if game_id is not None else None
+    priority_token = _current_priority.set(priority) if priority is not None else None
+    try:
+        yield
+    finally:
+        if priority_token is not None:
+            _current_priority.reset(priority_token)
+        if game_token is not None:
+            _current_game.reset(game_token)
+
+
+def estimate_tokens(data: Dict[str, Any]) -> int:
+    """粗略估算一次 chat/completions 请求消耗的 token 数
+
+    中文约一字一 token，按字符数计提示词（偏保守），加上 max_tokens。
+    """
+    prompt = sum(len(str(m.get("content", ""))) for m in data.get("messages", []))
+    return prompt + int(data.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """令牌桶
+
+    Args:
+        rate: 每秒补充的令牌数
+        capacity: 桶容量（允许的突发量）
+        clock: 单调时钟，测试时可替换
+    """
+
+    def __init__(
+        self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic
+    ) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """取出 amount 个令牌需要等待的秒数（超过容量按容量计）"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float) -> None:
+        """按实际用量修正：正数补扣，负数退还"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+@dataclass
+class Grant:
+    """一次获准的请求，释放时据此结算 token 用量"""
+
+    priority: Priority
+    game_id: str
+    tokens: int
+    queue_time: float
+    used_tokens: Optional[int] = None  # 响应中的实际用量，未知时按估算结算
+
+
+@dataclass
+class _Ticket:
+    priority: Priority
+    game_id: str
+    tokens: int
+    future: "asyncio.Future[Grant]"
+    enqueued_at: float
+
+
+@dataclass
+class _QueueStats:
+    served: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def record(self, wait: float) -> None:
+        self.served += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class LLMScheduler:
+    """进程级LLM请求调度器
+
+    Args:
+        requests_per_second: 请求速率上限
+        burst: 请求令牌桶容量
+        tokens_per_minute: 每分钟 token 预算
+        max_concurrent: 同时进行的请求数上限
+        clock: 单调时钟，测试时可替换
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float = 5.0,
+        burst: int = 10,
+        tokens_per_minute: int = 120_000,
+        max_concurrent: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.clock = clock
+        self.in_flight = 0
+        self.throttled = 0
+        self._paused_until = 0.0
+        self._queues: Dict[Priority, "OrderedDict[str, Deque[_Ticket]]"] = {
+            priority: OrderedDict() for priority in Priority
+        }
+        self._stats: Dict[Priority, _QueueStats] = {p: _QueueStats() for p in Priority}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._timer_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer_due = 0.0
+        self.configure(requests_per_second, burst, tokens_per_minute, max_concurrent)
+
+    def configure(
+        self,
+        requests_per_second: float = 5.0,
+        burst: int = 10,
+        tokens_per_minute: int = 120_000,
+        max_concurrent: int = 8,
+    ) -> None:
+        """设置限额（0 表示不限），令牌桶重新装满"""
+        self.request_bucket = (
+            TokenBucket(requests_per_second, max(1, burst), self.clock)
+            if requests_per_second
+            else None
+        )
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60.0, tokens_per_minute, self.clock)
+            if tokens_per_minute
+            else None
+        )
+        self.max_concurrent = max_concurrent or float("inf")
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        tokens: int = 0,
+        priority: Optional[Priority] = None,
+        game_id: Optional[str] = None,
+    ) -> AsyncIterator[Grant]:
+        """排队获得一个请求名额，退出时释放
+
+        未指定的优先级和游戏取自 request_scope。
+        """
+        grant = await self.acquire(tokens, priority, game_id)
+        try:
+            yield grant
+        finally:
+            self.release(grant)
+
+    async def acquire(
+        self,
+        tokens: int = 0,
+        priority: Optional[Priority] = None,
+        game_id: Optional[str] = None,
+    ) -> Grant:
+        ticket = _Ticket(
+            priority=_current_priority.get() if priority is None else priority,
+            game_id=_current_game.get() if game_id is None else game_id,
+            tokens=tokens,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=self.clock(),
+        )
+        self._queues[ticket.priority].setdefault(ticket.game_id, deque()).append(ticket)
+        self._dispatch()
+        try:
+            return await ticket.future
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                self.release(ticket.future.result())  # 已获准但调用方被取消
+            else:
+                self._discard(ticket)
+            raise
+
+    def release(self, grant: Grant) -> None:
+        """释放名额，并按实际用量结算 token 预算"""
+        self.in_flight -= 1
+        bucket = self.token_bucket
+        if bucket is not None and grant.used_tokens is not None:
+            bucket.adjust(grant.used_tokens - min(grant.tokens, bucket.capacity))
+        self._dispatch()
+
+    def throttle(self, retry_after: Optional[float] = None) -> None:
+        """收到 429 后暂停全部出队，避免所有请求同时重试"""
+        delay = DEFAULT_RETRY_AFTER if retry_after is None else max(0.0, retry_after)
+        self.throttled += 1
+        self._paused_until = max(self._paused_until, self.clock() + delay)
+        self._schedule(delay)
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        priorities = list(Priority) if priority is None else [priority]
+        return sum(
+            len(queue) for p in priorities for queue in self._queues[p].values()
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        """排队和限流指标（等待时间单位为秒）"""
+        per_priority = {}
+        for priority in Priority:
+            stats = self._stats[priority]
+            per_priority[priority.name.lower()] = {
+                "queued": self.queue_depth(priority),
+                "served": stats.served,
+                "avg_wait": stats.total_wait / stats.served if stats.served else 0.0,
+                "max_wait": stats.max_wait,
+            }
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queue_depth(),
+            "throttled": self.throttled,
+            "paused_for": max(0.0, self._paused_until - self.clock()),
+            "priorities": per_priority,
+        }
+
+    # ------------------------------------------------------------------
+    def _peek(self) -> Optional[_Ticket]:
+        """优先级最高的队列中轮到的游戏的第一个请求"""
+        for priority in Priority:
+            games = self._queues[priority]
+            while games:
+                game_id, queue = next(iter(games.items()))
+                while queue and (
+                    queue[0].future.done() or queue[0].future.get_loop().is_closed()
+                ):
+                    queue.popleft()  # 已取消或所属事件循环已关闭
+                if queue:
+                    return queue[0]
+                del games[game_id]
+        return None
+
+    def _pop(self, ticket: _Ticket) -> None:
+        games = self._queues[ticket.priority]
+        queue = games[ticket.game_id]
+        queue.popleft()
+        if queue:
+            games.move_to_end(ticket.game_id)  # 轮到下一个游戏
+        else:
+            del games[ticket.game_id]
+
+    def _discard(self, ticket: _Ticket) -> None:
+        queue = self._queues[ticket.priority].get(ticket.game_id)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.priority][ticket.game_id]
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.max_concurrent:
+            ticket = self._peek()
+            if ticket is None:
+                return
+            now = self.clock()
+            wait = self._paused_until - now
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.wait_time(1))
+            if self.token_bucket is not None:
+                wait = max(wait, self.token_bucket.wait_time(ticket.tokens))
+            if wait > 0:
+                self._schedule(wait)
+                return
+            self._pop(ticket)
+            if self.request_bucket is not None:
+                self.request_bucket.take(1)
+            if self.token_bucket is not None:
+                self.token_bucket.take(ticket.tokens)
+            self.in_flight += 1
+            queue_time = now - ticket.enqueued_at
+            self._stats[ticket.priority].record(queue_time)
+            ticket.future.set_result(
+                Grant(ticket.priority, ticket.game_id, ticket.tokens, queue_time)
+            )
+
+    def _schedule(self, delay: float) -> None:
+        """delay 秒后重新尝试出队"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        due = self.clock() + delay
+        if self._timer is not None and self._timer_loop is loop:
+            if self._timer_due <= due:
+                return  # 已有更早的定时
+            self._timer.cancel()
+        self._timer_due = due
+        self._timer_loop = loop
+        self._timer = loop.call_later(delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        self._dispatch()
+
+
+# 进程内共享的调度器
+llm_scheduler = LLMScheduler()
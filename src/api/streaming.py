@@ -0,0 +1,123 @@
+"""流式响应解析
+
+解析 chat/completions 接口的 server-sent events（``stream: true``），
+以及从流式返回的回合计划JSON中增量提取对话文本。
+"""
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+# SSE 流结束标记
+SSE_DONE = "[DONE]"
+
+
+def parse_sse_line(line: str) -> Optional[str]:
+    """解析一行SSE，返回其中的增量文本
+
+    非 ``data:`` 行、结束标记和没有内容的增量返回 None。
+    """
+    line = line.strip()
+    if not line.startswith("data:"):
+        return None
+    payload = line[5:].strip()
+    if not payload or payload == SSE_DONE:
+        return None
+    try:
+        chunk = json.loads(payload)
+    except json.JSONDecodeError:
+        return None
+    choices = chunk.get("choices") or []
+    if not choices:
+        return None
+    delta = choices[0].get("delta") or {}
+    return delta.get("content") or None
+
+
+async def iter_sse_content(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    """从SSE行流中依次取出增量文本，遇到结束标记时停止"""
+    async for line in lines:
+        if line.strip() == f"data: {SSE_DONE}":
+            break
+        content = parse_sse_line(line)
+        if content:
+            yield content
+
+
+def sse_lines(content: str, size: int = 2) -> Iterable[str]:
+    """把完整文本切成与真实接口相同格式的SSE行（用于Mock）"""
+    for i in range(0, len(content), size):
+        chunk = {"choices": [{"delta": {"content": content[i : i + size]}, "index": 0}]}
+        yield "data: " + json.dumps(chunk, ensure_ascii=False)
+    yield f"data: {SSE_DONE}"
+
+
+class DialogueStreamParser:
+    """从流式返回的回合计划JSON中增量提取对话
+
+    每次 feed 一段增量文本，返回新出现的对话片段事件：
+    ``{"speaker": 说话者, "delta": 新增文本, "done": 是否说完}``。
+    只识别 ``"text"`` 字段，说话者取它之前最近的 ``"speaker"`` 字段。
+    """
+
+    _SPEAKER = re.compile(r'"speaker"\s*:\s*"((?:[^"\\]|\\.)*)"')
+    _TEXT = re.compile(r'"text"\s*:\s*"')
+
+    def __init__(self) -> None:
+        self.buffer = ""
+        self._pos = 0  # 下一次查找字段的起点
+        self._text_pos: Optional[int] = None  # 正在输出的文本值中尚未输出的位置
+        self._speaker = ""
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self.buffer += chunk
+        events: List[Dict[str, Any]] = []
+        while True:
+            if self._text_pos is None:
+                match = self._TEXT.search(self.buffer, self._pos)
+                if not match:
+                    break
+                speakers = list(self._SPEAKER.finditer(self.buffer, self._pos, match.start()))
+                if speakers:
+                    self._speaker = _decode(speakers[-1].group(1))
+                self._text_pos = match.end()
+            end, closed = _scan_string(self.buffer, self._text_pos)
+            delta = _decode(self.buffer[self._text_pos : end])
+            self._text_pos = end
+            if delta or closed:
+                events.append({"speaker": self._speaker, "delta": delta, "done": closed})
+            if not closed:
+                break
+            self._pos = end + 1
+            self._text_pos = None
+        return events
+
+
+def _scan_string(text: str, start: int) -> Tuple[int, bool]:
+    """从字符串值内部的 start 开始扫描
+
+    Returns:
+        (可安全解码的结束位置, 是否遇到了结束引号)；结束位置不会
+        截断转义序列。
+    """
+    i = start
+    while i < len(text):
+        ch = text[i]
+        if ch == "\\":
+            width = 6 if text[i + 1 : i + 2] == "u" else 2
+            if i + width > len(text):
+                return i, False
+            i += width
+            continue
+        if ch == '"':
+            return i, True
+        i += 1
+    return i, False
+
+
+def _decode(raw: str) -> str:
+    try:
+        return json.loads(f'"{raw}"')
+    except json.JSONDecodeError:
+        return raw
@@ -5,7 +5,6 @@
 import os
 import sys
 import asyncio
-import random
 from src.custom_rule_creator import create_custom_rule_enhanced
 
 # 添加项目根目录到Python路径
@@ -551,14 +550,14 @@ class CLIGame:
             context = RuleContext(
                 actor=npc,
                 action=decision.action.value,
-                game_state=self.game_manager.state.to_dict(),
+                game_state=self.game_manager.state,
             )
 
             # 检查是否触发规则
             triggered_rules = self.rule_executor.check_all_rules(context)
 
             for rule, probability in triggered_rules:
-                if random.random() < probability:
+                if self.rule_executor.rng.random() < probability:
                     print(f"\n⚡ {npc['name']} 触发了规则 [{rule.name}]!")
                     exec_result = self.rule_executor.execute_rule(rule, context)
 
@@ -639,7 +638,7 @@ class CLIGame:
         """备用对话生成"""
         npcs = self.game_manager.get_alive_npcs()
         if len(npcs) >= 2:
-            npc1, npc2 = random.sample(npcs, 2)
+            npc1, npc2 = self.game_manager.rng.dialogue.sample(npcs, 2)
 
             dialogues = [
                 f"{npc1['name']}: 这地方感觉不太对劲...",
@@ -6,11 +6,12 @@ import logging
 import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from src.api.deepseek_client import DeepSeekClient
 from src.api.deepseek_http_client import APIConfig
 from src.api.llm_client import LLMClient
+from src.utils.rng import default_rng
 
 logger = logging.getLogger(__name__)
 
@@ -56,9 +57,14 @@ class DialogueEntry:
 class DialogueSystem:
     """对话系统"""
 
-    def __init__(self, deepseek_client: LLMClient | None = None):
-        """Initialize dialogue system with an optional DeepSeek client."""
+    def __init__(
+        self,
+        deepseek_client: LLMClient | None = None,
+        rng: random.Random | None = None,
+    ):
+        """Initialize dialogue system with an optional DeepSeek client and RNG stream."""
         self.deepseek_client = deepseek_client or DeepSeekClient(APIConfig(mock_mode=True))
+        self.rng = default_rng(rng)
         self.api_client = self.deepseek_client  # backward compatibility
         self.dialogue_templates = {
             "fear": [
@@ -88,9 +94,16 @@ class DialogueSystem:
         }
 
     async def generate_dialogue(
-        self, npcs: List[Any], context: Dict[str, Any]
+        self,
+        npcs: List[Any],
+        context: Dict[str, Any],
+        on_delta: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
     ) -> List[Dict[str, str]]:
-        """生成NPC对话"""
+        """生成NPC对话
+
+        提供 on_delta 且客户端支持流式输出时，AI对话边生成边回调增量
+        （``{"speaker", "delta", "done"}``）。
+        """
         if len(npcs) < 2:
             return []
 
@@ -111,18 +124,35 @@ class DialogueSystem:
                     )
 
                 # 调用AI生成对话
-                dialogue = await self.deepseek_client.generate_dialogue(
+                request = dict(
                     npc_states=npc_states,
                     scene_context={
                         "time": context.get("time", "night"),
                         "recent_events": context.get("recent_events", []),
                     },
                 )
+                if on_delta is not None and hasattr(self.deepseek_client, "stream_dialogue"):
+                    dialogue = None
+                    async for event in self.deepseek_client.stream_dialogue(**request):
+                        if event["type"] == "result":
+                            dialogue = event["dialogue"]
+                        else:
+                            await on_delta(event)
+                    if dialogue is None:
+                        raise RuntimeError("流式对话没有返回完整对话")
+                else:
+                    dialogue = await self.deepseek_client.generate_dialogue(**request)
 
                 # 格式化返回
                 result = []
                 for turn in dialogue:
-                    result.append({"speaker": turn.speaker, "text": turn.text})
+                    # LLMClient 协议返回字典，兼容旧版返回对象的客户端
+                    if isinstance(turn, dict):
+                        result.append(
+                            {"speaker": turn.get("speaker", ""), "text": turn.get("text", "")}
+                        )
+                    else:
+                        result.append({"speaker": turn.speaker, "text": turn.text})
                 return result
             except Exception:
                 logger.exception("Failed to generate dialogue via AI, falling back to templates")
@@ -145,7 +175,7 @@ class DialogueSystem:
 
         # 选择对话模板
         templates = self.dialogue_templates[dialogue_type]
-        selected_templates = random.sample(templates, min(2, len(templates)))
+        selected_templates = self.rng.sample(templates, min(2, len(templates)))
 
         # 生成对话
         dialogue = []
@@ -202,8 +232,8 @@ class DialogueSystem:
         templates = self.dialogue_templates.get(template_key, [])
         if templates and len(npcs) >= 2:
             # 选择模板
-            selected_templates = random.sample(templates, min(2, len(templates)))
-            npc1, npc2 = random.sample(npcs, 2)
+            selected_templates = self.rng.sample(templates, min(2, len(templates)))
+            npc1, npc2 = self.rng.sample(npcs, 2)
 
             for template in selected_templates:
                 # 替换模板中的NPC名字
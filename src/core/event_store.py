@@ -0,0 +1,311 @@
+"""
+事件历史存储
+内存中只保留最近的事件（环形缓冲），并按回合、类型、参与者建立索引；
+超出容量的旧事件按顺序交给I/O线程追加写入磁盘（JSONL），需要完整历史时再读回
+"""
+import asyncio
+import json
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Union,
+    overload,
+)
+
+from ..utils.io_executor import io_executor
+
+# 内存中默认保留的事件数量
+DEFAULT_CAPACITY = 2000
+
+# 事件追加监听器
+EventListener = Callable[[Any], None]
+
+# 事件 meta 中表示参与者名字的字段
+PARTICIPANT_KEYS = ("actor", "target", "speaker", "npc", "finder", "investigator")
+
+
+def _get(event: Any, key: str, default: Any = None) -> Any:
+    """同时兼容事件字典和 Event 对象的字段读取"""
+    if isinstance(event, dict):
+        return event.get(key, default)
+    return getattr(event, key, default)
+
+
+def event_type(event: Any) -> Optional[str]:
+    """事件类型的字符串值（枚举取 value）"""
+    value = _get(event, "type")
+    return getattr(value, "value", value)
+
+
+def event_turn(event: Any) -> int:
+    return _get(event, "turn", 0) or 0
+
+
+def event_participants(event: Any) -> List[str]:
+    """事件涉及的NPC名字（去重，保持顺序）"""
+    meta = _get(event, "meta") or {}
+    names: List[str] = []
+    for key in PARTICIPANT_KEYS:
+        name = meta.get(key) if isinstance(meta, dict) else None
+        if isinstance(name, str) and name not in names:
+            names.append(name)
+    return names
+
+
+def _read_jsonl(path: Path, limit: int) -> List[Any]:
+    events: List[Any] = []
+    if not path.exists():
+        return events
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if len(events) >= limit:
+                break
+            if line.strip():
+                events.append(json.loads(line))
+    return events
+
+
+def _serializable(event: Any) -> Any:
+    return event.to_dict() if hasattr(event, "to_dict") else event
+
+
+class EventStore:
+    """有界、带索引的事件历史
+
+    对外表现为只追加的序列：支持 append/extend、len、迭代、下标和切片
+    （只覆盖内存中的事件），因此可以替代原来的 events_history 列表。
+
+    Args:
+        capacity: 内存中保留的最大事件数，None 表示不限
+        spill_path: 淘汰事件写入的 JSONL 文件，None 表示直接丢弃
+    """
+
+    def __init__(
+        self,
+        events: Optional[Iterable[Any]] = None,
+        capacity: Optional[int] = DEFAULT_CAPACITY,
+        spill_path: Optional[Union[str, Path]] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.spilled = 0  # 已淘汰（写盘或丢弃）的事件数
+        self._events: Deque[Any] = deque()
+        self._by_turn: Dict[int, Deque[Any]] = {}
+        self._by_type: Dict[Optional[str], Deque[Any]] = {}
+        self._by_actor: Dict[str, Deque[Any]] = {}
+        self.listeners: List[EventListener] = []  # 每追加一个事件调用一次
+        if events:
+            self.extend(events)
+
+    # ========== 序列接口 ==========
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def __bool__(self) -> bool:
+        return bool(self._events)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._events)
+
+    def __reversed__(self) -> Iterator[Any]:
+        return reversed(self._events)
+
+    @overload
+    def __getitem__(self, index: int) -> Any: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Any]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self._events))
+            if step == 1 and stop == len(self._events):
+                # 取尾部（如 [-5:]）时从右侧遍历，避免复制整个缓冲
+                tail = list(islice(reversed(self._events), max(0, stop - start)))
+                tail.reverse()
+                return tail
+            return list(self._events)[index]
+        return self._events[index]
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, EventStore):
+            return list(self._events) == list(other._events)
+        if isinstance(other, list):
+            return list(self._events) == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"EventStore(len={len(self)}, spilled={self.spilled})"
+
+    def append(self, event: Any) -> None:
+        """追加事件并更新索引，超出容量时淘汰最旧的事件"""
+        self._events.append(event)
+        self._index(self._by_turn, event_turn(event), event)
+        self._index(self._by_type, event_type(event), event)
+        for name in event_participants(event):
+            self._index(self._by_actor, name, event)
+        for listener in self.listeners:
+            listener(event)
+        if self.capacity is not None and len(self._events) > self.capacity:
+            # 一次多淘汰一批，摊薄写盘的开销
+            self._evict(len(self._events) - self.capacity + self.capacity // 10)
+
+    def subscribe(self, listener: EventListener) -> None:
+        """注册事件追加监听器（重复注册会被忽略）"""
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def extend(self, events: Iterable[Any]) -> None:
+        for event in events:
+            self.append(event)
+
+    def clear(self) -> None:
+        self._events.clear()
+        self._by_turn.clear()
+        self._by_type.clear()
+        self._by_actor.clear()
+
+    def reset(self, events: Iterable[Any]) -> None:
+        """用新的事件序列替换内存中的事件（保留容量和写盘配置）"""
+        events = list(events)
+        self.clear()
+        self.extend(events)
+
+    def to_list(self) -> List[Any]:
+        """内存中事件的列表副本（不含已写盘的旧事件）"""
+        return list(self._events)
+
+    def history(self) -> List[Any]:
+        """完整历史的列表（用于存档），同步等待读回写盘的旧事件
+
+        不要在I/O线程中调用；异步代码使用 ahistory。
+        """
+        recent, spilled = self.to_list(), self.spilled
+        return self._read_spilled(spilled).result() + recent
+
+    async def ahistory(self) -> List[Any]:
+        """完整历史的列表，读盘在I/O线程中进行
+
+        先在调用方取内存事件的快照，再只读回快照之前写盘的事件，
+        等待期间新淘汰的事件不会重复出现。
+        """
+        recent, spilled = self.to_list(), self.spilled
+        return await asyncio.wrap_future(self._read_spilled(spilled)) + recent
+
+    # ========== 查询 ==========
+
+    def recent(self, count: int) -> List[Any]:
+        """最近的 count 个事件，按时间顺序"""
+        return self[-count:] if count > 0 else []
+
+    def for_turn(self, turn: int) -> List[Any]:
+        """某回合的事件，按时间顺序"""
+        return list(self._by_turn.get(turn, ()))
+
+    def by_type(self, type_: Any) -> List[Any]:
+        """某类型的事件（接受 EventType 或字符串）"""
+        return list(self._by_type.get(getattr(type_, "value", type_), ()))
+
+    def by_actor(self, name: str) -> List[Any]:
+        """涉及某个NPC的事件（作为行动者、目标、说话者等）"""
+        return list(self._by_actor.get(name, ()))
+
+    def query(
+        self,
+        turn: Optional[int] = None,
+        type_: Any = None,
+        actor: Optional[str] = None,
+    ) -> List[Any]:
+        """按回合、类型、参与者组合过滤，从最小的索引桶开始"""
+        buckets = []
+        if turn is not None:
+            buckets.append(self._by_turn.get(turn, ()))
+        if type_ is not None:
+            buckets.append(self._by_type.get(getattr(type_, "value", type_), ()))
+        if actor is not None:
+            buckets.append(self._by_actor.get(actor, ()))
+        if not buckets:
+            return list(self._events)
+
+        smallest = min(buckets, key=len)
+        type_value = getattr(type_, "value", type_)
+        return [
+            event
+            for event in smallest
+            if (turn is None or event_turn(event) == turn)
+            and (type_ is None or event_type(event) == type_value)
+            and (actor is None or actor in event_participants(event))
+        ]
+
+    def flush(self) -> None:
+        """等待排队中的旧事件写盘完成"""
+        if self.spill_path is not None:
+            io_executor.flush(self.spill_path)
+
+    def iter_all(self) -> Iterator[Any]:
+        """完整历史：先读回写盘的旧事件，再遍历内存中的事件"""
+        self.flush()
+        if self.spill_path and self.spill_path.exists():
+            with open(self.spill_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+        yield from self._events
+
+    # ========== 内部方法 ==========
+
+    def _read_spilled(self, limit: int) -> "Future[List[Any]]":
+        """排在已提交的写盘之后读回前 limit 个旧事件"""
+        if self.spill_path is None or limit <= 0:
+            done: "Future[List[Any]]" = Future()
+            done.set_result([])
+            return done
+        return io_executor.then(self.spill_path, lambda path: _read_jsonl(path, limit))
+
+    @staticmethod
+    def _index(index: Dict[Any, Deque[Any]], key: Hashable, event: Any) -> None:
+        bucket = index.get(key)
+        if bucket is None:
+            bucket = index[key] = deque()
+        bucket.append(event)
+
+    @staticmethod
+    def _unindex(index: Dict[Any, Deque[Any]], key: Hashable, event: Any) -> None:
+        # 被淘汰的总是最旧的事件，它也是各索引桶中最靠前的一个
+        bucket = index.get(key)
+        if bucket and bucket[0] is event:
+            bucket.popleft()
+            if not bucket:
+                del index[key]
+
+    def _evict(self, count: int) -> None:
+        evicted = [self._events.popleft() for _ in range(count)]
+        for event in evicted:
+            self._unindex(self._by_turn, event_turn(event), event)
+            self._unindex(self._by_type, event_type(event), event)
+            for name in event_participants(event):
+                self._unindex(self._by_actor, name, event)
+        self.spilled += count
+
+        if self.spill_path is None:
+            return
+        # 在调用方序列化（事件之后可能被修改），写盘交给I/O线程批量追加
+        io_executor.append_line(
+            self.spill_path,
+            "\n".join(
+                json.dumps(_serializable(event), ensure_ascii=False, default=str)
+                for event in evicted
+            ),
+        )
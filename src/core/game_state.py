@@ -2,21 +2,35 @@
 游戏状态管理器
 负责管理整个游戏的状态，包括积分、规则、NPC等
 """
-from typing import Dict, List, Optional, Any, Literal, cast
+from typing import Dict, Iterator, List, Mapping, Optional, Any, Literal, cast
 from datetime import datetime
 from dataclasses import dataclass, field, asdict, is_dataclass
+import asyncio
 import json
 from pathlib import Path
 
 from .enums import GamePhase, GameMode
 from .environment import EnvironmentService
+from .llm_fanout import DEFAULT_LLM_CONCURRENCY
+from .event_store import DEFAULT_CAPACITY, EventStore, event_type
+from .npc_record import NPCRecord, as_record
+from .npc_store import NPCStore, RecordTracker
+from .relationship_graph import TALK_BONUS, RelationshipGraph
+from .state_delta import DirtyTracker
+from .rule_index import RuleIndex
 from ..models.rule import Rule, TriggerCondition, RuleEffect
+from ..utils.io_executor import io_executor
+from ..utils.rng import GameRNG
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from src.ai.turn_pipeline import AITurnPipeline
 
 
+# 不计入脏字段的属性：事件历史单独推送，跟踪器本身不是状态
+UNTRACKED_FIELDS = frozenset(("events_history", "dirty"))
+
+
 @dataclass
 class GameState:
     """游戏状态数据类"""
@@ -44,7 +58,7 @@ class GameState:
 
     # 规则
     active_rules: List[str] = field(default_factory=list)
-    events_history: List[Dict[str, Any]] = field(default_factory=list)
+    events_history: EventStore = field(default_factory=EventStore)
 
     # 兼容旧字段
     @property
@@ -59,7 +73,7 @@ class GameState:
         self.time_of_day = value
 
     @property
-    def event_log(self) -> List[Dict[str, Any]]:
+    def event_log(self) -> EventStore:
         """向后兼容的事件日志字段"""
         return self.events_history
 
@@ -67,6 +81,24 @@ class GameState:
     def event_log(self, value: List[Dict[str, Any]]):
         self.events_history = value
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        # 脏字段跟踪器在初始化的最后才创建，构造过程中的赋值不会被记录
+        tracker = self.__dict__.get("dirty")
+        if tracker is not None and name not in UNTRACKED_FIELDS:
+            tracker.mark_field(name)
+        # 用列表整体替换事件历史时原地重置，保留存储的容量、写盘配置和监听器
+        if name == "events_history":
+            current = self.__dict__.get("events_history")
+            if not isinstance(value, EventStore):
+                if isinstance(current, EventStore):
+                    current.reset(value)
+                    return
+                value = EventStore(value)
+            elif isinstance(current, EventStore) and value is not current:
+                for listener in current.listeners:
+                    value.subscribe(listener)
+        object.__setattr__(self, name, value)
+
     @property
     def turn(self) -> int:
         """向后兼容的回合属性"""
@@ -82,6 +114,9 @@ class GameState:
     # 游戏设置
     difficulty: str = "normal"  # easy, normal, hard
 
+    # 本回合被修改的字段（用于增量推送，不参与序列化和比较）
+    dirty: DirtyTracker = field(default_factory=DirtyTracker, repr=False, compare=False)
+
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式"""
         return {
@@ -96,14 +131,85 @@ class GameState:
             "time_of_day": self.time_of_day,
             "current_time": self.current_time,
             "active_rules": self.active_rules,
-            "events_history": self.events_history,
+            "events_history": self.events_history.to_list(),
             "total_fear_gained": self.total_fear_gained,
             "npcs_died": self.npcs_died,
             "rules_triggered": self.rules_triggered,
             "difficulty": self.difficulty,
-            "npcs": self.npcs,
+            "npcs": {
+                npc_id: npc.to_dict() if isinstance(npc, NPCRecord) else npc
+                for npc_id, npc in self.npcs.items()
+            },
         }
 
+    def view(self) -> "GameStateView":
+        """只读的惰性视图，供规则判定读取少量字段"""
+        return GameStateView(self)
+
+
+class GameStateView(Mapping[str, Any]):
+    """GameState 的只读惰性视图
+
+    按 to_dict 的键提供映射接口（get/下标/in），也支持属性访问；
+    字段在读取时才从 GameState 取值，不复制NPC、规则和事件历史。
+    与 to_dict 不同，npcs、active_rules 和 events_history 返回的是
+    实时对象本身，调用方不应修改。
+    """
+
+    __slots__ = ("_state",)
+
+    KEYS = (
+        "game_id",
+        "started_at",
+        "current_turn",
+        "turn",
+        "day",
+        "fear_points",
+        "phase",
+        "mode",
+        "time_of_day",
+        "current_time",
+        "active_rules",
+        "events_history",
+        "total_fear_gained",
+        "npcs_died",
+        "rules_triggered",
+        "difficulty",
+        "npcs",
+    )
+
+    def __init__(self, state: GameState) -> None:
+        object.__setattr__(self, "_state", state)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.KEYS:
+            raise KeyError(key)
+        value = getattr(self._state, key)
+        if key in ("phase", "mode"):
+            return value.value
+        if key == "started_at":
+            return value.isoformat()
+        return value
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._state, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("GameStateView 是只读视图")
+
+    def __repr__(self) -> str:
+        return f"GameStateView({self._state.game_id!r}, turn={self._state.turn})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """需要独立快照时再完整序列化"""
+        return self._state.to_dict()
+
 
 class GameStateManager:
     """游戏状态管理器"""
@@ -114,16 +220,29 @@ class GameStateManager:
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(parents=True, exist_ok=True)
 
+        self.rules_version = 0  # 规则修改版本号，规则索引据此判断是否重建
+        self.relationships = RelationshipGraph()  # NPC关系图，随交谈事件增量更新
         self.state: Optional[GameState] = None
+        self.rule_index = RuleIndex()  # 规则分发索引
         self.rules: List[Any] = []  # 将存储Rule对象
-        self.npcs: List[Dict[str, Any]] = []
+        self.npc_store = NPCStore()  # NPC的唯一存储，带ID/名字索引和存活集合
+        # NPC记录的写入记录到当前状态的脏字段跟踪器，并同步存储的存活集合和位置索引
+        self._npc_tracker = RecordTracker(self.npc_store, self._dirty_tracker)
         self.spirits: List[Dict[str, Any]] = []
         self.game_log: List[str] = []
         self.environment = EnvironmentService()
 
         # 配置
         self.config = config or {}
+
+        # 随机数服务，配置中的 seed 用于复现对局
+        self.rng = GameRNG(self.config.get("seed"))
         self.ai_enabled = self.config.get("ai_enabled", False)
+        # 本局同时进行的LLM请求上限，回合内并发的请求共用
+        self.llm_semaphore = asyncio.Semaphore(
+            self.config.get("llm_concurrency", DEFAULT_LLM_CONCURRENCY)
+        )
+        self.echo_log = self.config.get("echo_log", True)  # 日志是否同时输出到控制台
         self.ai_pipeline: Optional["AITurnPipeline"] = None
 
         # 事件监听器
@@ -135,6 +254,106 @@ class GameStateManager:
             "fear_gained": [],
         }
 
+    @property
+    def rules(self) -> List[Any]:
+        """规则对象列表"""
+        return self._rules
+
+    @rules.setter
+    def rules(self, value: List[Any]) -> None:
+        # 直接替换规则列表时重建索引
+        self._rules = value
+        self.mark_rules_changed()
+        self.sync_rule_index()
+
+    @property
+    def state(self) -> Optional[GameState]:
+        """当前游戏状态"""
+        return self._state
+
+    @state.setter
+    def state(self, value: Optional[GameState]) -> None:
+        # 外部替换游戏状态时同样需要监听事件，保持关系图增量更新
+        self._state = value
+        self.mark_rules_changed()  # 激活规则列表随状态一起替换
+        if value is not None:
+            value.events_history.subscribe(self._on_event_appended)
+
+    def _dirty_tracker(self) -> Optional[DirtyTracker]:
+        """当前状态的脏字段跟踪器"""
+        return self._state.dirty if self._state else None
+
+    def _track_npc(self, npc: Any) -> None:
+        """NPC记录的字段写入通知NPC跟踪器（记录脏字段、同步存活集合和位置索引）"""
+        if isinstance(npc, NPCRecord):
+            npc.track(self._npc_tracker)
+
+    def _on_event_appended(self, event: Any) -> None:
+        """事件写入历史时增量更新关系图"""
+        if event_type(event) != "npc_action":
+            return
+        if isinstance(event, dict):
+            meta = event.get("meta") or {}
+        else:
+            meta = getattr(event, "meta", None) or {}
+        if meta.get("action") != "talk" or not meta.get("actor") or not meta.get("target"):
+            return
+        actor = self.get_npc_by_name(meta["actor"])
+        target = self.get_npc_by_name(meta["target"])
+        if actor is not None and target is not None:
+            self.relationships.record_interaction(actor["id"], target["id"], TALK_BONUS)
+
+    def get_relationships(self, npc_id: str) -> Dict[str, int]:
+        """NPC对其他NPC的关系（O(1)，未记录的关系为中立值）"""
+        return self.relationships.of(npc_id)
+
+    def _bind_relationships(self, npc: Any) -> None:
+        """让NPC数据的 relationships 字段直接引用关系图中的行"""
+        if isinstance(npc, (dict, NPCRecord)) and npc.get("id") is not None:
+            npc["relationships"] = self.relationships.bind(
+                npc["id"], npc.get("relationships")
+            )
+
+    @property
+    def npcs(self) -> List[Dict[str, Any]]:
+        """NPC列表（按加入顺序的只读视图，修改请使用 add_npc/update_npc/remove_npc）"""
+        return self.npc_store.all()
+
+    @npcs.setter
+    def npcs(self, value: List[Dict[str, Any]]) -> None:
+        # NPC字典转换为紧凑记录，记录和模型对象原样保存
+        records = [as_record(npc) for npc in value]
+        self.npc_store.rebuild(records)
+        for npc in records:
+            self._bind_relationships(npc)
+            self._track_npc(npc)
+
+    def get_rule(self, rule_id: str) -> Optional[Any]:
+        """根据ID获取已加入游戏的规则（O(1)）"""
+        self.sync_rule_index()
+        return self.rule_index.get(rule_id)
+
+    def sync_rule_index(self) -> RuleIndex:
+        """确保规则索引与规则列表、激活列表一致"""
+        self.rule_index.sync(
+            self._rules, self.state.active_rules if self.state else [], self.rules_version
+        )
+        return self.rule_index
+
+    def mark_rules_changed(self) -> None:
+        """就地替换规则列表或激活列表中的元素后调用，下次查询时重建规则索引
+
+        规则字段的修改由规则自身记录（见 ``Rule.revision``），不需要调用。
+        """
+        self.rules_version += 1
+
+    def _mark_rule_index_synced(self) -> None:
+        """增量更新索引后记录新版本，避免下一次查询重建"""
+        self.mark_rules_changed()
+        self.rule_index.mark_synced(
+            self._rules, self.state.active_rules if self.state else [], self.rules_version
+        )
+
     def new_game(
         self, game_id: Optional[str] = None, config: Optional[Dict[str, Any]] = None
     ) -> GameState:
@@ -148,6 +367,10 @@ class GameStateManager:
             game_id = f"game_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         config = config or {}
 
+        seed = config.get("seed", self.config.get("seed"))
+        if seed is not None:
+            self.rng.seed(seed)
+
         self.state = GameState(
             game_id=game_id,
             fear_points=config.get("initial_fear_points", 1000),
@@ -155,9 +378,11 @@ class GameStateManager:
             phase=GamePhase.SETUP,
             mode=GameMode.BACKSTAGE,
         )
+        self._configure_event_store()
         self.state.turn = self.state.current_turn
         self.state.day = 1
         self.state.npcs = {}
+        self.relationships.clear()
 
         self.rules = []
         self.npcs = []
@@ -173,13 +398,30 @@ class GameStateManager:
 
         return self.state
 
+    def _configure_event_store(self) -> None:
+        """按配置设置事件历史的内存容量和旧事件的写盘位置
+
+        新游戏和恢复存档都会清除同ID遗留的写盘文件：恢复存档时完整历史来自
+        存档本身，随后超出容量的部分会重新写盘，不能混入之前会话的事件。
+        删除排在之前会话已提交的写入之后，由I/O线程执行，调用方不等待。
+        """
+        if self.state is None:
+            return
+        store = self.state.events_history
+        store.capacity = self.config.get("event_history_capacity", DEFAULT_CAPACITY)
+        if not self.config.get("event_spill", True):
+            store.spill_path = None
+            return
+        store.spill_path = self.save_dir / "events" / f"{self.state.game_id}.jsonl"
+        io_executor.remove(store.spill_path)
+
     def _serialize_npc(self, npc: Any) -> Any:
         """序列化NPC对象为可保存的字典格式
 
         支持 dataclass、Pydantic 模型、字典、列表及普通对象，递归处理嵌套结构。
         """
 
-        if isinstance(npc, dict):
+        if isinstance(npc, (dict, NPCRecord)):
             return {key: self._serialize_npc(value) for key, value in npc.items()}
         if isinstance(npc, list):
             return [self._serialize_npc(item) for item in npc]
@@ -223,6 +465,16 @@ class GameStateManager:
         else:
             return {"raw": str(rule)}  # 最后的选择：转换为字符串
 
+    def _deserialize_rule(self, data: Any) -> Any:
+        """将存档中的规则字典还原为 Rule 对象，无法还原时保持原样（不进入规则索引）"""
+        if not isinstance(data, dict):
+            return data
+        try:
+            return Rule(**data)
+        except Exception as e:
+            self.log(f"规则 {data.get('id', '未知')} 无法还原: {e}")
+            return data
+
     def load_game(self, game_id: str) -> bool:
         """加载游戏存档"""
         save_file = self.save_dir / f"{game_id}.json"
@@ -248,16 +500,22 @@ class GameStateManager:
                 rules_triggered=data["state"]["rules_triggered"],
                 difficulty=data["state"]["difficulty"],
             )
+            self._configure_event_store()
+            # 关系以存档中NPC数据里的关系为准，恢复事件历史时不重复累计
+            self.relationships.clear()
+            self.npcs = []
             self.state.turn = self.state.current_turn
             self.state.day = data["state"].get("day", 1)
             self.state.active_rules = data["state"].get("active_rules", [])
             self.state.events_history = data["state"].get("events_history", [])
 
-            self.rules = data.get("rules", [])
+            self.rules = [self._deserialize_rule(rule) for rule in data.get("rules", [])]
             self.npcs = list(data.get("state", {}).get("npcs", {}).values())
-            self.state.npcs = data.get("state", {}).get("npcs", {})
+            self.state.npcs = {npc["id"]: npc for npc in self.npcs}
             self.spirits = data.get("spirits", [])
             self.game_log = data.get("game_log", [])
+            if "rng" in data:
+                self.rng.load_dict(data["rng"])
 
             self.log(f"游戏读取成功 - 第{self.current_turn}回合")
             return True
@@ -295,6 +553,8 @@ class GameStateManager:
 
             state_data = self.state.to_dict()
             state_data["npcs"] = serialized_state_npcs
+            # 存档保存完整历史，包括已写盘的旧事件
+            state_data["events_history"] = self.state.events_history.history()
 
             # 序列化规则
             serialized_rules = []
@@ -307,6 +567,7 @@ class GameStateManager:
                 "npcs": serialized_npcs,
                 "spirits": self.spirits,
                 "game_log": self.game_log[-100:],  # 只保存最近100条日志
+                "rng": self.rng.to_dict(),
                 "saved_at": datetime.now().isoformat(),
             }
 
@@ -377,58 +638,158 @@ class GameStateManager:
         Returns:
             bool: 是否添加成功
         """
+        self.sync_rule_index()
         self.rules.append(rule)
         if self.state:
             self.state.active_rules.append(rule.id)
+            self.rule_index.add(rule)
+        self._mark_rule_index_synced()
         self.log(f"规则 [{rule.name}] 已添加到游戏中")
         return True
 
-    def add_npc(self, npc: Dict[str, Any]):
-        """添加NPC"""
-        self.npcs.append(npc)
+    def toggle_rule(self, rule_id: str) -> bool:
+        """切换规则激活状态
+
+        Returns:
+            bool: 切换后的激活状态，规则不存在时返回 False
+        """
+        self.sync_rule_index()
+        rule = self.rule_index.get(rule_id)
+        if rule is None:
+            return False
+        rule.active = not rule.active
+        self.rule_index.reindex(rule)
+        self._mark_rule_index_synced()
+        self.log(f"规则 [{rule.name}] 已{'启用' if rule.active else '停用'}")
+        return rule.active
+
+    def update_rule(self, rule_id: str, updates: Dict[str, Any]) -> Optional[Any]:
+        """更新规则属性（用于规则升级等会改变触发条件的修改）
+
+        Args:
+            rule_id: 规则ID
+            updates: 要更新的字段，如 ``level``、``trigger``、``effect``
+
+        Returns:
+            更新后的规则，规则不存在时返回 None
+        """
+        self.sync_rule_index()
+        rule = self.rule_index.get(rule_id)
+        if rule is None:
+            return None
+        for key, value in updates.items():
+            setattr(rule, key, value)
+        self.rule_index.reindex(rule)
+        self._mark_rule_index_synced()
+        return rule
+
+    def add_npc(self, npc: Dict[str, Any]) -> Any:
+        """添加NPC
+
+        NPC字典会转换为紧凑的 NPCRecord 保存，之后请通过返回值、get_npc
+        或 update_npc 访问，传入的字典不再与游戏状态关联。
+
+        Returns:
+            实际保存的NPC记录
+        """
+        npc = as_record(npc)
+        self._bind_relationships(npc)
+        self._track_npc(npc)
+        self.npc_store.add(npc)
         if self.state:
             npc_id = cast(str, npc.get("id"))
             self.state.npcs[npc_id] = npc
+            self.state.dirty.npc_added(npc_id)
         self.log(f"NPC [{npc['name']}] 加入游戏")
+        return npc
 
     def update_npc(self, npc_id: str, updates: Dict[str, Any]):
         """更新NPC状态"""
-        for npc in self.npcs:
-            if npc.get("id") == npc_id:
-                npc.update(updates)
-                break
-        if self.state and npc_id in self.state.npcs:
-            self.state.npcs[npc_id].update(updates)
+        npc = self.npc_store.update(npc_id, updates)
+        if self.state:
+            state_npc = self.state.npcs.get(npc_id)
+            # 状态中的NPC通常与存储中的是同一个对象，无需重复更新
+            if state_npc is not None and state_npc is not npc:
+                state_npc.update(updates)
+
+    def get_npc(self, npc_id: str) -> Optional[Dict[str, Any]]:
+        """根据ID获取NPC（O(1)）"""
+        return self.npc_store.get(npc_id)
+
+    def get_npc_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """根据名字获取NPC（O(1)）"""
+        return self.npc_store.get_by_name(name)
+
+    def sync_npcs_from_state(self) -> None:
+        """以 state.npcs 为准同步NPC存储
+
+        存储与 state.npcs 已共享同一批记录时只做一次身份比较；外部直接替换了
+        state.npcs（如读档）时重建存储，并把其中的字典替换为记录。
+        """
+        if self.state is None:
+            return
+        state_npcs = self.state.npcs
+        if len(state_npcs) == len(self.npc_store) and all(
+            self.npc_store.get(npc_id) is npc for npc_id, npc in state_npcs.items()
+        ):
+            return
+        records: Dict[str, Any] = {}
+        for npc_id, npc in state_npcs.items():
+            record = as_record(npc)
+            if isinstance(record, NPCRecord):
+                record.setdefault("id", npc_id)
+            records[npc_id] = record
+        self.npcs = list(records.values())
+        self.state.npcs = records
+
+    def refresh_npc(self, npc_id: Optional[str] = None) -> None:
+        """同步存活状态和位置索引
+
+        NPC记录的 hp/alive/location 写入会自动同步，只有直接修改了未绑定
+        跟踪器的NPC对象（如模型实例）时才需要调用。
+        """
+        self.npc_store.refresh(npc_id)
 
     def remove_npc(self, npc_id: str):
         """移除NPC（死亡）"""
         if self.state is None:
             raise RuntimeError("游戏未初始化")
         state: GameState = self.state
-        for i, npc in enumerate(self.npcs):
-            if npc.get("id") == npc_id:
-                dead_npc = self.npcs.pop(i)
-                state.npcs.pop(npc_id, None)
-                state.npcs_died += 1
-                self.log(f"NPC [{dead_npc['name']}] 已死亡")
-                self._trigger_event("npc_died", {"npc": dead_npc})
-                break
+        dead_npc = self.npc_store.remove(npc_id)
+        if dead_npc is None:
+            return
+        state.npcs.pop(npc_id, None)
+        state.dirty.npc_removed(npc_id)
+        if isinstance(dead_npc, NPCRecord):
+            dead_npc.track(None)
+        state.npcs_died += 1
+        self.log(f"NPC [{dead_npc['name']}] 已死亡")
+        self._trigger_event("npc_died", {"npc": dead_npc})
 
     def get_active_npcs(self) -> List[Dict[str, Any]]:
-        """获取存活的NPC列表"""
-        return [npc for npc in self.npcs if npc.get("hp", 0) > 0]
+        """获取存活的NPC列表（增量维护的缓存，调用方不应修改）"""
+        return self.npc_store.active()
 
     def get_npcs_in_location(self, location: str) -> List[Dict[str, Any]]:
-        """获取指定位置的NPC"""
-        return [npc for npc in self.npcs if npc.get("location") == location]
+        """获取指定位置的存活NPC（基于位置索引）"""
+        return self.npc_store.in_location(location)
+
+    def count_npcs_in_location(self, location: str) -> int:
+        """获取指定位置的存活NPC数量（O(1)）"""
+        return self.npc_store.count_in_location(location)
+
+    def move_npc(self, npc_id: str, location: str) -> None:
+        """移动（或传送）NPC，位置索引随之更新"""
+        self.update_npc(npc_id, {"location": location})
+
+    def attach_map(self, map_manager: Any) -> None:
+        """挂载地图，区域的NPC列表改为从位置索引读取"""
+        self.map_manager = map_manager
+        map_manager.bind_occupancy(self.npc_store.ids_in_location)
 
     def get_alive_npcs(self) -> List[Dict[str, Any]]:
-        """获取仍然存活且未被标记为死亡的NPC"""
-        return [
-            npc
-            for npc in self.npcs
-            if npc.get("hp", 0) > 0 and npc.get("alive", True) is not False
-        ]
+        """获取仍然存活且未被标记为死亡的NPC（增量维护的缓存，调用方不应修改）"""
+        return self.npc_store.alive()
 
     def get_active_rules(self) -> List[Any]:
         """获取激活的规则列表"""
@@ -439,7 +800,8 @@ class GameStateManager:
         timestamp = datetime.now().strftime("%H:%M:%S")
         log_entry = f"[{timestamp}] {message}"
         self.game_log.append(log_entry)
-        print(log_entry)  # 同时输出到控制台
+        if self.echo_log:
+            print(log_entry)  # 同时输出到控制台
 
     def get_time_display(self) -> str:
         """获取时间显示文本"""
@@ -484,7 +846,7 @@ class GameStateManager:
             return True
 
         # 所有NPC死亡
-        if len(self.get_active_npcs()) == 0:
+        if self.npc_store.count_active() == 0:
             return True
 
         # 回合数超过限制（可配置）
@@ -505,13 +867,17 @@ class GameStateManager:
             "npcs_died": state.npcs_died,
             "rules_created": len(self.rules),
             "rules_triggered": state.rules_triggered,
-            "survival_rate": f"{len(self.get_active_npcs())}/{len(self.npcs)}",
+            "survival_rate": f"{self.npc_store.count_active()}/{len(self.npc_store)}",
         }
 
     # ========== AI集成方法 ==========
 
-    async def init_ai_pipeline(self):
-        """初始化AI管线"""
+    async def init_ai_pipeline(self, llm_client=None):
+        """初始化AI管线
+
+        Args:
+            llm_client: 可注入的DeepSeek客户端，默认新建（HTTP连接使用进程共享的连接池）
+        """
         if self.ai_enabled:
             try:
                 from src.api.deepseek_client import DeepSeekClient
@@ -519,8 +885,7 @@ class GameStateManager:
                 from src.ai.turn_pipeline import AITurnPipeline
 
                 # 创建DeepSeek客户端
-                api_config = APIConfig()
-                ds_client = DeepSeekClient(api_config, http_client=None)
+                ds_client = llm_client or DeepSeekClient(APIConfig())
 
                 # 创建AI管线
                 self.ai_pipeline = AITurnPipeline(self, ds_client)
@@ -595,9 +960,7 @@ class GameStateManager:
             return {}
 
         # 获取最近事件
-        recent_events = (
-            self.state.events_history[-5:] if self.state.events_history else []
-        )
+        recent_events = self.state.events_history.recent(5)
         recent_event_descriptions = []
         for event in recent_events:
             if isinstance(event, dict):
@@ -670,12 +1033,13 @@ class GameStateManager:
                 conditions.append("深夜时分")
 
             # 生存状况
-            alive_count = len(self.get_active_npcs())
+            active_npcs = self.get_active_npcs()
+            alive_count = len(active_npcs)
             if alive_count <= 2:
                 conditions.append("仅剩少数幸存者")
 
             # 恐惧等级
-            avg_fear = sum(npc.get("fear", 0) for npc in self.get_active_npcs()) / max(
+            avg_fear = sum(npc.get("fear", 0) for npc in active_npcs) / max(
                 alive_count, 1
             )
             if avg_fear > 70:
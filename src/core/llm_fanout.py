@@ -0,0 +1,94 @@
+"""
+回合内LLM请求的并发调度
+把一个回合中的LLM请求组织成依赖图：互不依赖的请求并发执行，
+每局游戏共用一个并发上限；结果按加入顺序返回，合并顺序与完成先后无关
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# 每局游戏默认同时进行的LLM请求数
+DEFAULT_LLM_CONCURRENCY = 4
+
+# 任务工厂：参数为已完成的依赖任务结果（按任务名）
+TaskFactory = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class LLMTaskGraph:
+    """一个回合内的LLM请求依赖图
+
+    Args:
+        limiter: 限制并发的信号量（通常每局游戏一个），None 表示不限
+    """
+
+    def __init__(self, limiter: Optional[asyncio.Semaphore] = None) -> None:
+        self.limiter = limiter
+        self._nodes: List[Tuple[str, TaskFactory, Tuple[str, ...], bool]] = []
+        self._names: set = set()
+
+    def add(
+        self,
+        name: str,
+        factory: TaskFactory,
+        deps: Sequence[str] = (),
+        limited: bool = True,
+    ) -> None:
+        """加入一个任务
+
+        Args:
+            name: 任务名，结果以此为键
+            factory: 接收依赖结果并返回协程的函数
+            deps: 依赖的任务名，必须已经加入
+            limited: 是否占用并发名额（不调用LLM的本地计算设为 False）
+        """
+        if name in self._names:
+            raise ValueError(f"重复的任务名: {name}")
+        missing = [dep for dep in deps if dep not in self._names]
+        if missing:
+            raise ValueError(f"任务 {name} 依赖未定义的任务: {missing}")
+        self._names.add(name)
+        self._nodes.append((name, factory, tuple(deps), limited))
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    async def run(self) -> Dict[str, Any]:
+        """执行全部任务，返回按加入顺序排列的结果
+
+        任一任务失败时取消尚未完成的任务并抛出该异常。
+        """
+        tasks: Dict[str, "asyncio.Task[Any]"] = {}
+        for name, factory, deps, limited in self._nodes:
+            tasks[name] = asyncio.ensure_future(
+                self._run_node(factory, [(dep, tasks[dep]) for dep in deps], limited)
+            )
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in tasks.items()}
+
+    async def _run_node(
+        self,
+        factory: TaskFactory,
+        deps: List[Tuple[str, "asyncio.Task[Any]"]],
+        limited: bool,
+    ) -> Any:
+        results = {}
+        for name, task in deps:
+            results[name] = await task
+        if limited and self.limiter is not None:
+            async with self.limiter:
+                return await factory(results)
+        return await factory(results)
+
+
+async def gather_limited(
+    coros: Sequence[Awaitable[Any]], limiter: Optional[asyncio.Semaphore] = None
+) -> List[Any]:
+    """并发执行一组互不依赖的请求，结果顺序与输入一致"""
+    graph = LLMTaskGraph(limiter)
+    for i, coro in enumerate(coros):
+        graph.add(str(i), lambda _results, coro=coro: coro)
+    return list((await graph.run()).values())
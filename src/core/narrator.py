@@ -6,11 +6,12 @@ import logging
 import random
 from dataclasses import dataclass
 from enum import Enum
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 from src.api.deepseek_client import DeepSeekClient
 from src.api.deepseek_http_client import APIConfig
 from src.api.llm_client import LLMClient
+from src.utils.rng import default_rng
 
 logger = logging.getLogger(__name__)
 
@@ -46,9 +47,14 @@ class GameEvent:
 class Narrator:
     """叙事生成器"""
 
-    def __init__(self, deepseek_client: LLMClient | None = None):
-        """Initialize the narrator with an optional DeepSeek client."""
+    def __init__(
+        self,
+        deepseek_client: LLMClient | None = None,
+        rng: random.Random | None = None,
+    ):
+        """Initialize the narrator with an optional DeepSeek client and RNG stream."""
         self.deepseek_client = deepseek_client or DeepSeekClient(APIConfig(mock_mode=True))
+        self.rng = default_rng(rng)
         self.api_client = self.deepseek_client
         self.style: NarrativeStyle = NarrativeStyle.DEFAULT
         self.narrative_templates = {
@@ -80,9 +86,16 @@ class Narrator:
         self.style = style
 
     async def generate_narrative(
-        self, events: List[Dict[str, Any]], game_state: Any
+        self,
+        events: List[Dict[str, Any]],
+        game_state: Any,
+        survivor_count: int = 0,
+        on_delta: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
     ) -> str:
-        """生成叙事文本"""
+        """生成叙事文本
+
+        提供 on_delta 且客户端支持流式输出时，AI叙事边生成边回调增量。
+        """
         if self.deepseek_client:
             # 使用AI生成叙事
             try:
@@ -107,12 +120,19 @@ class Narrator:
                     if isinstance(game_state, dict)
                     else getattr(game_state, "time_of_day", None)
                 )
-                narrative = await self.deepseek_client.generate_narrative_text(
+                request = dict(
                     events=event_descriptions,
                     time_of_day=time_of_day,
+                    survivor_count=survivor_count,
                     min_len=200,
                 )
-                return narrative
+                if on_delta is not None and hasattr(self.deepseek_client, "stream_narrative_text"):
+                    parts = []
+                    async for delta in self.deepseek_client.stream_narrative_text(**request):
+                        parts.append(delta)
+                        await on_delta({"delta": delta})
+                    return "".join(parts)
+                return await self.deepseek_client.generate_narrative_text(**request)
             except Exception:
                 logger.exception("Failed to generate narrative via AI, falling back to templates")
 
@@ -135,7 +155,7 @@ class Narrator:
             event_type = event.get("type", "unknown")
 
             if event_type == "npc_action":
-                template = random.choice(self.narrative_templates["npc_action"])
+                template = self.rng.choice(self.narrative_templates["npc_action"])
                 text = template.format(
                     npc=event.get("npc", "某人"),
                     action=event.get("action", "移动"),
@@ -144,12 +164,12 @@ class Narrator:
                 narrative_parts.append(text)
 
             elif event_type == "rule_triggered":
-                template = random.choice(self.narrative_templates["rule_triggered"])
+                template = self.rng.choice(self.narrative_templates["rule_triggered"])
                 text = template.format(rule=event.get("rule", "未知规则"))
                 narrative_parts.append(text)
 
             elif event_type == "dialogue":
-                template = random.choice(self.narrative_templates["dialogue"])
+                template = self.rng.choice(self.narrative_templates["dialogue"])
                 participants = event.get("participants", ["某些人"])
                 text = template.format(participants="和".join(participants))
                 narrative_parts.append(text)
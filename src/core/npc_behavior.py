@@ -43,8 +43,12 @@ class ActionDecision:
 class NPCBehavior:
     """NPC行为控制器"""
 
-    def __init__(self, game_manager: GameStateManager):
+    def __init__(
+        self, game_manager: GameStateManager, rng: Optional[random.Random] = None
+    ):
         self.game_manager = game_manager
+        # NPC决策使用的随机数子流，默认取游戏会话的 npc 子流
+        self.rng = rng if rng is not None else game_manager.rng.npc
         self.action_history: Dict[str, List[Dict[str, Any]]] = {}
 
     def decide_action(self, npc: Dict) -> ActionDecision:
@@ -191,7 +195,7 @@ class NPCBehavior:
         probabilities = list(weights.values())
 
         # 使用轮盘赌选择
-        return random.choices(actions, weights=probabilities)[0]
+        return self.rng.choices(actions, weights=probabilities)[0]
 
     def _determine_action_target(self, npc: Dict, action: NPCAction) -> Optional[str]:
         """确定行动目标"""
@@ -206,13 +210,13 @@ class NPCBehavior:
                 o for o in others if o["id"] != npc["id"] and o.get("alive", True)
             ]
             if others:
-                return random.choice(others)["id"]
+                return self.rng.choice(others)["id"]
 
         elif action == NPCAction.USE_ITEM:
             # 选择背包中的物品
             inventory = npc.get("inventory", [])
             if inventory:
-                return random.choice(inventory)
+                return self.rng.choice(inventory)
 
         elif action == NPCAction.INVESTIGATE:
             # 选择房间中的可疑对象
@@ -234,7 +238,7 @@ class NPCBehavior:
 
         adjacent = connections.get(current_location, [])
         if adjacent:
-            return random.choice(adjacent)
+            return self.rng.choice(adjacent)
         return current_location
 
     def _get_investigation_target(self, location: str) -> str:
@@ -250,7 +254,7 @@ class NPCBehavior:
         }
 
         room_objects = objects.get(location, ["wall", "floor"])
-        return random.choice(room_objects)
+        return self.rng.choice(room_objects)
 
     def _get_action_reason(self, npc: Dict, action: NPCAction) -> str:
         """获取行动原因说明"""
@@ -340,16 +344,11 @@ class NPCBehavior:
         return self.action_history.get(npc_id, [])[-10:]  # 最近10个行动
 
     def update_npc_relationships(self, npc1_id: str, npc2_id: str, change: int):
-        """更新NPC之间的关系"""
+        """更新NPC之间的关系（写入关系图，NPC数据中的关系随之更新）"""
         if not self.game_manager.state:
             return
-        npc1 = self.game_manager.state.npcs.get(npc1_id)
-        if npc1:
-            relationships = npc1.get("relationships", {})
-            current = relationships.get(npc2_id, 50)  # 默认中立
-            new_value = max(0, min(100, current + change))
-            relationships[npc2_id] = new_value
-            self.game_manager.update_npc(npc1_id, {"relationships": relationships})
+        if npc1_id in self.game_manager.state.npcs:
+            self.game_manager.relationships.adjust(npc1_id, npc2_id, change)
 
     def get_behavior_stats(self) -> Dict:
         """获取行为统计"""
@@ -0,0 +1,160 @@
+"""
+紧凑的NPC记录
+常用字段（生命值、理智、恐惧、体力、位置、状态标记、性格等）保存在
+__slots__ 中，其余字段放在按需创建的附加字典里；对外表现为可变映射，
+可以直接替代原来的NPC字典
+"""
+from typing import Any, Dict, Iterator, MutableMapping, Optional, Protocol, Tuple
+
+# 存放在槽位中的字段：NPC模型的顶层字段、展开后的性格字段和回合中的临时标记
+RECORD_FIELDS: Tuple[str, ...] = (
+    "id",
+    "name",
+    "background",
+    "hp",
+    "sanity",
+    "fear",
+    "stamina",
+    "suspicion",
+    "stress",
+    "location",
+    "alive",
+    "status",
+    "hidden",
+    "is_alone",
+    "traits",
+    "personality",
+    "rationality",
+    "courage",
+    "curiosity",
+    "sociability",
+    "paranoia",
+    "inventory",
+    "memory",
+    "relationships",
+    "action_modifiers",
+)
+
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+
+class FieldTracker(Protocol):
+    """接收NPC记录字段写入的对象（脏字段跟踪器、NPC存储的记录跟踪器）"""
+
+    def mark_npc(self, npc_id: Any, key: str) -> None: ...
+
+
+class NPCRecord(MutableMapping[str, Any]):
+    """以槽位存储的NPC数据
+
+    支持字典的常用接口（下标、get、update、setdefault、pop、in、迭代、
+    与字典比较），未设置的槽位视为不存在的键。相比普通字典，每个NPC
+    的内存占用约为原来的三分之一，适合单局数百个NPC、单进程数千局的场景。
+    copy/to_dict 返回普通字典，用于序列化和对外输出。绑定跟踪器后，每次
+    写入都会通知跟踪器被修改的键，用于生成增量更新和同步NPC存储的索引。
+    """
+
+    __slots__ = RECORD_FIELDS + ("_extra", "_tracker")
+
+    def __init__(self, data: Optional[Any] = None, **fields: Any) -> None:
+        self._extra: Optional[Dict[str, Any]] = None
+        self._tracker: Optional[FieldTracker] = None
+        if data:
+            items = data.items() if hasattr(data, "items") else data
+            for key, value in items:
+                self[key] = value
+        for key, value in fields.items():
+            self[key] = value
+
+    def track(self, tracker: Optional[FieldTracker]) -> None:
+        """之后的字段写入通知给跟踪器（None 表示停止跟踪）"""
+        self._tracker = tracker
+
+    @classmethod
+    def from_mapping(cls, data: Any) -> "NPCRecord":
+        """将NPC字典转换为记录，已是记录时原样返回"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    # ========== 映射接口 ==========
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            return getattr(self, key, default)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            object.__setattr__(self, key, value)
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+        if self._tracker is not None:
+            self._tracker.mark_npc(self.get("id"), key)
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELD_SET:
+            try:
+                object.__delattr__(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+        if self._tracker is not None:
+            self._tracker.mark_npc(self.get("id"), key)
+
+    def __contains__(self, key: object) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)  # type: ignore[arg-type]
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for key in RECORD_FIELDS:
+            if hasattr(self, key):
+                yield key
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        count = sum(1 for key in RECORD_FIELDS if hasattr(self, key))
+        return count + (len(self._extra) if self._extra else 0)
+
+    def __repr__(self) -> str:
+        return f"NPCRecord({self.to_dict()!r})"
+
+    # ========== 转换 ==========
+
+    def to_dict(self) -> Dict[str, Any]:
+        """普通字典副本（浅复制）"""
+        return {key: self[key] for key in self}
+
+    def copy(self) -> Dict[str, Any]:
+        """与 dict.copy 一致的浅复制，返回普通字典"""
+        return self.to_dict()
+
+    def __reduce__(self) -> Any:
+        # 复制和序列化时不携带脏字段跟踪器
+        return (type(self), (self.to_dict(),))
+
+
+def as_record(npc: Any) -> Any:
+    """NPC字典转换为记录；记录和其他NPC对象（如模型实例）原样返回"""
+    if isinstance(npc, dict):
+        return NPCRecord(npc)
+    return npc
@@ -0,0 +1,251 @@
+"""
+NPC存储
+以ID为键保存NPC，并维护名字索引、增量更新的存活/活跃集合和位置索引，
+使按ID、按名字、按位置查找以及获取存活NPC列表不再需要遍历全部NPC
+"""
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+
+from .npc_record import NPCRecord
+
+if TYPE_CHECKING:
+    from .state_delta import DirtyTracker
+
+# 会影响存活/活跃状态和位置索引的字段
+STATUS_FIELDS = frozenset(("hp", "alive", "location"))
+
+
+def _field(npc: Any, key: str, default: Any = None) -> Any:
+    """同时兼容NPC字典、NPC记录和NPC对象的字段读取"""
+    if isinstance(npc, (dict, NPCRecord)):
+        return npc.get(key, default)
+    return getattr(npc, key, default)
+
+
+def is_active(npc: Any) -> bool:
+    """活跃：生命值大于0"""
+    return (_field(npc, "hp", 0) or 0) > 0
+
+
+def is_alive(npc: Any) -> bool:
+    """存活：生命值大于0且未被标记为死亡"""
+    return is_active(npc) and _field(npc, "alive", True) is not False
+
+
+class NPCStore:
+    """NPC存储：id -> NPC，外加 name -> ids 索引、存活/活跃集合和位置索引
+
+    存活/活跃状态和位置在 add/update/remove 时增量维护；绑定了 RecordTracker
+    的NPC记录直接修改 hp、alive 或 location 时会自动同步，其他NPC对象被直接
+    修改后需调用 refresh。位置索引只包含存活的NPC，
+    是地图区域占用情况的唯一来源。列表视图按加入顺序缓存，只在成员变化时重建，
+    返回的列表为共享缓存，调用方不应修改。
+    """
+
+    def __init__(self) -> None:
+        self._by_id: Dict[str, Any] = {}
+        self._by_name: Dict[str, List[str]] = {}
+        self._active: Dict[str, None] = {}  # 作为有序集合使用
+        self._alive: Dict[str, None] = {}
+        self._by_location: Dict[Any, Dict[str, None]] = {}  # location -> 存活NPC的ID
+        self._location_of: Dict[str, Any] = {}  # 已登记到位置索引的NPC -> 位置
+        self._all_view: Optional[List[Any]] = None
+        self._active_view: Optional[List[Any]] = None
+        self._alive_view: Optional[List[Any]] = None
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, npc_id: object) -> bool:
+        return npc_id in self._by_id
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._by_id.values())
+
+    # ========== 查询 ==========
+
+    def get(self, npc_id: str) -> Optional[Any]:
+        """根据ID获取NPC（O(1)）"""
+        return self._by_id.get(npc_id)
+
+    def get_by_name(self, name: str) -> Optional[Any]:
+        """根据名字获取NPC（O(1)），重名时返回最早加入的一个"""
+        ids = self._by_name.get(name)
+        return self._by_id[ids[0]] if ids else None
+
+    def all(self) -> List[Any]:
+        """全部NPC，按加入顺序"""
+        if self._all_view is None:
+            self._all_view = list(self._by_id.values())
+        return self._all_view
+
+    def active(self) -> List[Any]:
+        """生命值大于0的NPC，按加入顺序"""
+        if self._active_view is None:
+            self._active_view = [
+                npc for npc_id, npc in self._by_id.items() if npc_id in self._active
+            ]
+        return self._active_view
+
+    def alive(self) -> List[Any]:
+        """存活且未被标记为死亡的NPC，按加入顺序"""
+        if self._alive_view is None:
+            self._alive_view = [
+                npc for npc_id, npc in self._by_id.items() if npc_id in self._alive
+            ]
+        return self._alive_view
+
+    def ids_in_location(self, location: Any) -> List[str]:
+        """某位置的存活NPC的ID，按进入该位置的顺序"""
+        return list(self._by_location.get(location, ()))
+
+    def in_location(self, location: Any) -> List[Any]:
+        """某位置的存活NPC"""
+        return [self._by_id[npc_id] for npc_id in self._by_location.get(location, ())]
+
+    def count_in_location(self, location: Any) -> int:
+        """某位置的存活NPC数量（O(1)）"""
+        return len(self._by_location.get(location, ()))
+
+    def location_of(self, npc_id: str) -> Optional[Any]:
+        """存活NPC在位置索引中的位置"""
+        return self._location_of.get(npc_id)
+
+    def count_alive(self) -> int:
+        return len(self._alive)
+
+    def count_active(self) -> int:
+        return len(self._active)
+
+    # ========== 修改 ==========
+
+    def add(self, npc: Any) -> None:
+        """加入NPC，ID已存在时替换"""
+        npc_id = _field(npc, "id")
+        if npc_id in self._by_id:
+            self.remove(npc_id)
+        self._by_id[npc_id] = npc
+        self._by_name.setdefault(_field(npc, "name"), []).append(npc_id)
+        self._all_view = None
+        self._refresh_status(npc_id, npc)
+
+    def remove(self, npc_id: str) -> Optional[Any]:
+        """移除NPC并返回，不存在时返回 None"""
+        npc = self._by_id.pop(npc_id, None)
+        if npc is None:
+            return None
+        self._unlink_name(_field(npc, "name"), npc_id)
+        self._all_view = None
+        if self._set_member(self._active, npc_id, False):
+            self._active_view = None
+        if self._set_member(self._alive, npc_id, False):
+            self._alive_view = None
+        self._place(npc_id, None)
+        return npc
+
+    def update(self, npc_id: str, updates: Dict[str, Any]) -> Optional[Any]:
+        """更新NPC字段，只在相关字段变化时刷新索引"""
+        npc = self._by_id.get(npc_id)
+        if npc is None:
+            return None
+        old_name = _field(npc, "name")
+        if isinstance(npc, (dict, NPCRecord)):
+            npc.update(updates)
+        else:
+            for key, value in updates.items():
+                setattr(npc, key, value)
+        if "name" in updates and updates["name"] != old_name:
+            self._unlink_name(old_name, npc_id)
+            self._by_name.setdefault(updates["name"], []).append(npc_id)
+        if not STATUS_FIELDS.isdisjoint(updates):
+            self._refresh_status(npc_id, npc)
+        return npc
+
+    def refresh(self, npc_id: Optional[str] = None) -> None:
+        """NPC被直接修改后重新计算状态；不指定ID时刷新全部"""
+        if npc_id is None:
+            for other_id, npc in self._by_id.items():
+                self._refresh_status(other_id, npc)
+            return
+        npc = self._by_id.get(npc_id)
+        if npc is not None:
+            self._refresh_status(npc_id, npc)
+
+    def rebuild(self, npcs: List[Any]) -> None:
+        """根据NPC列表完整重建"""
+        self._by_id.clear()
+        self._by_name.clear()
+        self._active.clear()
+        self._alive.clear()
+        self._by_location.clear()
+        self._location_of.clear()
+        self._all_view = self._active_view = self._alive_view = None
+        for npc in npcs:
+            self.add(npc)
+
+    def _refresh_status(self, npc_id: str, npc: Any) -> None:
+        if self._set_member(self._active, npc_id, is_active(npc)):
+            self._active_view = None
+        alive = is_alive(npc)
+        if self._set_member(self._alive, npc_id, alive):
+            self._alive_view = None
+        self._place(npc_id, _field(npc, "location") if alive else None)
+
+    def _place(self, npc_id: str, location: Any) -> None:
+        """将NPC登记到位置索引；location 为 None 表示移出索引（死亡或移除）"""
+        if npc_id in self._location_of:
+            previous = self._location_of[npc_id]
+            if previous == location:
+                return
+            occupants = self._by_location[previous]
+            del occupants[npc_id]
+            if not occupants:
+                del self._by_location[previous]
+            del self._location_of[npc_id]
+        if location is not None:
+            self._by_location.setdefault(location, {})[npc_id] = None
+            self._location_of[npc_id] = location
+
+    @staticmethod
+    def _set_member(members: Dict[str, None], npc_id: str, present: bool) -> bool:
+        """设置成员关系，返回是否发生变化"""
+        if present == (npc_id in members):
+            return False
+        if present:
+            members[npc_id] = None
+        else:
+            del members[npc_id]
+        return True
+
+    def _unlink_name(self, name: Any, npc_id: str) -> None:
+        ids = self._by_name.get(name)
+        if not ids:
+            return
+        if npc_id in ids:
+            ids.remove(npc_id)
+        if not ids:
+            del self._by_name[name]
+
+
+class RecordTracker:
+    """NPC记录的跟踪器：字段写入转发给当前的脏字段跟踪器，
+    写入 hp、alive、location 时同步NPC存储的存活集合和位置索引
+
+    Args:
+        store: 要同步的NPC存储
+        dirty: 返回当前脏字段跟踪器的函数（没有游戏状态时返回 None）
+    """
+
+    __slots__ = ("store", "_dirty")
+
+    def __init__(
+        self, store: NPCStore, dirty: Callable[[], Optional["DirtyTracker"]]
+    ) -> None:
+        self.store = store
+        self._dirty = dirty
+
+    def mark_npc(self, npc_id: Any, key: str) -> None:
+        dirty = self._dirty()
+        if dirty is not None:
+            dirty.mark_npc(npc_id, key)
+        if key in STATUS_FIELDS:
+            self.store.refresh(npc_id)
@@ -0,0 +1,98 @@
+"""
+NPC关系图
+以 NPC ID 为节点保存有向关系值，在交谈/互动发生时增量更新，
+读取某个NPC的全部关系为 O(1)，不再需要回放事件历史
+"""
+from typing import Any, Dict, Optional
+
+# 未建立关系时的默认值（中立）
+DEFAULT_SCORE = 50
+
+# 一次交谈带来的关系提升
+TALK_BONUS = 5
+
+
+class RelationshipGraph:
+    """有向关系图：npc_id -> {other_id: score}
+
+    每个NPC的关系行是一个长期存在的字典，可以直接挂到NPC数据的
+    relationships 字段上，图的更新会立即反映到NPC数据中。
+    """
+
+    def __init__(
+        self,
+        default: int = DEFAULT_SCORE,
+        minimum: int = 0,
+        maximum: int = 100,
+    ) -> None:
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self._rows: Dict[str, Dict[str, int]] = {}
+
+    def __contains__(self, npc_id: object) -> bool:
+        return npc_id in self._rows
+
+    def of(self, npc_id: str) -> Dict[str, int]:
+        """某个NPC对其他NPC的关系（实时视图，未记录的关系取默认值）"""
+        row = self._rows.get(npc_id)
+        if row is None:
+            row = self._rows[npc_id] = {}
+        return row
+
+    def get(self, npc_id: str, other_id: str, default: Optional[int] = None) -> int:
+        """npc_id 对 other_id 的关系值"""
+        row = self._rows.get(npc_id)
+        fallback = self.default if default is None else default
+        if row is None:
+            return fallback
+        return row.get(other_id, fallback)
+
+    def set(self, npc_id: str, other_id: str, value: int) -> int:
+        """设置关系值（按上下限截断），返回截断后的值"""
+        value = max(self.minimum, min(self.maximum, value))
+        self.of(npc_id)[other_id] = value
+        return value
+
+    def adjust(
+        self, npc_id: str, other_id: str, change: int, initial: Optional[int] = None
+    ) -> int:
+        """在当前关系值上增减
+
+        Args:
+            initial: 尚未建立关系时的起始值，默认使用图的默认值
+        """
+        return self.set(npc_id, other_id, self.get(npc_id, other_id, initial) + change)
+
+    def record_interaction(self, npc_id: str, other_id: str, change: int) -> None:
+        """双向互动（如交谈），两个方向同时变化"""
+        if npc_id == other_id:
+            return
+        self.adjust(npc_id, other_id, change)
+        self.adjust(other_id, npc_id, change)
+
+    def bind(self, npc_id: str, existing: Any = None) -> Dict[str, int]:
+        """获取NPC的关系行，并合并NPC数据中已有的关系（例如来自存档）"""
+        row = self.of(npc_id)
+        if isinstance(existing, dict) and existing is not row:
+            row.update(existing)
+        return row
+
+    def remove(self, npc_id: str) -> None:
+        """移除NPC及所有指向它的关系"""
+        self._rows.pop(npc_id, None)
+        for row in self._rows.values():
+            row.pop(npc_id, None)
+
+    def clear(self) -> None:
+        self._rows.clear()
+
+    def to_dict(self) -> Dict[str, Dict[str, int]]:
+        return {npc_id: dict(row) for npc_id, row in self._rows.items() if row}
+
+    def load_dict(self, data: Dict[str, Dict[str, int]]) -> None:
+        """从存档恢复（关系行对象原地更新，已挂到NPC上的视图保持有效）"""
+        for row in self._rows.values():
+            row.clear()
+        for npc_id, row in data.items():
+            self.of(npc_id).update(row)
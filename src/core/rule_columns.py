@@ -0,0 +1,164 @@
+"""
+批量规则判定的列存储
+一个回合内所有行动的行动者字段按列存放为 NumPy 数组（动作和地点编码、
+恐惧、理智、好奇心、所在地点人数等），每条规则的触发条件计算为一个布尔掩码，
+概率修正也按列一次算出。NumPy 是可选依赖，未安装时执行器逐行判定。
+"""
+from numbers import Real
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Mapping, Sequence
+
+from .rule_predicate import _MISSING, CompiledRule
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 可选依赖
+    np = None
+
+if TYPE_CHECKING:
+    from .game_state import GameStateManager
+    from .rule_executor import RuleContext
+
+
+def numpy_available() -> bool:
+    """是否可以按列批量判定"""
+    return np is not None
+
+
+class ActionColumns:
+    """一批行动的列视图
+
+    列在第一次被规则用到时才构造，之后同一批次内的规则共用。
+
+    Args:
+        contexts: 每个行动的规则上下文（行动者为行动时的快照）
+        game_manager: 游戏状态管理器（读取未记录在快照中的地点人数）
+        game_state: 本批次共享的游戏状态视图
+    """
+
+    def __init__(
+        self,
+        contexts: Sequence["RuleContext"],
+        game_manager: "GameStateManager",
+        game_state: Mapping[str, Any],
+    ) -> None:
+        self.contexts = contexts
+        self.game_manager = game_manager
+        self.game_state = game_state
+        self.size = len(contexts)
+        self._codes: Dict[Hashable, int] = {}
+        self._columns: Dict[Any, Any] = {}
+        self.actions = self._encode([ctx.action for ctx in contexts])
+        self.locations = self._encode([ctx.actor_location for ctx in contexts])
+
+    # ========== 列 ==========
+
+    def _encode(self, values: List[Hashable]) -> Any:
+        codes = self._codes
+        return np.array([codes.setdefault(v, len(codes)) for v in values], dtype=np.int64)
+
+    def code(self, value: Hashable) -> int:
+        """值的编码，本批次没有出现过的值为 -1"""
+        return self._codes.get(value, -1)
+
+    def column(self, key: str, default: Any = 0) -> Any:
+        """行动者字段的列；全部为数值时是浮点数组，否则为对象数组"""
+        cache_key = ("field", key, default)
+        column = self._columns.get(cache_key)
+        if column is None:
+            values = [ctx.actor.get(key, default) for ctx in self.contexts]
+            numeric = all(isinstance(v, Real) for v in values)
+            column = np.array(values, dtype=float if numeric else object)
+            self._columns[cache_key] = column
+        return column
+
+    def occupancy(self) -> Any:
+        """行动时所在地点的人数"""
+        column = self._columns.get("occupancy")
+        if column is None:
+            column = np.array(
+                [
+                    ctx.occupancy
+                    if ctx.occupancy is not None
+                    else self.game_manager.count_npcs_in_location(ctx.actor_location)
+                    for ctx in self.contexts
+                ],
+                dtype=np.int64,
+            )
+            self._columns["occupancy"] = column
+        return column
+
+    def has_item(self, item: str) -> Any:
+        cache_key = ("item", item)
+        column = self._columns.get(cache_key)
+        if column is None:
+            column = np.array([item in ctx.actor_items for ctx in self.contexts], dtype=bool)
+            self._columns[cache_key] = column
+        return column
+
+    def probability_modifiers(self) -> Any:
+        """按列计算 RuleExecutor._probability_modifier"""
+        column = self._columns.get("modifiers")
+        if column is None:
+            column = (
+                0.2 * (self.column("fear", 0) > 50)
+                + 0.15 * (self.column("sanity", 100) < 50)
+                + 0.1 * (self.column("curiosity", 5) > 7)
+            ).astype(float)
+            self._columns["modifiers"] = column
+        return column
+
+    # ========== 掩码 ==========
+
+    def probabilities(self, compiled: CompiledRule, base_probability: float) -> Dict[int, float]:
+        """命中规则的行及其触发概率"""
+        rows = np.flatnonzero(self.mask(compiled))
+        if not rows.size:
+            return {}
+        values = np.clip(base_probability + self.probability_modifiers()[rows], 0.0, 1.0)
+        return dict(zip(rows.tolist(), values.tolist()))
+
+    def mask(self, compiled: CompiledRule) -> Any:
+        """满足规则静态条件（时间除外）的行"""
+        mask = self.actions == self.code(compiled.action)
+        if compiled.locations is not None:
+            codes = [self.code(location) for location in compiled.locations]
+            mask &= np.isin(self.locations, codes)
+        if not mask.any():
+            return mask
+
+        for item in compiled.items:
+            mask &= self.has_item(item)
+
+        for trait, minimum, maximum, expected in compiled.trait_checks:
+            if expected is not _MISSING:
+                values = self.column(trait).astype(object)
+                mask &= np.array([value == expected for value in values], dtype=bool)
+                continue
+            column = self.column(trait)
+            if minimum is not None:
+                mask &= (column >= minimum).astype(bool)
+            if maximum is not None:
+                mask &= (column <= maximum).astype(bool)
+
+        for name, check in zip(compiled.extra_names, compiled.extra_checks):
+            vector = VECTOR_CHECKS.get(name)
+            if vector is not None:
+                mask &= vector(self)
+            else:
+                # 自定义条件没有列实现，逐行判定
+                mask &= np.array(
+                    [check(self.game_manager, ctx) for ctx in self.contexts], dtype=bool
+                )
+        return mask
+
+
+# 额外条件的按列实现，与 rule_predicate.EXTRA_CONDITION_CHECKS 对应
+VECTOR_CHECKS: Dict[str, Callable[[ActionColumns], Any]] = {
+    "lights_off": lambda cols: np.full(
+        cols.size, not cols.game_state.get("lights_on", True), dtype=bool
+    ),
+    "alone": lambda cols: cols.occupancy() == 1,
+    "multiple_people": lambda cols: cols.occupancy() > 1,
+    "low_sanity": lambda cols: (cols.column("sanity", 100) < 50).astype(bool),
+    "high_fear": lambda cols: (cols.column("fear", 0) > 50).astype(bool),
+}
@@ -3,25 +3,60 @@
 负责检查和执行游戏规则
 """
 import random
-from typing import Dict, List, Optional, Tuple, Any, DefaultDict, cast
+from typing import (
+    Any,
+    DefaultDict,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
 from datetime import datetime
 from collections import defaultdict
 
-from ..models.rule import Rule, EffectType
-from ..core.game_state import GameStateManager
+from ..models.rule import (
+    INVALID_TIME_WINDOW,
+    EffectType,
+    Rule,
+    parse_clock,
+    parse_time_window,
+)
+from ..core.game_state import GameState, GameStateManager
 from ..utils.logger import get_logger, log_game_event
+from .rule_columns import ActionColumns, numpy_available
+from .rule_index import RuleIndex
+from .rule_predicate import EXTRA_CONDITION_CHECKS
 from .side_effects import SideEffectManager
 
 logger = get_logger(__name__)
 
+# 行动者快照中记录行动时所在地点人数的键
+OCCUPANCY_KEY = "_occupancy"
 
-class RuleContext:
-    """规则执行上下文"""
 
-    def __init__(self, actor: Dict, action: str, game_state: Dict):
+class RuleContext:
+    """规则执行上下文
+
+    game_state 可以是 GameState（包装为只读惰性视图，不做序列化）
+    或任意映射（如 to_dict 快照）；规则判定只通过 get 读取少量字段。
+    """
+
+    def __init__(
+        self,
+        actor: Dict,
+        action: str,
+        game_state: Union[GameState, Mapping[str, Any]],
+    ):
+        if isinstance(game_state, GameState):
+            game_state = game_state.view()
         self.actor = actor
         self.action = action
-        self.game_state = game_state
+        self.game_state: Mapping[str, Any] = game_state
         self.timestamp = datetime.now()
 
         # 提取常用属性
@@ -30,6 +65,8 @@ class RuleContext:
         self.actor_location = actor.get("location")
         self.actor_items = actor.get("inventory", [])
         self.current_time = game_state.get("current_time", "00:00")
+        # 行动快照记录的所在地点人数，None 表示判定时实时统计
+        self.occupancy: Optional[int] = actor.get(OCCUPANCY_KEY)
 
     def to_dict(self) -> Dict:
         """转换为字典供规则判定使用"""
@@ -43,11 +80,63 @@ class RuleContext:
         }
 
 
+class RuleBatchResult:
+    """一个回合内批量规则判定的结果
+
+    行对应传入的 (NPC, 行动)，列对应至少被一个行动命中的规则（按注册顺序）。
+    ``probabilities[row][col]`` 为触发概率，不满足条件时为 None。
+    ``contexts`` 是判定使用的上下文（提供快照时行动者为快照），
+    执行规则时用 :meth:`context_for` 取得以实时NPC为行动者的上下文。
+    """
+
+    def __init__(
+        self,
+        contexts: List[RuleContext],
+        rules: List[Rule],
+        probabilities: List[List[Optional[float]]],
+        actors: Optional[List[Dict[str, Any]]] = None,
+    ):
+        self.contexts = contexts
+        self.rules = rules
+        self.probabilities = probabilities
+        self.actors = actors if actors is not None else [ctx.actor for ctx in contexts]
+
+    def __len__(self) -> int:
+        return len(self.contexts)
+
+    @property
+    def trigger_matrix(self) -> List[List[bool]]:
+        """布尔触发矩阵"""
+        return [[p is not None for p in row] for row in self.probabilities]
+
+    def triggered_for(self, row: int) -> List[Tuple[Rule, float]]:
+        """获取某个行动可能触发的规则，排序与 check_all_rules 一致"""
+        triggered = [
+            (rule, probability)
+            for rule, probability in zip(self.rules, self.probabilities[row])
+            if probability is not None
+        ]
+        triggered.sort(key=lambda x: x[1], reverse=True)
+        return triggered
+
+    def context_for(self, row: int) -> RuleContext:
+        """执行规则用的上下文，行动者为实时NPC"""
+        context = self.contexts[row]
+        actor = self.actors[row]
+        if actor is context.actor:
+            return context
+        return RuleContext(actor, context.action, context.game_state)
+
+
 class RuleExecutor:
     """规则执行器"""
 
-    def __init__(self, game_manager: GameStateManager):
+    def __init__(
+        self, game_manager: GameStateManager, rng: Optional[random.Random] = None
+    ):
         self.game_manager = game_manager
+        # 规则判定使用的随机数子流，默认取游戏会话的 rules 子流
+        self.rng = rng if rng is not None else game_manager.rng.rules
         self.execution_history: DefaultDict[str, List[Dict[str, Any]]] = defaultdict(
             list
         )  # 规则执行历史
@@ -62,29 +151,165 @@ class RuleExecutor:
         if state is None:
             return triggered_rules
 
-        for rule_id in state.active_rules:
-            # 在规则列表中查找对应的规则
-            rule = None
-            for r in self.game_manager.rules:
-                if r.id == rule_id:
-                    rule = r
-                    break
-
-            if not rule:
-                continue
+        # 只取出动作和地点可能匹配的规则
+        rule_index = self.game_manager.sync_rule_index()
+        candidates = rule_index.candidates(context.action, context.actor_location)
 
+        for rule in candidates:
             # 检查规则是否可以触发
             if self.can_rule_trigger(rule, context):
                 # 计算触发概率
                 probability = self.calculate_trigger_probability(rule, context)
                 triggered_rules.append((rule, probability))
 
-        # 按概率排序
+        # 按概率排序（概率相同时保持规则加入顺序）
         triggered_rules.sort(key=lambda x: x[1], reverse=True)
 
         logger.debug(f"检查规则完成，{len(triggered_rules)} 条规则可能触发")
         return triggered_rules
 
+    def check_rules_batch(
+        self,
+        actions: Sequence[Tuple[Dict[str, Any], str]],
+        game_state: Union[GameState, Mapping[str, Any], None] = None,
+        snapshots: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> RuleBatchResult:
+        """批量检查一批 (NPC, 行动) 可能触发的规则
+
+        同一批次内相同的部分只计算一次：时间条件、每个 (动作, 地点)
+        组合的候选规则；所有上下文共享同一个状态视图。安装了 NumPy 时，
+        行动者字段按列存放，每条候选规则的条件计算为一个布尔掩码
+        （见 :class:`ActionColumns`），否则逐行判定，结果相同。
+        冷却和行动者存活在判定时只检查一次，逐行执行前需用 :meth:`can_fire` 复查。
+
+        Args:
+            actions: (NPC数据, 行动名) 列表
+            game_state: 游戏状态或其快照，默认使用当前状态的只读视图
+            snapshots: 与 actions 一一对应的行动者快照（见 :meth:`snapshot_actor`），
+                提供时按行动当时的状态判定
+
+        Returns:
+            RuleBatchResult: 触发矩阵和概率
+        """
+        state = self.game_manager.state
+        if state is None:
+            return RuleBatchResult([], [], [])
+
+        if game_state is None:
+            game_state = state
+        if isinstance(game_state, GameState):
+            game_state = game_state.view()
+        actors = [actor for actor, _ in actions]
+        judged = snapshots if snapshots is not None else actors
+        contexts = [
+            RuleContext(actor, action, game_state)
+            for actor, (_, action) in zip(judged, actions)
+        ]
+
+        # 每个 (动作, 地点) 组合只取一次候选规则
+        groups: Dict[Tuple[str, Optional[str]], List[int]] = defaultdict(list)
+        for row, ctx in enumerate(contexts):
+            groups[(ctx.action, ctx.actor_location)].append(row)
+
+        rule_index = self.game_manager.sync_rule_index()
+        current_time = game_state.get("current_time", "00:00")
+        ready: Dict[str, Rule] = {}  # 通过激活、冷却和时间检查的候选规则
+        group_rules: Dict[Tuple[str, Optional[str]], List[Rule]] = {}
+        checked: Set[str] = set()
+        for key in groups:
+            group_rules[key] = []
+            for rule in rule_index.candidates(*key):
+                if rule.id not in checked:
+                    checked.add(rule.id)
+                    if (
+                        rule.active
+                        and self.cooldowns.get(rule.id, 0) <= 0
+                        and rule_index.compiled(rule).matches_time(current_time)
+                    ):
+                        ready[rule.id] = rule
+                if rule.id in ready:
+                    group_rules[key].append(rule)
+
+        if numpy_available():
+            hits = self._match_columns(rule_index, contexts, list(ready.values()), game_state)
+        else:
+            hits = self._match_rows(rule_index, contexts, groups, group_rules)
+
+        rules = sorted(
+            (ready[rule_id] for rule_id in hits), key=lambda r: rule_index.order_of(r.id)
+        )
+        probabilities: List[List[Optional[float]]] = [
+            [hits[rule.id].get(row) for rule in rules] for row in range(len(contexts))
+        ]
+
+        logger.debug(
+            f"批量检查规则完成: {len(contexts)} 个行动, {len(rules)} 条规则可能触发"
+        )
+        return RuleBatchResult(contexts, rules, probabilities, actors)
+
+    def _match_columns(
+        self,
+        rule_index: RuleIndex,
+        contexts: List[RuleContext],
+        rules: List[Rule],
+        game_state: Mapping[str, Any],
+    ) -> Dict[str, Dict[int, float]]:
+        """按列判定：每条规则的条件是所有行上的一个布尔掩码"""
+        columns = ActionColumns(contexts, self.game_manager, game_state)
+        hits: Dict[str, Dict[int, float]] = {}
+        for rule in rules:
+            rows = columns.probabilities(rule_index.compiled(rule), rule.trigger.probability)
+            if rows:
+                hits[rule.id] = rows
+        return hits
+
+    def _match_rows(
+        self,
+        rule_index: RuleIndex,
+        contexts: List[RuleContext],
+        groups: Dict[Tuple[str, Optional[str]], List[int]],
+        group_rules: Dict[Tuple[str, Optional[str]], List[Rule]],
+    ) -> Dict[str, Dict[int, float]]:
+        """逐行判定（未安装 NumPy 时使用）"""
+        modifiers = [self._probability_modifier(ctx.actor) for ctx in contexts]
+        hits: Dict[str, Dict[int, float]] = {}
+        for key, rows in groups.items():
+            for rule in group_rules[key]:
+                compiled = rule_index.compiled(rule)
+                base_prob = rule.trigger.probability
+                for row in rows:
+                    if compiled.matches_actor(contexts[row], self.game_manager):
+                        probability = max(0.0, min(1.0, base_prob + modifiers[row]))
+                        hits.setdefault(rule.id, {})[row] = probability
+        return hits
+
+    def snapshot_actor(self, actor: Mapping[str, Any]) -> Dict[str, Any]:
+        """行动完成时行动者的快照，供批量判定使用
+
+        复制行动者的字段（物品列表单独复制）并记录此刻所在地点的人数，
+        同一批次中之后的行动和规则效果不会改变对这次行动的判定。
+        """
+        snapshot = dict(actor)
+        snapshot["inventory"] = list(actor.get("inventory") or [])
+        snapshot[OCCUPANCY_KEY] = self.game_manager.count_npcs_in_location(
+            actor.get("location")
+        )
+        return snapshot
+
+    def can_fire(self, rule: Rule, context: RuleContext) -> bool:
+        """执行批量判定结果前的复查
+
+        批量判定在回合开始时一次算出，而同一回合内较早的触发可能已让规则
+        进入冷却，或已杀死后面的行动者；这两种情况都不再掷骰。
+        """
+        if self.cooldowns.get(rule.id, 0) > 0:
+            return False
+        actor = context.actor
+        if not actor.get("alive", True):
+            return False
+        hp = actor.get("hp")
+        return hp is None or hp > 0
+
     def can_rule_trigger(self, rule: Rule, context: RuleContext) -> bool:
         """检查规则是否满足触发条件"""
         # 检查规则是否激活
@@ -96,50 +321,9 @@ class RuleExecutor:
             if self.cooldowns[rule.id] > 0:
                 return False
 
-        # 检查动作是否匹配
-        if rule.trigger.action != context.action:
-            return False
-
-        # 检查地点限制
-        if rule.trigger.location:
-            if context.actor_location not in rule.trigger.location:
-                return False
-
-        # 检查时间限制
-        if rule.trigger.time_range:
-            if not self._check_time_range(
-                context.current_time, rule.trigger.time_range
-            ):
-                return False
-
-        # 检查物品需求
-        if rule.requirements.items:
-            for item in rule.requirements.items:
-                if item not in context.actor_items:
-                    return False
-
-        # 检查NPC特质需求
-        if rule.requirements.actor_traits:
-            for trait, requirement in rule.requirements.actor_traits.items():
-                actor_value = context.actor.get(trait, 0)
-
-                # 支持最小/最大值检查
-                if isinstance(requirement, dict):
-                    if "min" in requirement and actor_value < requirement["min"]:
-                        return False
-                    if "max" in requirement and actor_value > requirement["max"]:
-                        return False
-                else:
-                    # 直接比较
-                    if actor_value != requirement:
-                        return False
-
-        # 检查额外条件
-        for condition in rule.trigger.extra_conditions:
-            if not self._check_extra_condition(condition, context):
-                return False
-
-        return True
+        # 动作、地点、时间、物品、特质和额外条件由预编译谓词检查
+        compiled = self.game_manager.rule_index.compiled(rule)
+        return compiled.matches(context, self.game_manager)
 
     def _check_time_range(self, current_time: str, time_range: Dict[str, str]) -> bool:
         """检查时间是否在范围内
@@ -151,80 +335,23 @@ class RuleExecutor:
         Returns:
             bool: 时间是否在范围内
         """
-        try:
-            import re
-
-            start_time = time_range.get("from", "")
-            end_time = time_range.get("to", "")
-
-            pattern = re.compile(r"^\d{2}:\d{2}$")
-            for label, t in {
-                "current_time": current_time,
-                "start_time": start_time,
-                "end_time": end_time,
-            }.items():
-                if not pattern.match(t):
-                    logger.error(f"时间格式错误: '{t}' 不符合 HH:MM 格式")
-                    return False
-
-            # 使用 datetime 解析时间以确保格式正确
-            current = datetime.strptime(current_time, "%H:%M")
-            start = datetime.strptime(start_time, "%H:%M")
-            end = datetime.strptime(end_time, "%H:%M")
-
-            # 将所有时间转换为当天的时间
-            today = datetime.now().date()
-            current = current.replace(year=today.year, month=today.month, day=today.day)
-            start = start.replace(year=today.year, month=today.month, day=today.day)
-            end = end.replace(year=today.year, month=today.month, day=today.day)
-
-            # 处理跨午夜的情况
-            if start > end:
-                # 如果开始时间大于结束时间，说明跨越了午夜
-                # 例如: 23:00 到 02:00
-                if current >= start:  # 当前时间在今天的范围内
-                    return True
-                # 将结束时间调整到第二天
-                from datetime import timedelta
-
-                end = end + timedelta(days=1)
-                # 也需要检查当前时间是否在第二天的范围内
-                current_tomorrow = current + timedelta(days=1)
-                return current_tomorrow <= end
-            else:
-                # 正常情况：开始时间小于等于结束时间
-                return start <= current <= end
-
-        except ValueError as e:
-            logger.error(f"时间格式错误: {e}. 期望格式: HH:MM")
+        window = parse_time_window(time_range)
+        if window is None or window == INVALID_TIME_WINDOW:
+            logger.error(f"时间范围格式错误: {time_range}，期望格式: HH:MM")
             return False
-        except Exception as e:
-            logger.error(f"时间范围检查失败: {e}")
+
+        current = parse_clock(current_time)
+        if current is None:
+            logger.error(f"时间格式错误: '{current_time}' 不符合 HH:MM 格式")
             return False
 
+        return window.contains(current)
+
     def _check_extra_condition(self, condition: str, context: RuleContext) -> bool:
         """检查额外条件"""
-        # 这里可以实现各种特殊条件
-        condition_checks = {
-            "lights_off": lambda: not context.game_state.get("lights_on", True),
-            "alone": lambda: len(
-                self.game_manager.get_npcs_in_location(
-                    cast(str, context.actor_location)
-                )
-            )
-            == 1,
-            "multiple_people": lambda: len(
-                self.game_manager.get_npcs_in_location(
-                    cast(str, context.actor_location)
-                )
-            )
-            > 1,
-            "low_sanity": lambda: context.actor.get("sanity", 100) < 50,
-            "high_fear": lambda: context.actor.get("fear", 0) > 50,
-        }
-
-        if condition in condition_checks:
-            return condition_checks[condition]()
+        check = EXTRA_CONDITION_CHECKS.get(condition)
+        if check is not None:
+            return check(self.game_manager, context)
 
         # 未知条件默认为真
         logger.warning(f"未知的额外条件: {condition}")
@@ -233,30 +360,29 @@ class RuleExecutor:
     def calculate_trigger_probability(self, rule: Rule, context: RuleContext) -> float:
         """计算规则触发概率"""
         base_prob = rule.trigger.probability
+        final_prob = base_prob + self._probability_modifier(context.actor)
+        return max(0.0, min(1.0, final_prob))  # 限制在0-1之间
 
-        # 根据NPC状态调整概率
+    def _probability_modifier(self, actor: Dict[str, Any]) -> float:
+        """根据NPC状态计算触发概率修正值"""
         modifiers = []
 
         # 恐惧值影响
-        fear_level = context.actor.get("fear", 0)
+        fear_level = actor.get("fear", 0)
         if fear_level > 50:
             modifiers.append(0.2)  # 恐惧时更容易触发
 
         # 理智值影响
-        sanity = context.actor.get("sanity", 100)
+        sanity = actor.get("sanity", 100)
         if sanity < 50:
             modifiers.append(0.15)  # 低理智更容易触发
 
         # 好奇心影响
-        curiosity = context.actor.get("curiosity", 5)
+        curiosity = actor.get("curiosity", 5)
         if curiosity > 7:
             modifiers.append(0.1)  # 好奇心强更容易触发
 
-        # 计算最终概率
-        final_prob = base_prob + sum(modifiers)
-        final_prob = max(0.0, min(1.0, final_prob))  # 限制在0-1之间
-
-        return final_prob
+        return sum(modifiers)
 
     def execute_rule(self, rule: Rule, context: RuleContext) -> Dict[str, Any]:
         """执行规则效果"""
@@ -451,7 +577,7 @@ class RuleExecutor:
                 detection_chance * (11 - loophole.discovery_difficulty) / 10
             )
 
-            if random.random() < adjusted_chance:
+            if self.rng.random() < adjusted_chance:
                 logger.info(
                     f"{npc['name']} 发现了规则 '{rule.name}' 的破绽: {loophole.description}"
                 )
@@ -476,10 +602,7 @@ class RuleExecutor:
                 self.execution_history.keys(),
                 key=lambda k: len(self.execution_history[k]),
             )
-            rule = next(
-                (r for r in self.game_manager.rules if r.id == most_triggered_id),
-                None,
-            )
+            rule = self.game_manager.get_rule(most_triggered_id)
             if rule is not None:
                 stats["most_triggered"] = {
                     "name": rule.name,
@@ -516,7 +639,7 @@ if __name__ == "__main__":
     # 创建测试上下文
     test_npc = list(game_manager.state.npcs.values())[0]
     context = RuleContext(
-        actor=test_npc, action="test_action", game_state=game_manager.state.to_dict()
+        actor=test_npc, action="test_action", game_state=game_manager.state
     )
 
     # 检查规则
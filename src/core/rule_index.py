@@ -0,0 +1,171 @@
+"""
+规则分发索引
+按触发动作和地点对激活规则建立索引，避免每次动作都遍历全部规则
+"""
+from collections import defaultdict
+from typing import Any, DefaultDict, Dict, Iterable, List, Optional
+
+from ..models.rule import current_revision
+from .rule_predicate import CompiledRule, compile_rule
+
+# 未限定地点的规则使用该键
+ANY_LOCATION: Optional[str] = None
+
+
+class RuleIndex:
+    """规则索引：action -> location -> rules，外加 id -> Rule 映射"""
+
+    def __init__(self) -> None:
+        self._by_id: Dict[str, Any] = {}
+        self._compiled: Dict[str, CompiledRule] = {}  # 预编译的触发谓词
+        self._by_action: DefaultDict[
+            str, DefaultDict[Optional[str], List[Any]]
+        ] = defaultdict(lambda: defaultdict(list))
+        self._order: Dict[str, int] = {}  # 规则注册顺序，用于稳定排序
+        self._next_order = 0
+        # 规则列表版本号加上规则列表的身份，用于判断是否需要重建
+        self._signature: Optional[tuple] = None
+        # 上次同步时的全局规则修改序号，之后被修改的规则需要刷新
+        self._revision = 0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, rule_id: object) -> bool:
+        return rule_id in self._by_id
+
+    def get(self, rule_id: str) -> Optional[Any]:
+        """根据ID获取规则（O(1)）"""
+        return self._by_id.get(rule_id)
+
+    def order_of(self, rule_id: str) -> int:
+        """获取规则的注册顺序"""
+        return self._order.get(rule_id, 0)
+
+    def compiled(self, rule: Any) -> CompiledRule:
+        """获取规则的编译谓词
+
+        索引内的规则在加入或刷新时已编译；索引外的规则、已被替换的同ID规则
+        或编译后又被修改的规则临时编译，不写入缓存。
+        """
+        compiled = self._compiled.get(rule.id)
+        if (
+            compiled is not None
+            and compiled.rule is rule
+            and compiled.revision == getattr(rule, "revision", 0)
+        ):
+            return compiled
+        return compile_rule(rule)
+
+    def add(self, rule: Any) -> None:
+        """将规则加入索引（重复加入时重新索引）"""
+        if not hasattr(rule, "trigger"):
+            return
+        if rule.id in self._by_id:
+            self._unlink(rule.id)
+        else:
+            self._order[rule.id] = self._next_order
+            self._next_order += 1
+        self._by_id[rule.id] = rule
+        self._compiled[rule.id] = compile_rule(rule)
+        if getattr(rule, "active", True):
+            self._link(rule)
+
+    def remove(self, rule_id: str) -> None:
+        """从索引中移除规则"""
+        if rule_id not in self._by_id:
+            return
+        self._unlink(rule_id)
+        del self._by_id[rule_id]
+        self._compiled.pop(rule_id, None)
+        self._order.pop(rule_id, None)
+
+    def reindex(self, rule: Any) -> None:
+        """规则的激活状态或触发条件变化后刷新索引，并重新编译谓词"""
+        if rule.id not in self._by_id:
+            return
+        self._unlink(rule.id)
+        self._by_id[rule.id] = rule
+        self._compiled[rule.id] = compile_rule(rule)
+        if getattr(rule, "active", True):
+            self._link(rule)
+
+    def rebuild(self, rules: Iterable[Any], active_ids: Iterable[str]) -> None:
+        """根据规则列表和激活ID列表完整重建索引"""
+        self._by_id.clear()
+        self._compiled.clear()
+        self._by_action.clear()
+        self._order.clear()
+        self._next_order = 0
+
+        rules_by_id = {
+            getattr(rule, "id", None): rule
+            for rule in rules
+            if hasattr(rule, "trigger")
+        }
+        for rule_id in active_ids:
+            rule = rules_by_id.get(rule_id)
+            if rule is not None and rule_id not in self._by_id:
+                self.add(rule)
+
+    def sync(self, rules: List[Any], active_ids: List[str], version: int = 0) -> None:
+        """当规则列表被替换或规则被修改时更新索引
+
+        比较调用方维护的列表版本号（见 ``GameStateManager.mark_rules_changed``）
+        和两个列表的身份、长度，变化时完整重建。规则字段被赋值时会记录
+        全局修改序号（见 ``Rule.revision``），序号变化时只刷新之后被修改过的规则；
+        没有任何修改时开销为 O(1)。
+        """
+        revision = current_revision()
+        signature = self._signature_of(rules, active_ids, version)
+        if signature != self._signature:
+            self.rebuild(rules, active_ids)
+            self._signature = signature
+        elif revision != self._revision:
+            for rule in list(self._by_id.values()):
+                if getattr(rule, "revision", 0) > self._revision:
+                    self.reindex(rule)
+        self._revision = revision
+
+    def mark_synced(self, rules: List[Any], active_ids: List[str], version: int = 0) -> None:
+        """在增量修改后记录当前签名，避免下一次 sync 触发重建"""
+        self._signature = self._signature_of(rules, active_ids, version)
+
+    @staticmethod
+    def _signature_of(rules: List[Any], active_ids: List[str], version: int) -> tuple:
+        return (version, id(rules), len(rules), id(active_ids), len(active_ids))
+
+    def candidates(self, action: str, location: Optional[str]) -> List[Any]:
+        """获取某个动作在某地点可能触发的规则，按注册顺序返回"""
+        by_location = self._by_action.get(action)
+        if not by_location:
+            return []
+
+        wildcard = by_location.get(ANY_LOCATION, [])
+        located = by_location.get(location, []) if location is not None else []
+        if not located:
+            return list(wildcard)
+        if not wildcard:
+            return list(located)
+        return sorted(wildcard + located, key=lambda r: self._order[r.id])
+
+    def _link(self, rule: Any) -> None:
+        locations = rule.trigger.location or [ANY_LOCATION]
+        by_location = self._by_action[rule.trigger.action]
+        for location in set(locations):
+            bucket = by_location[location]
+            bucket.append(rule)
+            if len(bucket) > 1 and self._order[bucket[-2].id] > self._order[rule.id]:
+                bucket.sort(key=lambda r: self._order[r.id])
+
+    def _unlink(self, rule_id: str) -> None:
+        rule = self._by_id.get(rule_id)
+        if rule is None:
+            return
+        for action, by_location in list(self._by_action.items()):
+            for location, bucket in list(by_location.items()):
+                bucket[:] = [r for r in bucket if r.id != rule_id]
+                if not bucket:
+                    del by_location[location]
+            if not by_location:
+                del self._by_action[action]
@@ -0,0 +1,203 @@
+"""
+规则谓词编译
+将规则的触发条件预先编译为扁平的检查对象，避免每次动作检查时重复解释
+TriggerCondition、actor_traits 和 extra_conditions
+"""
+from typing import TYPE_CHECKING, Any, Callable, Dict, FrozenSet, List, Optional, Tuple, cast
+
+from ..models.rule import INVALID_TIME_WINDOW, TimeWindow, parse_clock
+from ..utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from .game_state import GameStateManager
+    from .rule_executor import RuleContext
+
+logger = get_logger(__name__)
+
+ExtraConditionCheck = Callable[["GameStateManager", "RuleContext"], bool]
+
+_MISSING = object()
+
+
+# ========== 额外条件检查函数 ==========
+
+
+def _lights_off(game_manager: "GameStateManager", context: "RuleContext") -> bool:
+    return not context.game_state.get("lights_on", True)
+
+
+def _occupancy(game_manager: "GameStateManager", context: "RuleContext") -> int:
+    """行动者所在地点的人数，优先使用行动快照中记录的值"""
+    if context.occupancy is not None:
+        return context.occupancy
+    return game_manager.count_npcs_in_location(cast(str, context.actor_location))
+
+
+def _alone(game_manager: "GameStateManager", context: "RuleContext") -> bool:
+    return _occupancy(game_manager, context) == 1
+
+
+def _multiple_people(game_manager: "GameStateManager", context: "RuleContext") -> bool:
+    return _occupancy(game_manager, context) > 1
+
+
+def _low_sanity(game_manager: "GameStateManager", context: "RuleContext") -> bool:
+    return context.actor.get("sanity", 100) < 50
+
+
+def _high_fear(game_manager: "GameStateManager", context: "RuleContext") -> bool:
+    return context.actor.get("fear", 0) > 50
+
+
+EXTRA_CONDITION_CHECKS: Dict[str, ExtraConditionCheck] = {
+    "lights_off": _lights_off,
+    "alone": _alone,
+    "multiple_people": _multiple_people,
+    "low_sanity": _low_sanity,
+    "high_fear": _high_fear,
+}
+
+
+# ========== 编译后的规则 ==========
+
+
+class CompiledRule:
+    """编译后的规则触发谓词
+
+    只包含规则自身的静态条件；激活状态和冷却时间由执行器单独检查。
+    """
+
+    __slots__ = (
+        "rule",
+        "action",
+        "locations",
+        "time_window",
+        "items",
+        "trait_checks",
+        "extra_checks",
+        "extra_names",
+        "revision",
+    )
+
+    def __init__(
+        self,
+        rule: Any,
+        action: str,
+        locations: Optional[FrozenSet[str]],
+        time_window: Optional[TimeWindow],
+        items: Tuple[str, ...],
+        trait_checks: Tuple[Tuple[str, Any, Any, Any], ...],
+        extra_checks: Tuple[ExtraConditionCheck, ...],
+        extra_names: Tuple[str, ...] = (),
+        revision: int = 0,
+    ) -> None:
+        self.rule = rule
+        self.action = action
+        self.locations = locations
+        # 时间范围格式错误时为 INVALID_TIME_WINDOW，永不触发
+        self.time_window = time_window
+        self.items = items
+        self.trait_checks = trait_checks
+        self.extra_checks = extra_checks
+        # 与 extra_checks 一一对应的条件名，供按列批量判定使用
+        self.extra_names = extra_names
+        # 编译时规则的修改序号，规则之后被修改则需要重新编译
+        self.revision = revision
+
+    def matches(self, context: "RuleContext", game_manager: "GameStateManager") -> bool:
+        """检查上下文是否满足编译后的触发条件"""
+        if context.action != self.action:
+            return False
+
+        if self.locations is not None and context.actor_location not in self.locations:
+            return False
+
+        if not self.matches_time(context.current_time):
+            return False
+
+        return self.matches_actor(context, game_manager)
+
+    def matches_time(self, current_time: str) -> bool:
+        """检查时间条件（同一回合内对所有行动相同，可预先计算）"""
+        if self.time_window is None:
+            return True
+        return self._in_time_window(current_time)
+
+    def matches_actor(
+        self, context: "RuleContext", game_manager: "GameStateManager"
+    ) -> bool:
+        """检查与行动者相关的条件：物品、特质和额外条件"""
+        if self.items:
+            actor_items = context.actor_items
+            for item in self.items:
+                if item not in actor_items:
+                    return False
+
+        if self.trait_checks:
+            actor = context.actor
+            for trait, minimum, maximum, expected in self.trait_checks:
+                actor_value = actor.get(trait, 0)
+                if expected is not _MISSING:
+                    if actor_value != expected:
+                        return False
+                    continue
+                if minimum is not None and actor_value < minimum:
+                    return False
+                if maximum is not None and actor_value > maximum:
+                    return False
+
+        for check in self.extra_checks:
+            if not check(game_manager, context):
+                return False
+
+        return True
+
+    def _in_time_window(self, current_time: str) -> bool:
+        current = parse_clock(current_time)
+        if current is None:
+            logger.error(f"时间格式错误: '{current_time}' 不符合 HH:MM 格式")
+            return False
+        return cast(TimeWindow, self.time_window).contains(current)
+
+
+def compile_rule(rule: Any) -> CompiledRule:
+    """将规则编译为扁平的触发谓词"""
+    trigger = rule.trigger
+
+    locations = frozenset(trigger.location) if trigger.location else None
+
+    time_window = trigger.time_window
+    if time_window == INVALID_TIME_WINDOW:
+        logger.error(f"规则 {rule.id} 的时间范围格式错误: {trigger.time_range}")
+
+    trait_checks: List[Tuple[str, Any, Any, Any]] = []
+    for trait, requirement in rule.requirements.actor_traits.items():
+        if isinstance(requirement, dict):
+            trait_checks.append(
+                (trait, requirement.get("min"), requirement.get("max"), _MISSING)
+            )
+        else:
+            trait_checks.append((trait, None, None, requirement))
+
+    extra_checks: List[ExtraConditionCheck] = []
+    extra_names: List[str] = []
+    for condition in trigger.extra_conditions:
+        check = EXTRA_CONDITION_CHECKS.get(condition)
+        if check is None:
+            # 未知条件默认为真，编译时提示一次即可
+            logger.warning(f"未知的额外条件: {condition}")
+            continue
+        extra_checks.append(check)
+        extra_names.append(condition)
+
+    return CompiledRule(
+        rule=rule,
+        action=trigger.action,
+        locations=locations,
+        time_window=time_window,
+        items=tuple(rule.requirements.items),
+        trait_checks=tuple(trait_checks),
+        extra_checks=tuple(extra_checks),
+        extra_names=tuple(extra_names),
+        revision=getattr(rule, "revision", 0),
+    )
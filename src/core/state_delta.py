@@ -0,0 +1,124 @@
+"""
+状态增量
+跟踪每回合被修改的游戏状态字段和NPC字段，并以带版本号的
+JSON Patch 风格操作记录状态变化，供推送增量更新和按序号重新同步
+"""
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+# 一个增量操作，如 {"op": "replace", "path": "/fear_points", "value": 900}
+PatchOp = Dict[str, Any]
+
+# diff_ops 中表示删除路径的标记值
+REMOVE = object()
+
+# 默认保留的增量版本数，超出后重新同步只能发送完整快照
+DEFAULT_HISTORY = 200
+
+
+def escape_path(key: Any) -> str:
+    """按 JSON Pointer 规则转义路径片段"""
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+class DirtyTracker:
+    """记录自上次清空以来被修改的字段
+
+    游戏状态字段记录字段名；NPC记录字段、NPC加入和移除按NPC ID记录。
+    只记录“被写过”，值是否真的变化由生成增量的一方比较。
+    """
+
+    def __init__(self) -> None:
+        self.fields: Set[str] = set()
+        self.npcs: Dict[str, Set[str]] = {}
+        self.added: Set[str] = set()
+        self.removed: Set[str] = set()
+
+    def __bool__(self) -> bool:
+        return bool(self.fields or self.npcs or self.added or self.removed)
+
+    def mark_field(self, name: str) -> None:
+        self.fields.add(name)
+
+    def mark_npc(self, npc_id: Any, key: str) -> None:
+        keys = self.npcs.get(npc_id)
+        if keys is None:
+            keys = self.npcs[npc_id] = set()
+        keys.add(key)
+
+    def npc_added(self, npc_id: str) -> None:
+        self.removed.discard(npc_id)
+        self.added.add(npc_id)
+
+    def npc_removed(self, npc_id: str) -> None:
+        self.added.discard(npc_id)
+        self.npcs.pop(npc_id, None)
+        self.removed.add(npc_id)
+
+    def clear(self) -> None:
+        self.fields.clear()
+        self.npcs.clear()
+        self.added.clear()
+        self.removed.clear()
+
+
+def diff_ops(
+    document: Dict[str, Any], updates: Iterable[Tuple[Tuple[Any, ...], Any]]
+) -> List[PatchOp]:
+    """对比并原地更新文档，返回值发生变化的路径对应的操作
+
+    Args:
+        document: 客户端当前持有的状态文档（会被原地更新为新状态）
+        updates: ((路径片段...), 新值) 序列，新值为 REMOVE 表示删除该路径
+
+    Returns:
+        List[PatchOp]: add/replace/remove 操作，值相同的路径不产生操作
+    """
+    ops: List[PatchOp] = []
+    for path, value in updates:
+        parent = document
+        for key in path[:-1]:
+            parent = parent.setdefault(key, {})
+        key = path[-1]
+        pointer = "/" + "/".join(escape_path(part) for part in path)
+        if value is REMOVE:
+            if key in parent:
+                del parent[key]
+                ops.append({"op": "remove", "path": pointer})
+            continue
+        if key not in parent:
+            ops.append({"op": "add", "path": pointer, "value": value})
+        elif parent[key] != value:
+            ops.append({"op": "replace", "path": pointer, "value": value})
+        else:
+            continue
+        parent[key] = value
+    return ops
+
+
+class DeltaLog:
+    """带版本号的增量历史
+
+    每次发布增量版本号加一；客户端带着已持有的版本号请求重新同步时，
+    如果历史中仍保留之后的全部增量则只补发增量，否则需要完整快照。
+    """
+
+    def __init__(self, history: int = DEFAULT_HISTORY) -> None:
+        self.version = 0
+        self._entries: Deque[Tuple[int, List[PatchOp]]] = deque(maxlen=history)
+
+    def append(self, ops: List[PatchOp]) -> int:
+        """记录一组增量，返回新的版本号"""
+        self.version += 1
+        self._entries.append((self.version, ops))
+        return self.version
+
+    def since(self, version: int) -> Optional[List[Tuple[int, List[PatchOp]]]]:
+        """某版本之后的全部增量；无法补齐时返回 None"""
+        if version > self.version or version < 0:
+            return None
+        if version == self.version:
+            return []
+        if not self._entries or self._entries[0][0] > version + 1:
+            return None
+        return [(v, ops) for v, ops in self._entries if v > version]
@@ -80,6 +80,7 @@ class SaveManager:
                     if hasattr(game_state_manager, "map_manager")
                     else None
                 ),
+                "rng": game_state_manager.rng.to_dict(),
             },
             "statistics": game_state_manager.get_statistics()
             if hasattr(game_state_manager, "get_statistics")
@@ -171,11 +172,17 @@ class SaveManager:
         # 恢复NPC
         npcs_data = save_data.get("managers", {}).get("npcs", {})
         game_manager.state.npcs = self._deserialize_npcs(npcs_data)
+        game_manager.sync_npcs_from_state()
 
-        # 恢复地图（如果有）
-        map_data = save_data.get("managers", {}).get("map")
-        if map_data and hasattr(game_manager, "map_manager"):
-            game_manager.map_manager = self._deserialize_map(map_data)
+        # 恢复地图（如果有），区域的NPC列表由NPC位置索引提供
+        map_manager = self._deserialize_map(save_data.get("managers", {}).get("map"))
+        if map_manager is not None:
+            game_manager.attach_map(map_manager)
+
+        # 恢复随机数状态（旧存档没有该字段）
+        rng_data = save_data.get("managers", {}).get("rng")
+        if rng_data:
+            game_manager.rng.load_dict(rng_data)
 
         logger.info(f"游戏状态已恢复，当前回合: {game_manager.state.turn}")
         return game_manager
@@ -310,6 +317,10 @@ class SaveManager:
         """序列化规则"""
         serialized: Dict[str, Dict[str, Any]] = {}
         for rule in rules:
+            if hasattr(rule, "model_dump"):
+                # pydantic 规则模型直接导出为可 JSON 序列化的字典
+                serialized[rule.id] = rule.model_dump(mode="json")
+                continue
             serialized[rule.id] = (
                 rule.to_dict()
                 if hasattr(rule, "to_dict")
@@ -2,7 +2,7 @@
 地图管理器
 管理游戏场景的地图和区域
 """
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 from enum import Enum
 
 
@@ -29,10 +29,23 @@ class Area:
         self.description: str = description
         self.connected_to: List[str] = connected_to or []
         self.items: List[str] = []
-        self.npcs: List[str] = []
+        self._npcs: List[str] = []
+        # 绑定到NPC位置索引后，区域内的NPC由索引提供
+        self._occupancy: Optional[Callable[[str], List[str]]] = None
         self.rules: List[str] = []
         self.properties: List[AreaProperty] = []
 
+    @property
+    def npcs(self) -> List[str]:
+        """区域内的NPC ID列表"""
+        if self._occupancy is not None:
+            return self._occupancy(self.id)
+        return self._npcs
+
+    @npcs.setter
+    def npcs(self, value: List[str]) -> None:
+        self._npcs = list(value)
+
     def to_dict(self) -> dict:
         return {
             "id": self.id,
@@ -66,6 +79,17 @@ class MapManager:
     def __init__(self):
         self.areas: Dict[str, Area] = {}
         self.current_area: Optional[str] = None
+        self._occupancy: Optional[Callable[[str], List[str]]] = None
+
+    def bind_occupancy(self, occupancy: Optional[Callable[[str], List[str]]]) -> None:
+        """让所有区域的 npcs 从NPC位置索引读取，避免两份数据不一致
+
+        Args:
+            occupancy: area_id -> NPC ID 列表；为 None 时解除绑定
+        """
+        self._occupancy = occupancy
+        for area in self.areas.values():
+            area._occupancy = occupancy
 
     def create_default_map(self):
         """创建默认地图"""
@@ -112,6 +136,7 @@ class MapManager:
 
     def add_area(self, area: Area):
         """添加区域"""
+        area._occupancy = self._occupancy
         self.areas[area.id] = area
 
     def get_area(self, area_id: str) -> Optional[Area]:
@@ -160,6 +185,7 @@ class MapManager:
             area.npcs = area_data.get("npcs", [])
             area.rules = area_data.get("rules", [])
             area.properties = [AreaProperty(p) for p in area_data.get("properties", [])]
+            area._occupancy = self._occupancy
             self.areas[area_id] = area
 
         self.current_area = data.get("current_area")
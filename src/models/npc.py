@@ -3,11 +3,16 @@ NPC系统数据模型
 定义NPC的属性、行为和状态
 """
 from pydantic import BaseModel, ConfigDict, Field
-from typing import Dict, List, Optional, Any
+from typing import TYPE_CHECKING, Dict, List, Optional, Any
 from enum import Enum
 import random
 import uuid
 
+from ..utils.rng import default_rng
+
+if TYPE_CHECKING:
+    from ..core.relationship_graph import RelationshipGraph
+
 
 class NPCStatus(str, Enum):
     """NPC状态枚举"""
@@ -182,8 +187,11 @@ class NPC(BaseModel):
             self.status not in [NPCStatus.DEAD, NPCStatus.INSANE] and self.stamina > 0
         )
 
-    def decide_action(self, context: Dict[str, Any]) -> Optional[NPCAction]:
+    def decide_action(
+        self, context: Dict[str, Any], rng: Optional[random.Random] = None
+    ) -> Optional[NPCAction]:
         """根据当前状态决定行动"""
+        rng = default_rng(rng)
         if not self.can_act():
             return None
 
@@ -250,10 +258,20 @@ class NPC(BaseModel):
         total = sum(probabilities)
         probabilities = [p / total for p in probabilities]
 
-        return random.choices(actions, weights=probabilities)[0]
+        return rng.choices(actions, weights=probabilities)[0]
+
+    def interact_with(
+        self, other_npc: "NPC", graph: Optional["RelationshipGraph"] = None
+    ):
+        """与其他NPC互动
+
+        Args:
+            graph: 游戏的关系图；提供时关系写入关系图，本NPC的 relationships
+                改为引用关系图中的行
+        """
+        if graph is not None:
+            self.relationships = graph.bind(self.id, self.relationships)
 
-    def interact_with(self, other_npc: "NPC"):
-        """与其他NPC互动"""
         # 初始化关系
         if other_npc.id not in self.relationships:
             # 基于性格的初始好感度
@@ -274,8 +292,9 @@ class NPC(BaseModel):
             # 看到别人恐慌也会害怕
             self.add_fear(15)
 
-    def use_item(self, item: str) -> Dict[str, Any]:
+    def use_item(self, item: str, rng: Optional[random.Random] = None) -> Dict[str, Any]:
         """使用物品"""
+        rng = default_rng(rng)
         if item not in self.inventory:
             return {"success": False, "message": "没有该物品"}
 
@@ -287,7 +306,7 @@ class NPC(BaseModel):
             result["message"] = "手电筒的光让你感觉安心了一些"
 
         elif item == "phone":
-            if random.random() < 0.3:  # 30%概率没信号
+            if rng.random() < 0.3:  # 30%概率没信号
                 self.add_fear(5)
                 result["message"] = "手机没有信号..."
             else:
@@ -300,8 +319,14 @@ class NPC(BaseModel):
 
         return result
 
-    def observe_event(self, event_type: str, details: Dict[str, Any]):
+    def observe_event(
+        self,
+        event_type: str,
+        details: Dict[str, Any],
+        rng: Optional[random.Random] = None,
+    ):
         """观察到事件"""
+        rng = default_rng(rng)
         # 记录到记忆
         self.memory.add_event(event_type, details)
 
@@ -312,7 +337,7 @@ class NPC(BaseModel):
 
         elif event_type == "rule_triggered":
             # 可能学会规则
-            if self.personality.rationality >= 7 and random.random() < 0.5:
+            if self.personality.rationality >= 7 and rng.random() < 0.5:
                 rule_id = details.get("rule_id")
                 if rule_id:
                     self.memory.remember_rule(rule_id)
@@ -335,9 +360,14 @@ class NPC(BaseModel):
         return desc
 
     def choose_move_destination(
-        self, current_area, available_areas, map_manager
+        self,
+        current_area,
+        available_areas,
+        map_manager,
+        rng: Optional[random.Random] = None,
     ) -> Optional[str]:
         """选择移动目的地"""
+        rng = default_rng(rng)
         from src.models.map import AreaProperty
 
         if not available_areas:
@@ -399,10 +429,10 @@ class NPC(BaseModel):
 
         if total_score == 0:
             # 所有地方都不想去，随机选一个
-            return random.choice(areas)
+            return rng.choice(areas)
 
         probabilities = [s / total_score for s in scores]
-        return random.choices(areas, weights=probabilities)[0]
+        return rng.choices(areas, weights=probabilities)[0]
 
     def perform_move(self, distance: int = 1):
         """执行移动，消耗体力"""
@@ -471,34 +501,37 @@ NPC_BACKGROUNDS = [
 ]
 
 
-def generate_random_npc(name: Optional[str] = None) -> NPC:
+def generate_random_npc(
+    name: Optional[str] = None, rng: Optional[random.Random] = None
+) -> NPC:
     """生成随机NPC"""
+    rng = default_rng(rng)
     if not name:
-        name = random.choice(NPC_NAMES)
+        name = rng.choice(NPC_NAMES)
 
-    background = random.choice(NPC_BACKGROUNDS)
+    background = rng.choice(NPC_BACKGROUNDS)
 
     # 随机性格
     personality = NPCPersonality(
-        rationality=random.randint(3, 8),
-        courage=random.randint(2, 8),
-        curiosity=random.randint(3, 9),
-        sociability=random.randint(2, 8),
-        paranoia=random.randint(1, 6),
+        rationality=rng.randint(3, 8),
+        courage=rng.randint(2, 8),
+        curiosity=rng.randint(3, 9),
+        sociability=rng.randint(2, 8),
+        paranoia=rng.randint(1, 6),
     )
 
     # 随机初始物品
     possible_items = ["flashlight", "phone", "key", "medicine", "knife", "rope"]
-    inventory = random.sample(possible_items, random.randint(0, 2))
+    inventory = rng.sample(possible_items, rng.randint(0, 2))
 
     return NPC(
         name=name,
         background=background,
         personality=personality,
         inventory=inventory,
-        hp=random.randint(80, 100),
-        sanity=random.randint(70, 100),
-        stamina=random.randint(80, 100),
+        hp=rng.randint(80, 100),
+        sanity=rng.randint(70, 100),
+        stamina=rng.randint(80, 100),
     )
 
 
@@ -2,15 +2,19 @@
 NPC管理器
 管理所有NPC的创建、状态和行为
 """
+import random
 from typing import Dict, List, Optional
+
+from ..utils.rng import default_rng
 from .npc import NPC
 
 
 class NPCManager:
     """NPC管理器"""
 
-    def __init__(self):
+    def __init__(self, rng: Optional[random.Random] = None):
         self.npcs: Dict[str, NPC] = {}
+        self.rng = default_rng(rng)
         # 使用更多样化的英文名字
         self.npc_names = [
             # 普通人名
@@ -34,8 +38,7 @@ class NPCManager:
             # 智能选择名字
             available_names = [n for n in self.npc_names if n not in self.used_names]
             if available_names:
-                import random
-                name = random.choice(available_names)
+                name = self.rng.choice(available_names)
                 self.used_names.add(name)
             elif self.name_index < len(self.npc_names):
                 # 如果没有可用名字，顺序使用
@@ -3,17 +3,106 @@
 定义游戏中所有规则相关的数据结构
 """
 
+import itertools
 import json
 import logging
+import re
+import threading
 from datetime import datetime
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, ClassVar, Dict, FrozenSet, List, NamedTuple, Optional
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
 
 logger = logging.getLogger(__name__)
 
+_CLOCK_PATTERN = re.compile(r"^\d{2}:\d{2}$")
+
+
+@lru_cache(maxsize=2048)
+def parse_clock(value: str) -> Optional[int]:
+    """将 "HH:MM" 解析为当天的分钟数，格式错误返回 None"""
+    if not isinstance(value, str) or not _CLOCK_PATTERN.match(value):
+        return None
+    hours, minutes = int(value[:2]), int(value[3:])
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+
+class TimeWindow(NamedTuple):
+    """以当天分钟数表示的时间窗口（闭区间），start > end 表示跨越午夜"""
+
+    start: int
+    end: int
+
+    def contains(self, minute: int) -> bool:
+        """检查某个分钟数是否落在窗口内"""
+        if self.start <= self.end:
+            return self.start <= minute <= self.end
+        return minute >= self.start or minute <= self.end
+
+
+# 时间范围格式错误时使用的窗口，任何时间都不在其中
+INVALID_TIME_WINDOW = TimeWindow(-1, -1)
+
+
+def parse_time_window(time_range: Optional[Dict[str, str]]) -> Optional[TimeWindow]:
+    """将 {"from": "HH:MM", "to": "HH:MM"} 转换为时间窗口
+
+    Returns:
+        未设置时间范围时返回 None，格式错误时返回 INVALID_TIME_WINDOW
+    """
+    if not time_range:
+        return None
+    start = parse_clock(time_range.get("from", ""))
+    end = parse_clock(time_range.get("to", ""))
+    if start is None or end is None:
+        return INVALID_TIME_WINDOW
+    return TimeWindow(start, end)
+
+
+def time_in_window(current_time: str, window: TimeWindow) -> bool:
+    """检查 "HH:MM" 格式的当前时间是否在窗口内，格式错误视为不在"""
+    current = parse_clock(current_time)
+    if current is None:
+        return False
+    return window.contains(current)
+
+
+# 规则修改序号：进程内全局递增，规则、触发条件或前置要求的字段被赋值时取一个新值
+_revision_counter = itertools.count(1)
+_revision_lock = threading.Lock()
+_last_revision = 0
+
+
+def _next_revision() -> int:
+    global _last_revision
+    with _revision_lock:
+        _last_revision = next(_revision_counter)
+        return _last_revision
+
+
+def current_revision() -> int:
+    """最近一次规则修改的序号，未变化说明没有任何规则被修改过"""
+    return _last_revision
+
+
+class _Revisioned(BaseModel):
+    """字段被赋值时记录修改序号的模型基类"""
+
+    # 不影响触发判定的运行时计数字段，赋值时不记录修改
+    _UNTRACKED_FIELDS: ClassVar[FrozenSet[str]] = frozenset()
+
+    _revision: int = PrivateAttr(default=0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if not name.startswith("_") and name not in self._UNTRACKED_FIELDS:
+            self._revision = _next_revision()
+
 
 class EffectType(str, Enum):
     """规则效果类型枚举"""
@@ -27,7 +116,7 @@ class EffectType(str, Enum):
     TRIGGER_EVENT = "trigger_event"
 
 
-class TriggerCondition(BaseModel):
+class TriggerCondition(_Revisioned):
     """触发条件模型"""
 
     action: str = Field(..., description="触发动作，如look_mirror, open_door")
@@ -36,6 +125,9 @@ class TriggerCondition(BaseModel):
     extra_conditions: List[str] = Field(default_factory=list, description="额外条件")
     probability: float = Field(0.8, ge=0.0, le=1.0, description="基础触发概率")
 
+    # 预解析的时间窗口，构造时计算一次
+    _time_window: Optional[TimeWindow] = PrivateAttr(default=None)
+
     @field_validator("time_range")
     @classmethod
     def validate_time_range(cls, v):
@@ -43,8 +135,21 @@ class TriggerCondition(BaseModel):
             raise ValueError("time_range必须包含'from'和'to'字段")
         return v
 
+    def model_post_init(self, __context: Any) -> None:
+        self._time_window = parse_time_window(self.time_range)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name == "time_range":
+            self._time_window = parse_time_window(value)
 
-class RuleRequirement(BaseModel):
+    @property
+    def time_window(self) -> Optional[TimeWindow]:
+        """预解析的时间窗口，未设置时间范围时为 None"""
+        return self._time_window
+
+
+class RuleRequirement(_Revisioned):
     """规则前置要求"""
 
     items: List[str] = Field(default_factory=list, description="需要的物品")
@@ -74,8 +179,17 @@ class Loophole(BaseModel):
     auto_discovered_after: Optional[int] = Field(None, description="多少回合后自动发现")
 
 
-class Rule(BaseModel):
-    """游戏规则核心模型"""
+class Rule(_Revisioned):
+    """游戏规则核心模型
+
+    规则、触发条件和前置要求的字段被赋值时记录修改序号（见 ``revision``），
+    规则索引和编译谓词据此自动失效。列表、字典字段应整体赋值，
+    就地修改其元素不会被记录。
+    """
+
+    _UNTRACKED_FIELDS: ClassVar[FrozenSet[str]] = frozenset(
+        ("cooldown_turns", "times_triggered", "times_discovered")
+    )
 
     id: str = Field(..., description="规则唯一ID")
     name: str = Field(..., min_length=1, max_length=50, description="规则名称")
@@ -141,6 +255,15 @@ class Rule(BaseModel):
     # 升级路径
     upgrade_options: List[str] = Field(default_factory=list, description="可用升级选项")
 
+    @property
+    def revision(self) -> int:
+        """规则及其触发条件、前置要求最近一次被修改的序号"""
+        return max(
+            self._revision,
+            getattr(self.trigger, "_revision", 0),
+            getattr(self.requirements, "_revision", 0),
+        )
+
     def calculate_total_cost(self) -> int:
         """计算规则总成本"""
         level_modifier = self.level * 50
@@ -161,20 +284,9 @@ class Rule(BaseModel):
             return False
 
         # 检查时间条件
-        if self.trigger.time_range:
-            current_time = context.get("current_time", "00:00")
-            try:
-                current = int(current_time.replace(":", ""))
-                start = int(self.trigger.time_range["from"].replace(":", ""))
-                end = int(self.trigger.time_range["to"].replace(":", ""))
-
-                if start <= end:
-                    if not (start <= current <= end):
-                        return False
-                else:
-                    if not (current >= start or current <= end):
-                        return False
-            except Exception:
+        window = self.trigger.time_window
+        if window is not None:
+            if not time_in_window(context.get("current_time", "00:00"), window):
                 return False
 
         # 检查地点条件
@@ -11,10 +11,12 @@ class RuleManager:
     def __init__(self) -> None:
         self.rules: Dict[str, Rule] = {}
         self.active_rules: List[Rule] = []
+        self.version = 0  # 每次增删规则递增，供使用方判断规则是否变化
 
     def add_rule(self, rule: Rule) -> None:
         self.rules[rule.id] = rule
         self.active_rules.append(rule)
+        self.version += 1
 
     def get_rule(self, rule_id: str) -> Optional[Rule]:
         return self.rules.get(rule_id)
@@ -23,3 +25,4 @@ class RuleManager:
         rule = self.rules.pop(rule_id, None)
         if rule and rule in self.active_rules:
             self.active_rules.remove(rule)
+        self.version += 1
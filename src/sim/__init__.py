@@ -0,0 +1,18 @@
+"""
+无界面批量模拟
+"""
+from .simulator import (
+    GameResult,
+    HeadlessGame,
+    SimulationConfig,
+    SimulationReport,
+    run_simulations,
+)
+
+__all__ = [
+    "GameResult",
+    "HeadlessGame",
+    "SimulationConfig",
+    "SimulationReport",
+    "run_simulations",
+]
@@ -0,0 +1,86 @@
+"""
+批量模拟命令行入口
+
+用法:
+    python -m src.sim --games 10000 --turns 30
+    python -m src.sim --rules my_rules.json --processes 4 --json
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from .simulator import SimulationConfig, run_simulations
+
+# 未指定规则文件时使用的示例规则，触发动作取自 NPCBehavior 的行动集合
+EXAMPLE_RULES = [
+    {
+        "id": "mirror_gaze",
+        "name": "镜中凝视",
+        "trigger": {"action": "look_mirror", "location": ["bathroom"], "probability": 0.6},
+        "effect": {"type": "sanity_loss", "params": {"amount": 30}, "fear_gain": 40},
+    },
+    {
+        "id": "corridor_whisper",
+        "name": "走廊低语",
+        "trigger": {"action": "turn_around", "location": ["corridor"], "probability": 0.5},
+        "effect": {"type": "instant_death", "fear_gain": 150},
+    },
+    {
+        "id": "curious_eyes",
+        "name": "窥视之眼",
+        "trigger": {"action": "investigate", "probability": 0.1},
+        "effect": {"type": "fear_gain", "fear_gain": 10},
+    },
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="RuleK 无界面批量模拟")
+    parser.add_argument("--games", type=int, default=1000, help="模拟局数")
+    parser.add_argument("--turns", type=int, default=30, help="每局最多回合数")
+    parser.add_argument("--npcs", type=int, default=4, help="每局NPC数量")
+    parser.add_argument("--difficulty", default="normal", help="难度")
+    parser.add_argument("--seed", type=int, default=0, help="基础随机种子")
+    parser.add_argument("--processes", type=int, default=None, help="进程数")
+    parser.add_argument(
+        "--rules", type=Path, default=None, help="规则JSON文件（规则字典列表），默认使用示例规则"
+    )
+    parser.add_argument("--no-llm", action="store_true", help="不调用模拟LLM客户端")
+    parser.add_argument("--json", action="store_true", help="以JSON输出汇总")
+    args = parser.parse_args()
+
+    if args.rules:
+        rules = json.loads(args.rules.read_text(encoding="utf-8"))
+    else:
+        rules = EXAMPLE_RULES
+
+    config = SimulationConfig(
+        rules=rules,
+        difficulty=args.difficulty,
+        npc_count=args.npcs,
+        max_turns=args.turns,
+        seed=args.seed,
+        use_mock_llm=not args.no_llm,
+    )
+
+    started = time.perf_counter()
+    report = run_simulations(config, args.games, processes=args.processes)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({**report.to_dict(), "elapsed": elapsed}, ensure_ascii=False, indent=2))
+        return
+
+    print(f"模拟 {report.games} 局，耗时 {elapsed:.1f}s")
+    print(f"- 平均回合数: {report.avg_turns:.1f}")
+    print(f"- NPC存活率: {report.survival_rate:.1%}")
+    print(f"- 全灭局数: {report.wipeouts}")
+    print(f"- 每回合恐惧收益: {report.fear_per_turn:.1f}")
+    print("- 规则触发次数:")
+    for rule_id, count in sorted(report.rules_fired.items(), key=lambda x: -x[1]):
+        print(f"    {rule_id}: {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+无界面批量模拟器
+不依赖CLI或Web服务，直接基于 GameStateManager、RuleExecutor、NPCBehavior
+和模拟LLM客户端跑完整局游戏，用于平衡规则成本和压测引擎改动
+"""
+import asyncio
+import logging
+import multiprocessing
+import tempfile
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..api.mock_deepseek_client import MockDeepSeekClient
+from ..core.dialogue_system import DialogueSystem
+from ..core.game_state import GameStateManager
+from ..core.npc_behavior import NPCBehavior
+from ..core.rule_executor import RuleExecutor
+from ..models.npc import generate_random_npc
+from ..models.rule import Rule
+from ..utils.logger import set_game_event_file_enabled
+
+# 进行对话阶段的时段（与Web服务一致）
+DIALOGUE_TIMES = ("morning", "evening")
+
+
+@dataclass
+class SimulationConfig:
+    """模拟配置
+
+    Attributes:
+        rules: 规则数据列表（Rule 的字典形式），每局开始时创建
+        difficulty: 难度
+        npc_count: 每局NPC数量
+        max_turns: 每局最多回合数
+        seed: 基础种子，第 i 局使用 seed + i
+        initial_fear_points: 初始恐惧积分
+        use_mock_llm: 对话阶段是否调用模拟LLM客户端
+    """
+
+    rules: List[Dict[str, Any]] = field(default_factory=list)
+    difficulty: str = "normal"
+    npc_count: int = 4
+    max_turns: int = 30
+    seed: int = 0
+    initial_fear_points: int = 1000
+    use_mock_llm: bool = True
+
+
+@dataclass
+class GameResult:
+    """单局模拟结果"""
+
+    seed: int
+    turns_played: int
+    npcs_total: int
+    npcs_alive: int
+    fear_gained: int
+    rule_cost: int
+    rules_fired: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def survival_rate(self) -> float:
+        return self.npcs_alive / self.npcs_total if self.npcs_total else 0.0
+
+    @property
+    def fear_per_turn(self) -> float:
+        return self.fear_gained / self.turns_played if self.turns_played else 0.0
+
+
+@dataclass
+class SimulationReport:
+    """批量模拟的汇总统计"""
+
+    games: int = 0
+    turns_played: int = 0
+    npcs_total: int = 0
+    npcs_alive: int = 0
+    fear_gained: int = 0
+    rule_cost: int = 0
+    wipeouts: int = 0  # 全员死亡的局数
+    rules_fired: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, result: GameResult) -> None:
+        """计入一局结果"""
+        self.games += 1
+        self.turns_played += result.turns_played
+        self.npcs_total += result.npcs_total
+        self.npcs_alive += result.npcs_alive
+        self.fear_gained += result.fear_gained
+        self.rule_cost += result.rule_cost
+        if result.npcs_alive == 0:
+            self.wipeouts += 1
+        for rule_id, count in result.rules_fired.items():
+            self.rules_fired[rule_id] = self.rules_fired.get(rule_id, 0) + count
+
+    def merge(self, other: "SimulationReport") -> None:
+        """合并另一份汇总（来自其他进程）"""
+        self.games += other.games
+        self.turns_played += other.turns_played
+        self.npcs_total += other.npcs_total
+        self.npcs_alive += other.npcs_alive
+        self.fear_gained += other.fear_gained
+        self.rule_cost += other.rule_cost
+        self.wipeouts += other.wipeouts
+        for rule_id, count in other.rules_fired.items():
+            self.rules_fired[rule_id] = self.rules_fired.get(rule_id, 0) + count
+
+    @property
+    def survival_rate(self) -> float:
+        return self.npcs_alive / self.npcs_total if self.npcs_total else 0.0
+
+    @property
+    def fear_per_turn(self) -> float:
+        return self.fear_gained / self.turns_played if self.turns_played else 0.0
+
+    @property
+    def avg_turns(self) -> float:
+        return self.turns_played / self.games if self.games else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data.update(
+            survival_rate=self.survival_rate,
+            fear_per_turn=self.fear_per_turn,
+            avg_turns=self.avg_turns,
+        )
+        return data
+
+
+class HeadlessGame:
+    """单局无界面游戏"""
+
+    def __init__(self, config: SimulationConfig, seed: int):
+        self.config = config
+        self.seed = seed
+        # 模拟不存档，淘汰的事件直接丢弃，不在工作目录下写入存档或事件文件
+        self.game_manager = GameStateManager(
+            save_dir=tempfile.gettempdir(),
+            config={"seed": seed, "echo_log": False, "event_spill": False},
+        )
+        self.game_manager.new_game(
+            f"sim_{seed}",
+            {
+                "difficulty": config.difficulty,
+                "initial_fear_points": config.initial_fear_points,
+            },
+        )
+        rng = self.game_manager.rng
+        self.rule_executor = RuleExecutor(self.game_manager)
+        self.npc_behavior = NPCBehavior(self.game_manager)
+        self.dialogue_system = (
+            DialogueSystem(MockDeepSeekClient(), rng=rng.dialogue)
+            if config.use_mock_llm
+            else None
+        )
+        self.rule_cost = 0
+
+        self._create_npcs()
+        self._create_rules()
+
+    def _create_npcs(self) -> None:
+        rng = self.game_manager.rng.npc
+        for i in range(self.config.npc_count):
+            npc = generate_random_npc(rng=rng).to_dict()
+            # NPCBehavior 直接读取顶层性格字段
+            npc.update(npc.pop("personality"))
+            npc["id"] = f"npc_{i + 1}"
+            npc["status"] = npc["status"].value
+            self.game_manager.add_npc(npc)
+
+    def _create_rules(self) -> None:
+        for data in self.config.rules:
+            rule = Rule(**data)
+            cost = rule.calculate_total_cost()
+            self.game_manager.spend_fear_points(cost)
+            self.rule_cost += cost
+            self.game_manager.add_rule(rule)
+
+    async def play_turn(self) -> None:
+        """执行一个完整回合：对话、行动、规则判定、结算"""
+        gm = self.game_manager
+        gm.advance_turn()
+        state = gm.state
+        assert state is not None
+
+        alive = gm.get_alive_npcs()
+        if self.dialogue_system and state.time_of_day in DIALOGUE_TIMES and len(alive) >= 2:
+            participants = [SimpleNamespace(**npc) for npc in alive[:2]]
+            await self.dialogue_system.generate_dialogue(
+                participants, {"time": state.time_of_day}
+            )
+
+        # 每个NPC一回合只行动一次，行动完成时记录快照，规则按快照批量判定
+        pairs: List[Tuple[Dict[str, Any], str]] = []
+        snapshots: List[Dict[str, Any]] = []
+        for npc in alive:
+            decision = self.npc_behavior.decide_action(npc)
+            self.npc_behavior.execute_action(npc, decision)
+            pairs.append((npc, decision.action.value))
+            snapshots.append(self.rule_executor.snapshot_actor(npc))
+
+        batch = self.rule_executor.check_rules_batch(pairs, snapshots=snapshots)
+        rules_rng = self.rule_executor.rng
+        for row in range(len(batch)):
+            context = batch.context_for(row)
+            for rule, probability in batch.triggered_for(row):
+                if not self.rule_executor.can_fire(rule, context):
+                    continue
+                if rules_rng.random() < probability:
+                    self.rule_executor.execute_rule(rule, context)
+
+        self.rule_executor.update_cooldowns()
+
+    def is_over(self) -> bool:
+        gm = self.game_manager
+        return not gm.get_alive_npcs() or gm.current_turn >= self.config.max_turns
+
+    def run(self) -> GameResult:
+        """跑完整局并返回结果（同步入口）"""
+        return asyncio.run(self.run_async())
+
+    async def run_async(self) -> GameResult:
+        """跑完整局并返回结果"""
+        while not self.is_over():
+            await self.play_turn()
+
+        state = self.game_manager.state
+        assert state is not None
+        return GameResult(
+            seed=self.seed,
+            turns_played=state.current_turn,
+            npcs_total=self.config.npc_count,
+            npcs_alive=len(self.game_manager.get_alive_npcs()),
+            fear_gained=state.total_fear_gained,
+            rule_cost=self.rule_cost,
+            rules_fired={
+                rule_id: len(history)
+                for rule_id, history in self.rule_executor.execution_history.items()
+            },
+        )
+
+
+@contextmanager
+def quiet_simulation() -> Iterator[None]:
+    """模拟期间关闭逐次检查产生的日志和事件文件写入"""
+    previous = logging.root.manager.disable
+    logging.disable(logging.ERROR)
+    set_game_event_file_enabled(False)
+    try:
+        yield
+    finally:
+        logging.disable(previous)
+        set_game_event_file_enabled(True)
+
+
+def _init_worker() -> None:
+    """工作进程初始化：整个进程生命周期内保持安静"""
+    logging.disable(logging.ERROR)
+    set_game_event_file_enabled(False)
+
+
+def _run_chunk(args: Tuple[SimulationConfig, int, int]) -> SimulationReport:
+    """在工作进程中跑一批游戏，只回传汇总以减少进程间传输"""
+    config, start, count = args
+    return asyncio.run(_play_games(config, start, count))
+
+
+async def _play_games(config: SimulationConfig, start: int, count: int) -> SimulationReport:
+    """在同一个事件循环中依次跑完一批游戏"""
+    report = SimulationReport()
+    for i in range(start, start + count):
+        report.add(await HeadlessGame(config, config.seed + i).run_async())
+    return report
+
+
+def run_simulations(
+    config: SimulationConfig,
+    games: int,
+    processes: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> SimulationReport:
+    """批量运行游戏并汇总统计
+
+    Args:
+        config: 模拟配置
+        games: 游戏局数
+        processes: 进程数，默认使用CPU核数；为1时在当前进程内运行
+        chunk_size: 每个任务包含的局数，默认按进程数均分为若干块
+
+    Returns:
+        SimulationReport: 汇总统计
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = max(1, min(processes, games)) if games else 1
+
+    if processes == 1:
+        with quiet_simulation():
+            return _run_chunk((config, 0, games))
+
+    if chunk_size is None:
+        chunk_size = max(1, games // (processes * 4))
+    chunks = [
+        (config, start, min(chunk_size, games - start))
+        for start in range(0, games, chunk_size)
+    ]
+
+    report = SimulationReport()
+    with multiprocessing.Pool(processes, initializer=_init_worker) as pool:
+        for partial in pool.imap_unordered(_run_chunk, chunks):
+            report.merge(partial)
+    return report
@@ -108,6 +108,33 @@ class Config:
             "cache_ttl": int(self.get("DEEPSEEK_CACHE_TTL", api_cfg.get("cache_ttl", 300))),
         }
 
+    def get_scheduler_config(self) -> Dict[str, Any]:
+        """Return limits for the process-wide LLM request scheduler."""
+        sched_cfg = self._config.get("api", {}).get("scheduler", {})
+        return {
+            "requests_per_second": float(
+                self.get("LLM_REQUESTS_PER_SECOND", sched_cfg.get("requests_per_second", 5))
+            ),
+            "burst": int(self.get("LLM_BURST", sched_cfg.get("burst", 10))),
+            "tokens_per_minute": int(
+                self.get("LLM_TOKENS_PER_MINUTE", sched_cfg.get("tokens_per_minute", 120000))
+            ),
+            "max_concurrent": int(
+                self.get("LLM_MAX_CONCURRENT", sched_cfg.get("max_concurrent", 8))
+            ),
+        }
+
+    def get_http_pool_config(self) -> Dict[str, Any]:
+        """Return limits for the process-wide shared HTTP connection pool."""
+        pool_cfg = self._config.get("api", {}).get("http_pool", {})
+        return {
+            "max_connections": int(pool_cfg.get("max_connections", 64)),
+            "max_keepalive_connections": int(pool_cfg.get("max_keepalive_connections", 32)),
+            "keepalive_expiry": float(pool_cfg.get("keepalive_expiry", 60)),
+            "timeout": float(self._config.get("api", {}).get("timeout", 30)),
+            "http2": bool(pool_cfg.get("http2", False)),
+        }
+
     # ------------------------------------------------------------------
     def is_test_mode(self) -> bool:
         return str(self.get("TEST_MODE", "false")).lower() == "true"
@@ -0,0 +1,205 @@
+"""
+磁盘I/O执行器
+服务端的存档、缓存和日志读写都交给固定大小的线程池执行，事件循环
+不会被磁盘延迟阻塞；并发数有上限，并记录排队深度和等待时间。
+追加写入按文件串行、攒批写出，同步代码也可以直接提交而不等待；
+需要与追加写入保持顺序的读取、清空等操作也排入同一队列。
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar, Union
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+PathLike = Union[str, Path]
+# 文件队列中的条目：待追加的行，或 (操作, 结果) 二元组
+QueueItem = Union[str, Tuple[Callable[[Path], Any], "Future[Any]"]]
+
+# 默认的I/O线程数
+DEFAULT_IO_WORKERS = 4
+
+
+class IOExecutor:
+    """有界的磁盘I/O线程池
+
+    Args:
+        max_workers: 同时执行的I/O任务数上限
+    """
+
+    def __init__(self, max_workers: int = DEFAULT_IO_WORKERS) -> None:
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="io")
+        self._lock = threading.Lock()
+        self.queued = 0  # 已提交、等待线程的任务
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._appends: Dict[Path, List[QueueItem]] = {}
+        self._flushing: Set[Path] = set()
+
+    def submit(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """提交任务，不等待结果（可在同步代码中调用）"""
+        submitted = time.monotonic()
+        with self._lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+
+        def task() -> T:
+            with self._lock:
+                wait = time.monotonic() - submitted
+                self.queued -= 1
+                self.running += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self.completed += 1
+            return result
+
+        return self._pool.submit(task)
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在I/O线程中执行函数并等待结果"""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    # ------------------------------------------------------------------
+    async def read_text(self, path: PathLike) -> str:
+        return await self.run(Path(path).read_text, encoding="utf-8")
+
+    async def read_json(self, path: PathLike) -> Any:
+        return await self.run(_read_json, Path(path))
+
+    async def write_text(self, path: PathLike, text: str) -> None:
+        """原子写入：先写临时文件再替换，读者不会看到写了一半的文件"""
+        await self.run(_write_atomic, Path(path), text)
+
+    def append_line(self, path: PathLike, line: str) -> None:
+        """追加一行，立即返回
+
+        同一文件的追加按提交顺序串行执行，积压的行一次写出。
+        """
+        self._enqueue(Path(path), line if line.endswith("\n") else line + "\n")
+
+    def then(self, path: PathLike, fn: Callable[[Path], T]) -> "Future[T]":
+        """在该文件之前排队的追加写入完成后，于I/O线程中执行 fn(path)
+
+        立即返回 Future；之后提交的追加写入会等 fn 执行完再写。
+        """
+        future: "Future[T]" = Future()
+        self._enqueue(Path(path), (fn, future))
+        return future
+
+    def remove(self, path: PathLike) -> None:
+        """删除文件（排在该文件已提交的追加写入之后），立即返回"""
+        self.then(path, _remove)
+
+    def _enqueue(self, path: Path, item: QueueItem) -> None:
+        with self._lock:
+            self._appends.setdefault(path, []).append(item)
+            if path in self._flushing:
+                return
+            self._flushing.add(path)
+        self.submit(self._flush_appends, path)
+
+    def _flush_appends(self, path: Path) -> None:
+        while True:
+            with self._lock:
+                items = self._appends.pop(path, None)
+                if not items:
+                    self._flushing.discard(path)
+                    return
+            lines: List[str] = []
+            for item in items:
+                if isinstance(item, str):
+                    lines.append(item)
+                    continue
+                self._write_lines(path, lines)
+                lines = []
+                fn, future = item
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(path))
+                    except BaseException as exc:
+                        future.set_exception(exc)
+            self._write_lines(path, lines)
+
+    @staticmethod
+    def _write_lines(path: Path, lines: List[str]) -> None:
+        if not lines:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write("".join(lines))
+        except OSError as exc:
+            logger.error("追加写入 %s 失败: %s", path, exc)
+
+    def flush(self, path: Optional[PathLike] = None) -> None:
+        """等待已提交的追加写入完成（同步）；指定 path 时只等待该文件"""
+        target = Path(path) if path is not None else None
+        while True:
+            with self._lock:
+                if not self._flushing if target is None else target not in self._flushing:
+                    return
+            time.sleep(0.001)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "max_queued": self.max_queued,
+                "avg_wait": self.total_wait / self.completed if self.completed else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+    def shutdown(self) -> None:
+        self.flush()
+        self._pool.shutdown(wait=True)
+
+
+def _read_json(path: Path) -> Any:
+    with path.open("r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def _remove(path: Path) -> None:
+    path.unlink(missing_ok=True)
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+# 进程内共享的I/O执行器
+io_executor = IOExecutor()
+atexit.register(io_executor.flush)
@@ -2,12 +2,15 @@
 日志工具
 提供统一的日志记录功能
 """
+import json
 import logging
 import sys
 from pathlib import Path
 from datetime import datetime
 from typing import Union
 
+from .io_executor import io_executor
+
 # 创建日志目录（用于特殊日志如游戏事件）
 LOG_DIR = Path("logs")
 LOG_DIR.mkdir(exist_ok=True)
@@ -133,6 +136,16 @@ def get_logger(name: str) -> logging.Logger:
 root_logger = get_logger("RuleK")
 
 
+# 是否将游戏事件写入 logs/game_events.jsonl（批量模拟时关闭）
+_game_event_file_enabled = True
+
+
+def set_game_event_file_enabled(enabled: bool) -> None:
+    """开启或关闭游戏事件文件记录"""
+    global _game_event_file_enabled
+    _game_event_file_enabled = enabled
+
+
 def log_game_event(event_type: str, **kwargs):
     """记录游戏事件（特殊格式）"""
     event_data = {"type": event_type, "timestamp": datetime.now().isoformat(), **kwargs}
@@ -140,12 +153,13 @@ def log_game_event(event_type: str, **kwargs):
     # 使用特殊格式记录
     root_logger.info(f"[GAME_EVENT] {event_type} | {kwargs}")
 
-    # 同时写入事件日志文件
-    event_file = LOG_DIR / "game_events.jsonl"
-    with open(event_file, "a", encoding="utf-8") as f:
-        import json
+    if not _game_event_file_enabled:
+        return
 
-        f.write(json.dumps(event_data, ensure_ascii=False) + "\n")
+    # 同时写入事件日志文件（交给I/O线程追加，不阻塞调用方）
+    io_executor.append_line(
+        LOG_DIR / "game_events.jsonl", json.dumps(event_data, ensure_ascii=False)
+    )
 
 
 if __name__ == "__main__":
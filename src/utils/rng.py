@@ -0,0 +1,109 @@
+"""
+游戏随机数服务
+每个游戏会话持有独立的随机数生成器，并按用途划分为命名子流
+（rules、npc、events、dialogue、narrative）。子流可设定种子、可序列化进存档，
+一个子流多取几次随机数不会影响其他子流的序列。
+"""
+import hashlib
+import random
+from typing import Any, Dict, Optional, cast
+
+# 预定义的子流名称
+STREAM_NAMES = ("rules", "npc", "events", "dialogue", "narrative")
+
+
+def default_rng(rng: Optional[random.Random] = None) -> random.Random:
+    """未注入随机数生成器时退回全局 random 模块（保持旧行为）"""
+    return rng if rng is not None else cast(random.Random, random)
+
+
+class GameRNG:
+    """按名称划分子流的游戏随机数生成器"""
+
+    def __init__(self, seed: Optional[int] = None):
+        self._streams: Dict[str, random.Random] = {}
+        self._seed = 0
+        self.seed(seed)
+
+    @property
+    def seed_value(self) -> int:
+        """当前主种子"""
+        return self._seed
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        """重新设定主种子，已创建的子流原地重置"""
+        if seed is None:
+            seed = random.SystemRandom().randrange(2**63)
+        self._seed = int(seed)
+        for name, stream in self._streams.items():
+            stream.seed(self._derive_seed(name))
+
+    def stream(self, name: str) -> random.Random:
+        """获取命名子流，首次访问时创建
+
+        返回的对象在重设种子和读档后保持不变，可以被组件长期持有。
+        """
+        stream = self._streams.get(name)
+        if stream is None:
+            stream = random.Random(self._derive_seed(name))
+            self._streams[name] = stream
+        return stream
+
+    @property
+    def rules(self) -> random.Random:
+        """规则触发判定"""
+        return self.stream("rules")
+
+    @property
+    def npc(self) -> random.Random:
+        """NPC行为决策"""
+        return self.stream("npc")
+
+    @property
+    def events(self) -> random.Random:
+        """随机事件和搜索结果"""
+        return self.stream("events")
+
+    @property
+    def dialogue(self) -> random.Random:
+        """对话生成"""
+        return self.stream("dialogue")
+
+    @property
+    def narrative(self) -> random.Random:
+        """叙事模板选择"""
+        return self.stream("narrative")
+
+    def fork(self, name: str) -> random.Random:
+        """从命名子流派生一个独立的生成器
+
+        并发执行的任务各持有一个派生生成器，取数顺序不受调度先后影响；
+        派生顺序固定时结果可复现，派生只消耗父子流的一个随机数。
+        """
+        return random.Random(self.stream(name).getrandbits(64))
+
+    def _derive_seed(self, name: str) -> int:
+        digest = hashlib.sha256(f"{self._seed}:{name}".encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为可写入存档的字典"""
+        streams = {}
+        for name, stream in self._streams.items():
+            version, internal, gauss_next = stream.getstate()
+            streams[name] = [version, list(internal), gauss_next]
+        return {"seed": self._seed, "streams": streams}
+
+    def load_dict(self, data: Dict[str, Any]) -> None:
+        """从存档字典恢复，子流对象原地恢复状态"""
+        self.seed(data.get("seed"))
+        for name, state in data.get("streams", {}).items():
+            version, internal, gauss_next = state
+            self.stream(name).setstate((version, tuple(internal), gauss_next))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "GameRNG":
+        """从存档字典创建"""
+        rng = cls(data.get("seed"))
+        rng.load_dict(data)
+        return rng
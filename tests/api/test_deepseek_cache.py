@@ -0,0 +1,103 @@
+"""测试按完整请求内容缓存LLM响应"""
+import json
+
+import httpx
+import pytest
+
+from src.api.deepseek_client import DeepSeekClient
+from src.api.deepseek_http_client import APIConfig, DeepSeekHTTPClient
+
+PLAN = json.dumps(
+    {
+        "dialogue": [{"speaker": "张三", "text": "有人吗？"}],
+        "actions": [{"npc": "张三", "action": "wait", "reason": "害怕"}],
+        "atmosphere": "tense",
+    },
+    ensure_ascii=False,
+)
+
+
+def make_client(tmp_path, requests: list, content: str = PLAN, **kwargs) -> DeepSeekClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": content}, "finish_reason": "stop"}],
+                "usage": {"total_tokens": 50},
+            },
+        )
+
+    config = APIConfig(
+        api_key="test", base_url="https://mock.api", mock_mode=False, cache_dir=tmp_path
+    )
+    http = DeepSeekHTTPClient(
+        config, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return DeepSeekClient(config, http_client=http, **kwargs)
+
+
+async def plan_for(client, names):
+    return await client.generate_turn_plan([{"name": n} for n in names], {}, [], "night")
+
+
+@pytest.mark.asyncio
+async def test_turn_plan_cache_is_keyed_on_rendered_prompt(tmp_path):
+    requests: list = []
+    client = make_client(tmp_path, requests)
+
+    await plan_for(client, ["张三", "李四"])
+    await plan_for(client, ["王五", "赵六"])  # 人数和时间相同，但提示词不同
+    assert len(requests) == 2
+
+    cached = await plan_for(client, ["张三", "李四"])
+    assert len(requests) == 2
+    assert cached.dialogue[0].text == "有人吗？"
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_repeated_rule_evaluation_skips_network(tmp_path):
+    requests: list = []
+    rule = json.dumps(
+        {
+            "name": "午夜禁言",
+            "trigger": {"type": "event", "conditions": []},
+            "effect": {"type": "fear_gain", "params": {}},
+            "cost": 150,
+            "difficulty": 4,
+            "loopholes": [],
+            "suggestion": "",
+        },
+        ensure_ascii=False,
+    )
+    client = make_client(tmp_path, requests, content=rule)
+
+    first = await client.evaluate_rule_nl("午夜不许说话", {"difficulty_level": "normal"})
+    second = await client.evaluate_rule_nl("午夜不许说话", {"difficulty_level": "normal"})
+    await client.evaluate_rule_nl("午夜不许开灯", {"difficulty_level": "normal"})
+
+    assert first == second and first.cost == 150
+    assert len(requests) == 2
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_narrative_cache_policy_and_opt_out(tmp_path):
+    requests: list = []
+    client = make_client(tmp_path / "on", requests, content="走廊尽头传来脚步声。")
+    text = await client.generate_narrative_text(["灯灭了"], "深夜", 3, min_len=5)
+    streamed = [c async for c in client.stream_narrative_text(["灯灭了"], "深夜", 3, min_len=5)]
+    assert "".join(streamed).startswith("走廊尽头传来脚步声。")
+    assert text.startswith("走廊尽头传来脚步声。")
+    assert len(requests) == 1  # 流式与非流式共用缓存
+    await client.close()
+
+    requests.clear()
+    client = make_client(
+        tmp_path / "off", requests, content="走廊尽头传来脚步声。", cache_ttls={"narrative": 0}
+    )
+    for _ in range(2):
+        await client.generate_narrative_text(["灯灭了"], "深夜", 3, min_len=5)
+    assert len(requests) == 2
+    await client.close()
@@ -0,0 +1,98 @@
+"""测试流式（SSE）生成"""
+import json
+
+import httpx
+import pytest
+
+from src.api.deepseek_client import DeepSeekClient
+from src.api.deepseek_http_client import APIConfig, DeepSeekHTTPClient
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.api.streaming import DialogueStreamParser, sse_lines
+
+
+def make_client(content: str, requests: list) -> DeepSeekClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        body = "\n\n".join(sse_lines(content, size=3)) + "\n\n"
+        return httpx.Response(
+            200, headers={"content-type": "text/event-stream"}, content=body.encode("utf-8")
+        )
+
+    config = APIConfig(
+        api_key="test", base_url="https://mock.api", mock_mode=False, cache_enabled=False
+    )
+    http = DeepSeekHTTPClient(
+        config, http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    return DeepSeekClient(config, http_client=http)
+
+
+@pytest.mark.asyncio
+async def test_stream_narrative_text_yields_sse_deltas():
+    requests: list = []
+    client = make_client("  走廊尽头传来脚步声。", requests)
+
+    chunks = [
+        chunk
+        async for chunk in client.stream_narrative_text(["灯灭了"], "深夜", 3, min_len=10)
+    ]
+    await client.close()
+
+    assert requests[0]["stream"] is True
+    assert len(chunks) > 2
+    assert "".join(chunks) == client._ensure_len_text("走廊尽头传来脚步声。", 10)
+
+
+@pytest.mark.asyncio
+async def test_stream_turn_plan_emits_dialogue_before_plan():
+    plan_json = json.dumps(
+        {
+            "dialogue": [
+                {"speaker": "张三", "text": '门后有"人"吗？'},
+                {"speaker": "李四", "text": "别开门"},
+            ],
+            "actions": [{"npc": "张三", "action": "wait", "reason": "害怕"}],
+            "atmosphere": "tense",
+        },
+        ensure_ascii=False,
+    )
+    client = make_client(plan_json, [])
+
+    events = [
+        event
+        async for event in client.stream_turn_plan([{"name": "张三"}], {}, [], "深夜")
+    ]
+    await client.close()
+
+    assert events[-1]["type"] == "plan"
+    assert [d.text for d in events[-1]["plan"].dialogue] == ['门后有"人"吗？', "别开门"]
+    dialogue = [e for e in events if e["type"] == "dialogue"]
+    assert len(dialogue) > 2  # 逐段输出而不是整句
+    zhang = "".join(e["delta"] for e in dialogue if e["speaker"] == "张三")
+    assert zhang == '门后有"人"吗？'
+    assert [e["speaker"] for e in dialogue if e["done"]] == ["张三", "李四"]
+
+
+def test_dialogue_parser_handles_split_escapes():
+    parser = DialogueStreamParser()
+    text = json.dumps({"dialogue": [{"speaker": "王五", "text": "“快跑”\n你"}]})
+    events = []
+    for ch in text:
+        events.extend(parser.feed(ch))
+    assert "".join(e["delta"] for e in events) == "“快跑”\n你"
+    assert events[-1] == {"speaker": "王五", "delta": "", "done": True}
+
+
+@pytest.mark.asyncio
+async def test_mock_client_streams_plan_and_narrative():
+    client = MockDeepSeekClient()
+    events = [
+        event
+        async for event in client.stream_turn_plan([{"name": "测试NPC"}], {}, [], "night")
+    ]
+    assert events[-1]["type"] == "plan"
+    text = "".join(e["delta"] for e in events if e["type"] == "dialogue")
+    assert text == events[-1]["plan"].dialogue[0].text
+
+    chunks = [chunk async for chunk in client.stream_narrative_text([], "night", 0)]
+    assert "".join(chunks) == await client.generate_narrative_text([], "night", 0)
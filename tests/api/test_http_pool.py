@@ -0,0 +1,83 @@
+"""测试进程共享的HTTP连接池"""
+import asyncio
+
+import httpx
+import pytest
+
+from src.api.deepseek_http_client import APIConfig, DeepSeekHTTPClient
+from src.api.http_pool import HTTPClientPool, http2_available
+
+
+class StubPool(HTTPClientPool):
+    """用 MockTransport 代替网络的连接池"""
+
+    def __init__(self, served: list, **kwargs) -> None:
+        self.served = served
+        super().__init__(**kwargs)
+
+    def _create(self) -> httpx.AsyncClient:
+        self.created += 1
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.served.append(request.url.path)
+            return httpx.Response(
+                200, json={"choices": [{"message": {"content": "ok"}}], "usage": {}}
+            )
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def make_client(pool: HTTPClientPool) -> DeepSeekHTTPClient:
+    config = APIConfig(
+        api_key="test", base_url="https://mock.api", mock_mode=False, cache_enabled=False
+    )
+    return DeepSeekHTTPClient(config, pool=pool)
+
+
+@pytest.mark.asyncio
+async def test_clients_share_one_pooled_connection():
+    served: list = []
+    pool = StubPool(served)
+    first, second = make_client(pool), make_client(pool)
+
+    await first.post("chat/completions", {"messages": []})
+    await second.post("chat/completions", {"messages": []})
+    assert first.client is second.client
+    assert pool.created == 1 and len(served) == 2
+
+    # 单个会话关闭不影响共享连接池
+    await first.close()
+    assert not pool.get().is_closed
+    await second.post("chat/completions", {"messages": []})
+
+    await pool.aclose()
+    assert not pool.metrics()["open"]
+
+
+@pytest.mark.asyncio
+async def test_pool_limits_and_http2_fallback():
+    pool = HTTPClientPool(max_connections=8, max_keepalive_connections=4, keepalive_expiry=15)
+    client = pool.get()
+    assert pool.get() is client
+    assert pool.http2 == http2_available()
+    metrics = pool.metrics()
+    assert metrics["max_connections"] == 8 and metrics["keepalive_expiry"] == 15
+    await pool.aclose()
+    assert client.is_closed
+
+
+def test_pool_recreates_client_for_new_event_loop():
+    pool = HTTPClientPool()
+
+    async def use():
+        return pool.get()
+
+    async def use_and_close():
+        client = pool.get()
+        await pool.aclose()
+        return client
+
+    first = asyncio.run(use())
+    second = asyncio.run(use_and_close())
+    assert first is not second and pool.created == 2
+    assert first.is_closed and second.is_closed  # 被替换的客户端也已关闭
@@ -0,0 +1,115 @@
+"""测试进程级LLM请求调度"""
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from src.api.deepseek_http_client import APIConfig, DeepSeekHTTPClient
+from src.api.scheduler import LLMScheduler, Priority, request_scope
+
+
+def make_stub(scheduler: LLMScheduler, served: list, gate: asyncio.Event) -> DeepSeekHTTPClient:
+    """本地桩服务：记录到达顺序，第一个请求等待 gate 打开"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        tag = json.loads(request.content)["messages"][0]["content"]
+        served.append(tag)
+        if len(served) == 1:
+            await gate.wait()
+        return httpx.Response(
+            200,
+            json={
+                "choices": [{"message": {"content": tag}, "finish_reason": "stop"}],
+                "usage": {"total_tokens": 20},
+            },
+        )
+
+    config = APIConfig(
+        api_key="test", base_url="https://stub.api", mock_mode=False, cache_enabled=False
+    )
+    return DeepSeekHTTPClient(
+        config,
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        scheduler=scheduler,
+    )
+
+
+def request(tag: str) -> dict:
+    return {"messages": [{"role": "user", "content": tag}], "max_tokens": 10}
+
+
+async def post_as(client, tag, game_id, priority):
+    with request_scope(game_id=game_id, priority=priority):
+        return await client.post("chat/completions", request(tag))
+
+
+@pytest.mark.asyncio
+async def test_priority_classes_and_fair_queuing_across_games():
+    scheduler = LLMScheduler(requests_per_second=0, tokens_per_minute=0, max_concurrent=1)
+    served: list = []
+    gate = asyncio.Event()
+    client = make_stub(scheduler, served, gate)
+
+    queued = [
+        ("busy", "g0", Priority.BACKGROUND),
+        ("prefetch", "g1", Priority.BACKGROUND),
+        ("rule", "g1", Priority.RULE_EVALUATION),
+        ("g1-a", "g1", Priority.INTERACTIVE),
+        ("g1-b", "g1", Priority.INTERACTIVE),
+        ("g2-a", "g2", Priority.INTERACTIVE),
+    ]
+    tasks = []
+    for tag, game_id, priority in queued:
+        tasks.append(asyncio.create_task(post_as(client, tag, game_id, priority)))
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    assert scheduler.in_flight == 1 and scheduler.queue_depth() == 5
+
+    gate.set()
+    await asyncio.gather(*tasks)
+    await client.close()
+
+    # 交互请求最先，同一优先级内在游戏之间轮转
+    assert served == ["busy", "g1-a", "g2-a", "g1-b", "rule", "prefetch"]
+    metrics = scheduler.metrics()
+    assert metrics["in_flight"] == 0 and metrics["queued"] == 0
+    assert metrics["priorities"]["interactive"]["served"] == 3
+    assert metrics["priorities"]["background"]["max_wait"] > 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_and_throttle_delay_dispatch():
+    scheduler = LLMScheduler(requests_per_second=20, burst=1, tokens_per_minute=0)
+    served: list = []
+    gate = asyncio.Event()
+    gate.set()
+    client = make_stub(scheduler, served, gate)
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(post_as(client, f"r{i}", "g1", Priority.INTERACTIVE) for i in range(3))
+    )
+    assert time.perf_counter() - start >= 0.09  # 每秒20个，突发1个
+
+    scheduler.configure(requests_per_second=0, tokens_per_minute=0)
+    scheduler.throttle(0.05)  # 模拟429后的统一暂停
+    start = time.perf_counter()
+    await post_as(client, "after", "g1", Priority.INTERACTIVE)
+    assert time.perf_counter() - start >= 0.04
+    assert scheduler.metrics()["throttled"] == 1
+    await client.close()
+
+
+@pytest.mark.asyncio
+async def test_token_budget_settles_actual_usage():
+    scheduler = LLMScheduler(requests_per_second=0, tokens_per_minute=600)
+    gate = asyncio.Event()
+    gate.set()
+    client = make_stub(scheduler, [], gate)
+
+    await post_as(client, "x", "g1", Priority.INTERACTIVE)
+    # 预扣估算值（1字提示 + 10），按响应中的20个token结算
+    assert 579 <= scheduler.token_bucket.tokens <= 581
+    await client.close()
@@ -0,0 +1,55 @@
+"""
+测试回合循环基准套件
+"""
+import pytest
+
+from benchmarks import PHASES, Scenario, build_game_manager, compare, run_suite
+
+
+def make_results(scenario, **medians):
+    return {
+        "scenario": scenario.to_dict(),
+        "phases": {
+            phase: {"median_ms": median, "peak_kb": 10.0} for phase, median in medians.items()
+        },
+    }
+
+
+def test_scenario_builds_requested_sizes(tmp_path):
+    scenario = Scenario("tiny", npcs=3, rules=7, events=20)
+
+    gm = build_game_manager(scenario, str(tmp_path))
+
+    assert len(gm.npcs) == 3
+    assert len(gm.rules) == 7
+    assert len(gm.state.events_history) == 20
+
+
+def test_run_suite_reports_every_phase(tmp_path):
+    scenario = Scenario("tiny", npcs=3, rules=4, events=10)
+
+    results = run_suite(scenario, tmp_path, repeat=1)
+
+    assert set(results["phases"]) == set(PHASES)
+    for result in results["phases"].values():
+        assert result["median_ms"] >= 0
+        assert result["peak_kb"] >= 0
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    scenario = Scenario("tiny", npcs=1, rules=1, events=0)
+    baseline = make_results(scenario, fast=1.0, slow=1.0)
+    current = make_results(scenario, fast=1.2, slow=1.5)
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert [(r.phase, r.metric) for r in regressions] == [("slow", "median_ms")]
+    assert regressions[0].ratio == pytest.approx(1.5)
+
+
+def test_compare_rejects_different_scenarios():
+    baseline = make_results(Scenario("a", npcs=1, rules=1, events=0))
+    current = make_results(Scenario("a", npcs=2, rules=1, events=0))
+
+    with pytest.raises(ValueError):
+        compare(current, baseline)
@@ -0,0 +1,161 @@
+"""
+测试WebSocket广播的序列化和慢速连接处理
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from web.backend.services import broadcaster as broadcaster_module
+from web.backend.services.broadcaster import Broadcaster, SlowConsumerPolicy
+from web.backend.services.streaming_service import StreamingService
+
+
+class FakeWebSocket:
+    def __init__(self, blocked=False):
+        self.sent = []
+        self.closed = False
+        self.gate = asyncio.Event()
+        if not blocked:
+            self.gate.set()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_once(monkeypatch):
+    calls = []
+    encode = broadcaster_module.encode_message
+    monkeypatch.setattr(
+        broadcaster_module, "encode_message", lambda m: calls.append(m) or encode(m)
+    )
+    hub = Broadcaster()
+    sockets = [FakeWebSocket() for _ in range(5)]
+    for i, ws in enumerate(sockets):
+        hub.add(f"c{i}", ws)
+
+    assert hub.broadcast({"type": "game_update", "data": {"turn": 1}}) == 5
+    await hub.drain()
+
+    assert len(calls) == 1
+    assert all(ws.sent == [{"type": "game_update", "data": {"turn": 1}}] for ws in sockets)
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_consumer_policies_do_not_block_others():
+    hub = Broadcaster(max_queue=2, policy=SlowConsumerPolicy.DROP_OLDEST)
+    fast, slow = FakeWebSocket(), FakeWebSocket(blocked=True)
+    hub.add("fast", fast)
+    hub.add("slow", slow)
+
+    for i in range(5):
+        hub.broadcast({"n": i})
+        await asyncio.sleep(0)
+    await hub.writers["fast"].drain()
+    assert [m["n"] for m in fast.sent] == [0, 1, 2, 3, 4]
+    metrics = hub.metrics()
+    assert metrics["per_connection"]["slow"]["depth"] == 2
+    assert metrics["dropped"] > 0
+
+    slow.gate.set()
+    await hub.drain()
+    assert [m["n"] for m in slow.sent][-2:] == [3, 4]  # 保留最新的消息
+
+    stuck = FakeWebSocket(blocked=True)
+    hub.policy = SlowConsumerPolicy.DISCONNECT
+    hub.add("stuck", stuck)
+    for i in range(4):
+        hub.broadcast({"n": i})
+        await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert "stuck" not in hub and stuck.closed
+    assert hub.metrics()["disconnected_slow"] == 1
+    await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_streaming_broadcast_keeps_per_client_sequence():
+    service = StreamingService()
+    a, b = FakeWebSocket(), FakeWebSocket()
+    for client_id, ws in (("a", a), ("b", b)):
+        await service.connect(ws, client_id)
+        service.heartbeat_tasks[client_id].cancel()  # 不让心跳插入消息
+    await service.send_message("a", {"type": "notice", "data": {}})
+    await service.broadcast({"type": "game_update", "data": {"状态": "进行中"}})
+    await service.broadcaster.drain()
+
+    # 每个客户端的序号独立递增（连接成功消息占用序号1）
+    assert [m["sequence"] for m in a.sent] == [1, 2, 3]
+    assert [m["sequence"] for m in b.sent] == [1, 2]
+    assert a.sent[-1]["data"] == b.sent[-1]["data"] == {"状态": "进行中"}
+    assert service.get_metrics()["connections"] == 2
+    await service.broadcaster.close()
+
+
+@pytest.mark.asyncio
+async def test_publish_routes_only_to_topic_subscribers():
+    service = StreamingService()
+    sockets = {client_id: FakeWebSocket() for client_id in ("g1_a", "g1_b", "g2_a")}
+    for client_id, ws in sockets.items():
+        await service.connect(ws, client_id)
+        service.heartbeat_tasks[client_id].cancel()
+        service.subscribe(client_id, client_id.split("_")[0])
+
+    assert await service.publish("g1", {"type": "game_update", "data": {"turn": 2}}) == 2
+    await service.broadcaster.drain()
+    assert sockets["g1_a"].sent[-1]["data"] == sockets["g1_b"].sent[-1]["data"] == {"turn": 2}
+    assert sockets["g2_a"].sent[-1]["type"] == "connection"
+    assert service.get_metrics("g1")["connections"] == 2
+
+    await service.disconnect("g1_a")
+    assert service.subscribers("g1") == {"g1_b"}
+    await service.close_topic("g1")
+    assert "g1" not in service.topics and sockets["g1_b"].closed
+    await service.broadcaster.close()
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_missed_topic_messages_or_falls_back():
+    service = StreamingService()
+    service.log_size = 3
+    first = FakeWebSocket()
+    await service.connect(first, "c1")
+    service.heartbeat_tasks["c1"].cancel()
+    service.subscribe("c1", "g1")
+    await service.publish("g1", {"type": "game_update", "data": {"n": 1}})
+    await service.broadcaster.drain()
+    last_seq = first.sent[-1]["sequence"]
+    await service.disconnect("c1")
+
+    # 断线期间的消息仍记录在主题日志中
+    for n in (2, 3):
+        await service.publish("g1", {"type": "game_update", "data": {"n": n}})
+
+    second = FakeWebSocket()
+    await service.connect(second, "c2")
+    service.heartbeat_tasks["c2"].cancel()
+    service.subscribe("c2", "g1")
+    assert service.resume("c2", "g1", last_seq)
+    await service.publish("g1", {"type": "game_update", "data": {"n": 4}})
+    await service.broadcaster.drain()
+    topic_messages = [m for m in second.sent if m.get("topic") == "g1"]
+    assert [m["data"]["n"] for m in topic_messages] == [2, 3, 4]
+    assert [m["sequence"] for m in topic_messages] == [2, 3, 4]
+
+    # 缺口超出日志保留范围时需要快照
+    assert not service.can_resume("c2", "g1", 0)
+    assert service.resume("c2", "g1", 4)  # 已是最新，无需补发
+    await service.broadcaster.close()
@@ -0,0 +1,117 @@
+"""
+测试有界、带索引的事件历史
+"""
+import threading
+
+from src.core import event_store
+from src.core.event_store import EventStore
+from src.core.game_state import GameState, GameStateManager
+from src.models.event import Event, EventType
+from src.utils.io_executor import IOExecutor
+
+
+def talk(turn, actor, target):
+    return {
+        "type": EventType.NPC_ACTION.value,
+        "turn": turn,
+        "description": f"{actor}和{target}交谈",
+        "meta": {"action": "talk", "actor": actor, "target": target},
+    }
+
+
+def test_indexes_by_turn_type_and_participant():
+    store = EventStore()
+    store.append(talk(1, "甲", "乙"))
+    store.append(Event(EventType.NPC_DIALOGUE, "乙: 你好", 1, meta={"speaker": "乙"}))
+    store.append(talk(2, "丙", "甲"))
+
+    assert len(store.for_turn(1)) == 2
+    assert [e["turn"] for e in store.by_type(EventType.NPC_ACTION)] == [1, 2]
+    assert len(store.by_actor("乙")) == 2
+    assert store.query(type_="npc_action", actor="甲", turn=2) == [talk(2, "丙", "甲")]
+    assert store[-1] == talk(2, "丙", "甲")
+    assert [e["turn"] for e in store.recent(2)[1:]] == [2]
+
+
+def test_eviction_spills_old_events_to_disk(tmp_path):
+    spill = tmp_path / "events.jsonl"
+    store = EventStore(capacity=10, spill_path=spill)
+    for turn in range(25):
+        store.append(talk(turn, "甲", "乙"))
+
+    assert len(store) <= 10
+    assert store.for_turn(0) == []
+    assert store[-1]["turn"] == 24
+    assert len(store.by_actor("甲")) == len(store)
+    # 完整历史可以从磁盘读回
+    assert [e["turn"] for e in store.iter_all()] == list(range(25))
+
+
+def test_game_state_accepts_list_and_keeps_store_config(tmp_path):
+    gm = GameStateManager(
+        save_dir=str(tmp_path),
+        config={"echo_log": False, "event_history_capacity": 5},
+    )
+    state = gm.new_game("event_store_test")
+
+    state.events_history = [talk(i, "甲", "乙") for i in range(8)]
+
+    assert isinstance(state.events_history, EventStore)
+    assert len(state.events_history) <= 5
+    state.events_history.flush()
+    assert state.events_history.spill_path.exists()
+    assert isinstance(state.to_dict()["events_history"], list)
+    assert isinstance(GameState(game_id="x", events_history=[]).events_history, EventStore)
+
+
+def test_eviction_does_not_write_on_the_caller(tmp_path, monkeypatch):
+    executor = IOExecutor(max_workers=1)
+    monkeypatch.setattr(event_store, "io_executor", executor)
+    release = threading.Event()
+    executor.submit(release.wait)  # 占住I/O线程
+    spill = tmp_path / "events" / "g.jsonl"
+    store = EventStore(capacity=10, spill_path=spill)
+    for turn in range(25):
+        store.append(talk(turn, "甲", "乙"))
+
+    assert not spill.exists()  # 写盘在I/O线程排队
+    release.set()
+    assert [e["turn"] for e in store.iter_all()] == list(range(25))
+    executor.shutdown()
+
+
+def test_loading_a_save_drops_leftover_spill(tmp_path):
+    config = {"echo_log": False, "event_history_capacity": 5}
+    gm = GameStateManager(save_dir=str(tmp_path), config=config)
+    state = gm.new_game("spill_reload")
+    state.events_history = [talk(i, "甲", "乙") for i in range(3)]
+    gm.save_game("spill_reload")
+    # 存档之后同一会话继续运行，更多旧事件被写盘
+    state.events_history.extend(talk(i, "甲", "乙") for i in range(3, 12))
+    state.events_history.flush()
+    assert state.events_history.spill_path.exists()
+
+    loaded = GameStateManager(save_dir=str(tmp_path), config=config)
+    assert loaded.load_game("spill_reload")
+    history = loaded.state.events_history
+    assert [e["turn"] for e in history.iter_all()] == [0, 1, 2]
+
+
+def test_save_and_load_keep_spilled_history(tmp_path):
+    config = {"echo_log": False, "event_history_capacity": 5}
+    gm = GameStateManager(save_dir=str(tmp_path), config=config)
+    state = gm.new_game("spill_keep")
+    state.events_history = [talk(i, "甲", "乙") for i in range(12)]
+    assert state.events_history.spilled > 0
+    gm.save_game("spill_keep")
+
+    loaded = GameStateManager(save_dir=str(tmp_path), config=config)
+    assert loaded.load_game("spill_keep")
+    history = loaded.state.events_history
+    assert len(history) <= 5
+    assert [e["turn"] for e in history.iter_all()] == list(range(12))
+    # 再次存档和读档不会丢失或重复旧事件
+    loaded.save_game("spill_keep")
+    again = GameStateManager(save_dir=str(tmp_path), config=config)
+    assert again.load_game("spill_keep")
+    assert [e["turn"] for e in again.state.events_history.history()] == list(range(12))
@@ -0,0 +1,93 @@
+"""测试磁盘I/O执行器"""
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.utils.io_executor import IOExecutor
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_bounded_and_queue_depth_tracked():
+    executor = IOExecutor(max_workers=2)
+    peak = 0
+    active = 0
+    lock = threading.Lock()
+
+    def job():
+        nonlocal peak, active
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.02)
+        with lock:
+            active -= 1
+
+    await asyncio.gather(*(executor.run(job) for _ in range(6)))
+    metrics = executor.metrics()
+    assert peak == 2
+    assert metrics["completed"] == 6
+    assert metrics["max_queued"] >= 4
+    assert metrics["queued"] == 0 and metrics["running"] == 0
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_slow_io_does_not_block_event_loop():
+    executor = IOExecutor(max_workers=1)
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    await asyncio.gather(executor.run(time.sleep, 0.1), ticker())
+    assert ticks == 5
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_write_text_is_atomic_and_readable(tmp_path):
+    executor = IOExecutor()
+    target = tmp_path / "saves" / "slot.json"
+    await executor.write_text(target, '{"turn": 3}')
+
+    assert await executor.read_json(target) == {"turn": 3}
+    assert [p.name for p in target.parent.iterdir()] == ["slot.json"]
+    with pytest.raises(FileNotFoundError):
+        await executor.read_json(tmp_path / "missing.json")
+    executor.shutdown()
+
+
+def test_append_line_keeps_order_and_batches(tmp_path):
+    executor = IOExecutor(max_workers=1)
+    release = threading.Event()
+    executor.submit(release.wait)  # 占住唯一的线程，让追加写入积压
+    log_file = tmp_path / "events.jsonl"
+    for i in range(200):
+        executor.append_line(log_file, str(i))
+    release.set()
+    executor.flush()
+
+    assert log_file.read_text(encoding="utf-8").splitlines() == [str(i) for i in range(200)]
+    executor.shutdown()
+    assert executor.metrics()["completed"] == 2  # 积压的行一次写出
+
+
+def test_ordered_operations_follow_pending_appends(tmp_path):
+    executor = IOExecutor(max_workers=1)
+    release = threading.Event()
+    executor.submit(release.wait)
+    log_file = tmp_path / "events.jsonl"
+    executor.append_line(log_file, "old")
+    executor.remove(log_file)
+    executor.append_line(log_file, "new")
+    seen = executor.then(log_file, lambda path: path.read_text(encoding="utf-8"))
+    assert not seen.done()  # 调用方不等待
+    release.set()
+
+    assert seen.result(timeout=5) == "new\n"
+    executor.shutdown()
@@ -0,0 +1,96 @@
+"""
+测试回合内LLM请求的并发调度
+"""
+import asyncio
+import time
+
+import pytest
+
+from src.ai.turn_pipeline import AITurnPipeline
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.api.schemas import PlannedAction
+from src.core.game_state import GameStateManager
+from src.core.llm_fanout import LLMTaskGraph
+from src.models.event import EventType
+
+
+class SlowDialogueClient(MockDeepSeekClient):
+    """每次对话请求耗时固定，并记录同时进行的请求数"""
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__()
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+
+    async def generate_dialogue(self, npc_states, scene_context):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        speaker = npc_states[0]["name"]
+        return [{"speaker": speaker, "text": f"{speaker}在说话"}]
+
+
+@pytest.fixture
+def game_manager(tmp_path):
+    gm = GameStateManager(
+        save_dir=str(tmp_path), config={"echo_log": False, "llm_concurrency": 2, "seed": 7}
+    )
+    gm.new_game("fanout_test")
+    for npc_id, name in (("a", "甲"), ("b", "乙"), ("c", "丙"), ("d", "丁")):
+        gm.add_npc({"id": npc_id, "name": name, "hp": 100})
+    return gm
+
+
+@pytest.mark.asyncio
+async def test_graph_runs_independent_tasks_concurrently_with_limit():
+    active = peak = 0
+    order = []
+
+    async def call(name, delay):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(delay)
+        active -= 1
+        order.append(name)
+        return name
+
+    graph = LLMTaskGraph(asyncio.Semaphore(2))
+    for name, delay in (("a", 0.03), ("b", 0.01), ("c", 0.02)):
+        graph.add(name, lambda _, name=name, delay=delay: call(name, delay))
+    graph.add("summary", lambda results: call("+".join(results.values()), 0), deps=["a", "b", "c"])
+
+    results = await graph.run()
+
+    assert peak == 2
+    assert order[-1] == "a+b+c"  # 依赖全部完成后才执行
+    assert list(results) == ["a", "b", "c", "summary"]  # 按加入顺序而不是完成顺序
+
+    with pytest.raises(ValueError):
+        graph.add("late", lambda _: call("late", 0), deps=["missing"])
+
+
+@pytest.mark.asyncio
+async def test_talk_dialogues_generated_concurrently_in_plan_order(game_manager):
+    client = SlowDialogueClient()
+    pipeline = AITurnPipeline(game_manager, client)
+    actions = [
+        PlannedAction(npc="甲", action="talk", target="乙"),
+        PlannedAction(npc="丙", action="talk", target="丁"),
+        PlannedAction(npc="乙", action="talk", target="丙"),  # 乙、丙已行动，执行时再生成
+    ]
+
+    start = time.perf_counter()
+    await pipeline._process_actions(actions)
+    elapsed = time.perf_counter() - start
+
+    assert client.peak == 2  # 受每局并发上限约束
+    assert elapsed < client.delay * 2.8
+    dialogue = [
+        event["meta"]["speaker"]
+        for event in game_manager.state.events_history
+        if event["type"] == EventType.NPC_DIALOGUE.value
+    ]
+    assert dialogue == ["甲", "丙", "乙"]
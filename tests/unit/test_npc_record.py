@@ -0,0 +1,71 @@
+"""
+测试紧凑的NPC记录
+"""
+import pickle
+
+import pytest
+
+from src.core.game_state import GameStateManager
+from src.core.npc_record import NPCRecord
+
+
+def test_record_behaves_like_npc_dict():
+    data = {"id": "npc_1", "name": "测试员", "hp": 80, "memories": ["镜子"]}
+    record = NPCRecord(data)
+
+    assert record == data and data == record
+    assert record["hp"] == 80 and record.get("fear", 0) == 0
+    assert "fear" not in record and "memories" in record
+    with pytest.raises(KeyError):
+        record["fear"]
+
+    record["fear"] = 10
+    record.update({"hp": 70, "hidden": True})
+    assert record.pop("hidden") is True
+    assert record.setdefault("sanity", 100) == 100
+    del record["memories"]
+
+    assert record.to_dict() == {
+        "id": "npc_1",
+        "name": "测试员",
+        "hp": 70,
+        "sanity": 100,
+        "fear": 10,
+    }
+    assert not hasattr(record, "__dict__")
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+def test_manager_stores_records_shared_with_state(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    gm.new_game("npc_record_test")
+    stored = gm.add_npc({"id": "npc_1", "name": "测试员", "hp": 100, "location": "hall"})
+
+    assert isinstance(stored, NPCRecord)
+    assert gm.get_npc("npc_1") is stored is gm.state.npcs["npc_1"]
+    gm.update_npc("npc_1", {"hp": 0})
+    assert gm.get_alive_npcs() == []
+    assert gm.count_npcs_in_location("hall") == 0
+
+    assert gm.save_game("record_save")
+    loaded = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    assert loaded.load_game("record_save")
+    assert isinstance(loaded.get_npc("npc_1"), NPCRecord)
+    assert loaded.state.npcs["npc_1"] is loaded.get_npc("npc_1")
+    assert loaded.get_npc("npc_1")["hp"] == 0
+
+
+def test_sync_npcs_from_state_adopts_replaced_dicts(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    gm.new_game("npc_record_sync")
+    gm.state.npcs = {"npc_9": {"name": "外来者", "hp": 50}}
+
+    gm.sync_npcs_from_state()
+    record = gm.get_npc("npc_9")
+
+    assert isinstance(record, NPCRecord) and record["id"] == "npc_9"
+    assert gm.state.npcs["npc_9"] is record
+    assert gm.get_npc_by_name("外来者") is record
+
+    gm.sync_npcs_from_state()  # 已共享时不重建
+    assert gm.get_npc("npc_9") is record
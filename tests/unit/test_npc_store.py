@@ -0,0 +1,146 @@
+"""
+测试NPC存储的索引和存活集合
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.core.game_state import GameStateManager
+from web.backend.services.game_service import GameService
+
+
+@pytest.fixture
+def game_manager(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    gm.new_game("npc_store_test")
+    for i in range(1, 4):
+        gm.add_npc({"id": f"npc_{i}", "name": f"测试员{i}", "hp": 100})
+    return gm
+
+
+def test_lookup_by_id_and_name(game_manager):
+    assert game_manager.get_npc("npc_2")["name"] == "测试员2"
+    assert game_manager.get_npc_by_name("测试员3")["id"] == "npc_3"
+    assert game_manager.get_npc_by_name("不存在") is None
+
+    game_manager.update_npc("npc_3", {"name": "改名者"})
+    assert game_manager.get_npc_by_name("测试员3") is None
+    assert game_manager.get_npc_by_name("改名者")["id"] == "npc_3"
+
+
+def test_alive_sets_follow_updates_and_keep_order(game_manager):
+    alive = game_manager.get_alive_npcs()
+    assert [npc["id"] for npc in alive] == ["npc_1", "npc_2", "npc_3"]
+    # 成员没有变化时返回同一个缓存列表
+    game_manager.update_npc("npc_1", {"fear": 30})
+    assert game_manager.get_alive_npcs() is alive
+
+    game_manager.update_npc("npc_2", {"alive": False})
+    assert [npc["id"] for npc in game_manager.get_alive_npcs()] == ["npc_1", "npc_3"]
+    assert [npc["id"] for npc in game_manager.get_active_npcs()] == [
+        "npc_1",
+        "npc_2",
+        "npc_3",
+    ]
+
+    game_manager.update_npc("npc_1", {"hp": 0})
+    assert [npc["id"] for npc in game_manager.get_active_npcs()] == ["npc_2", "npc_3"]
+
+    game_manager.remove_npc("npc_3")
+    assert game_manager.get_alive_npcs() == []
+    assert game_manager.state.npcs_died == 1
+    assert "npc_3" not in game_manager.state.npcs
+
+
+def test_direct_mutation_updates_store(game_manager):
+    game_manager.state.npcs["npc_1"]["hp"] = 0
+    assert [npc["id"] for npc in game_manager.get_alive_npcs()] == ["npc_2", "npc_3"]
+
+    npc_2 = game_manager.get_npc("npc_2")
+    npc_2["location"] = "kitchen"
+    assert game_manager.get_npcs_in_location("kitchen") == [npc_2]
+    npc_2["alive"] = False
+    assert game_manager.count_npcs_in_location("kitchen") == 0
+    assert game_manager.state.dirty.npcs["npc_2"] >= {"location", "alive"}
+
+
+def test_removed_record_no_longer_updates_store(game_manager):
+    npc = game_manager.get_npc("npc_1")
+    game_manager.remove_npc("npc_1")
+
+    npc["location"] = "kitchen"
+    assert game_manager.get_npcs_in_location("kitchen") == []
+
+
+def test_list_replacement_rebuilds_store(game_manager):
+    game_manager.npcs = [{"id": "x", "name": "新人", "hp": 50}]
+
+    assert game_manager.get_npc("npc_1") is None
+    assert game_manager.get_npc_by_name("新人")["id"] == "x"
+    assert len(game_manager.get_alive_npcs()) == 1
+
+
+def test_location_index_follows_moves_and_deaths(game_manager):
+    game_manager.move_npc("npc_1", "kitchen")
+    game_manager.move_npc("npc_2", "kitchen")
+    game_manager.move_npc("npc_3", "bathroom")
+
+    assert [npc["id"] for npc in game_manager.get_npcs_in_location("kitchen")] == [
+        "npc_1",
+        "npc_2",
+    ]
+    assert game_manager.count_npcs_in_location("bathroom") == 1
+
+    game_manager.update_npc("npc_2", {"hp": 0, "alive": False})
+    assert game_manager.count_npcs_in_location("kitchen") == 1
+
+    game_manager.remove_npc("npc_3")
+    assert game_manager.get_npcs_in_location("bathroom") == []
+
+
+def test_attached_map_reads_occupancy_from_index(game_manager):
+    from src.models.map import create_default_map
+
+    map_manager = create_default_map()
+    game_manager.attach_map(map_manager)
+
+    game_manager.move_npc("npc_1", "basement")
+    assert map_manager.get_area("basement").npcs == ["npc_1"]
+
+    game_manager.move_npc("npc_1", "kitchen")
+    assert map_manager.get_area("basement").npcs == []
+    assert map_manager.to_dict()["areas"]["kitchen"]["npcs"] == ["npc_1"]
+
+
+def test_restored_map_follows_moves_after_save_and_load(game_manager, tmp_path):
+    from src.managers.save_manager import SaveManager
+    from src.models.map import create_default_map
+
+    game_manager.attach_map(create_default_map())
+    game_manager.move_npc("npc_1", "kitchen")
+    saves = SaveManager(str(tmp_path / "saves"))
+    filename = saves.save_game(game_manager, "occupancy")
+
+    restored = saves.restore_game_state(saves.load_game(filename))
+    map_manager = restored.map_manager
+    assert map_manager.get_area("kitchen").npcs == ["npc_1"]
+
+    restored.move_npc("npc_1", "basement")
+    assert map_manager.get_area("kitchen").npcs == []
+    assert map_manager.get_area("basement").npcs == ["npc_1"]
+
+
+@pytest.mark.asyncio
+async def test_game_service_map_reads_occupancy_from_index():
+    service = GameService(npc_count=2)
+    await service.initialize()
+    gm = service.game_state_manager
+    npc = gm.npcs[0]
+
+    assert gm.map_manager is service.map_manager
+    assert npc["id"] in service.map_manager.get_area(npc["location"]).npcs
+    gm.move_npc(npc["id"], "basement")
+    assert npc["id"] in service.map_manager.get_area("basement").npcs
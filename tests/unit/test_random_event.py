@@ -6,23 +6,23 @@ import pytest
 # ensure project root in sys.path
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
 
-from web.backend.services import game_service as gs_module
 from web.backend.services.game_service import GameService
 
 
 @pytest.mark.asyncio
 async def test_random_event_generation(monkeypatch):
     """随机事件应记录在 events 列表和 game_log 中"""
-    monkeypatch.setattr(gs_module.random, "random", lambda: 0.1)
-    monkeypatch.setattr(gs_module.random, "choice", lambda seq: "窗外传来诡异声响")
-
     service = GameService()
     await service.initialize()
 
+    events_rng = service.game_state_manager.rng.events
+    monkeypatch.setattr(events_rng, "random", lambda: 0.1)
+    monkeypatch.setattr(events_rng, "choice", lambda seq: "窗外传来诡异声响")
+
     service.npc_behavior.decide_action = lambda *args, **kwargs: None
     service.rule_executor.execute = lambda *args, **kwargs: None
 
-    async def fake_dialogue(self):
+    async def fake_dialogue(self, npcs):
         return []
 
     async def fake_broadcast(self, update):
@@ -40,3 +40,93 @@ async def test_random_event_generation(monkeypatch):
     assert any(e["type"] == "ambient" for e in result.events)
     assert any("窗外传来诡异声响" in log for log in service.game_state_manager.game_log)
 
+
+
+class RecordingHub:
+    """记录增量消息的订阅中心"""
+
+    def __init__(self):
+        self.chunks = []
+        self.updates = []
+
+    def subscribers(self, topic):
+        return {"client"}
+
+    def is_open(self, topic):
+        return True
+
+    async def publish(self, topic, message):
+        self.updates.append(message)
+        return 1
+
+    async def publish_transient(self, topic, message):
+        self.chunks.append(message["data"])
+        return 1
+
+
+class StreamingClient:
+    def __init__(self):
+        self.requests = []
+
+    async def stream_narrative_text(self, **request):
+        self.requests.append(request)
+        for delta in ["灯光", "熄灭了"]:
+            yield delta
+
+
+@pytest.mark.asyncio
+async def test_turn_narrative_streams_chunks_to_clients():
+    """推进回合时的叙事逐段推送给客户端"""
+    hub = RecordingHub()
+    service = GameService(hub=hub)
+    await service.initialize()
+    client = StreamingClient()
+    service.narrator.deepseek_client = client
+
+    narrative = await service._generate_turn_narrative(
+        [{"type": "npc_action", "npc": "张三", "action": "搜索", "location": "走廊"}]
+    )
+
+    assert narrative == "灯光熄灭了"
+    assert [c["content"] for c in hub.chunks] == ["灯光", "熄灭了", ""]
+    assert [c["is_final"] for c in hub.chunks] == [False, False, True]
+    assert {c["stream"] for c in hub.chunks} == {"narrative"}
+    assert len({c["stream_id"] for c in hub.chunks}) == 1
+    assert client.requests[0]["survivor_count"] == len(service.game_state.npcs)
+
+
+class StreamingDialogueClient:
+    async def stream_dialogue(self, npc_states, scene_context):
+        for speaker in (npc_states[0]["name"], npc_states[1]["name"]):
+            yield {"type": "dialogue", "speaker": speaker, "delta": "有人", "done": False}
+            yield {"type": "dialogue", "speaker": speaker, "delta": "吗", "done": True}
+        yield {
+            "type": "result",
+            "dialogue": [
+                {"speaker": npc_states[0]["name"], "text": "有人吗"},
+                {"speaker": npc_states[1]["name"], "text": "有人吗"},
+            ],
+        }
+
+
+@pytest.mark.asyncio
+async def test_turn_dialogue_streams_chunks_to_clients():
+    """推进回合时的对话逐段推送给客户端，完整对话仍作为对话更新发送"""
+    hub = RecordingHub()
+    service = GameService(hub=hub)
+    await service.initialize()
+    service.dialogue_system.deepseek_client = StreamingDialogueClient()
+    npcs = service._dialogue_participants()
+
+    events = await service._run_dialogue_phase(npcs)
+
+    names = [npc.name for npc in npcs]
+    assert events[0]["content"] == [{"speaker": name, "text": "有人吗"} for name in names]
+    assert [(c["speaker"], c["content"], c["is_final"]) for c in hub.chunks] == [
+        (names[0], "有人", False),
+        (names[0], "吗", True),
+        (names[1], "有人", False),
+        (names[1], "吗", True),
+    ]
+    assert {c["stream"] for c in hub.chunks} == {"dialogue"}
+    assert [u["data"]["update_type"] for u in hub.updates] == ["dialogue"]
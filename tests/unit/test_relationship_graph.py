@@ -0,0 +1,63 @@
+"""
+测试增量维护的NPC关系图
+"""
+import pytest
+
+from src.ai.turn_pipeline import AITurnPipeline
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.core.game_state import GameStateManager
+from src.core.npc_behavior import NPCBehavior
+from src.models.event import EventType
+
+
+def talk(actor, target):
+    return {
+        "type": EventType.NPC_ACTION.value,
+        "turn": 1,
+        "description": f"{actor}和{target}交谈",
+        "meta": {"action": "talk", "actor": actor, "target": target},
+    }
+
+
+@pytest.fixture
+def game_manager(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    gm.new_game("relationship_test")
+    for npc_id, name in (("a", "甲"), ("b", "乙"), ("c", "丙")):
+        gm.add_npc({"id": npc_id, "name": name, "hp": 100})
+    return gm
+
+
+def test_talk_events_update_graph_incrementally(game_manager):
+    for _ in range(3):
+        game_manager.state.events_history.append(talk("甲", "乙"))
+    game_manager.state.events_history.append(talk("甲", "不存在"))
+
+    assert game_manager.relationships.get("a", "b") == 65
+    assert game_manager.relationships.get("b", "a") == 65
+    assert game_manager.relationships.get("a", "c") == 50
+    # NPC数据中的关系直接引用关系图
+    assert game_manager.get_npc("a")["relationships"] == {"b": 65}
+
+
+def test_pipeline_reads_relationships_without_history_scan(game_manager):
+    game_manager.state.events_history = [talk("乙", "丙")] * 12
+    pipeline = AITurnPipeline(game_manager, MockDeepSeekClient())
+
+    relationships = pipeline._calculate_npc_relationships(game_manager.get_npc("b"))
+
+    assert relationships == {"甲": 50, "丙": 100}
+
+
+def test_behavior_adjustments_and_save_roundtrip(game_manager):
+    NPCBehavior(game_manager).update_npc_relationships("a", "c", -20)
+    assert game_manager.get_relationships("a")["c"] == 30
+
+    game_manager.save_game("relationship_save")
+    loaded = GameStateManager(
+        save_dir=str(game_manager.save_dir), config={"echo_log": False}
+    )
+    assert loaded.load_game("relationship_save")
+
+    assert loaded.relationships.get("a", "c") == 30
+    assert loaded.get_npc("a")["relationships"] is loaded.get_relationships("a")
@@ -1,34 +1,140 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
 from pathlib import Path
 
-from src.api.deepseek_http_client import ResponseCache
+import pytest
 
+from src.api import deepseek_http_client
+from src.api.deepseek_http_client import ResponseCache, sweep_cache_dir
+from src.api.response_store import open_store
 
-def test_set_creates_error_file_on_failure(tmp_path, monkeypatch):
+
+def test_entries_persist_in_shared_store(tmp_path):
     cache = ResponseCache(tmp_path)
+    cache.set("p", {"k": "v"}, {"result": True})
+    cache.store.flush()
 
-    original_open = Path.open
+    # 新实例内存为空，从 SQLite 存储读取；不再生成每条一个的 JSON 文件
+    fresh = ResponseCache(tmp_path)
+    assert fresh.store is cache.store
+    assert fresh.get("p", {"k": "v"}) == {"result": True}
+    assert fresh.stats.disk_hits == 1
+    assert not list(tmp_path.glob("*.json"))
 
-    def fake_open(self, mode="r", *args, **kwargs):
-        if str(self).endswith(".json") and "w" in mode:
-            raise OSError("disk error")
-        return original_open(self, mode, *args, **kwargs)
 
-    monkeypatch.setattr(Path, "open", fake_open)
+def test_failed_write_does_not_leave_stale_entry(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.set("p", {"k": "v"}, "old")
+    cache.store.flush()
+    key = cache._generate_key("p", {"k": "v"})
+    cache.store.call(
+        lambda conn: conn.execute(
+            f"CREATE TRIGGER fail BEFORE INSERT ON responses WHEN NEW.key = '{key}' "
+            "BEGIN SELECT RAISE(ABORT, 'disk error'); END"
+        )
+    )
+
+    cache.set("p", {"k": "v"}, "new")
+    cache.store.flush()
 
-    cache.set("p", {"k": "v"}, {"result": True})
+    assert cache.store.metrics()["write_errors"] == 1
+    assert ResponseCache(tmp_path).get("p", {"k": "v"}) is None
 
-    error_files = list(tmp_path.glob("*.error"))
-    assert len(error_files) == 1
 
+def test_legacy_json_files_are_removed(tmp_path):
+    # 旧文件按旧键命名，新键永远不会命中，打开存储时直接删除
+    future = (datetime.now() + timedelta(hours=1)).isoformat()
+    legacy_key = "0123456789abcdef0123456789abcdef"
+    (tmp_path / f"{legacy_key}.json").write_text(
+        json.dumps({"data": {"result": 1}, "expires_at": future}), encoding="utf-8"
+    )
+    (tmp_path / f"{'ab' * 32}.error").write_text("disk error", encoding="utf-8")
 
-def test_get_removes_error_file(tmp_path):
     cache = ResponseCache(tmp_path)
-    key = cache._generate_key("p", {"k": "v"})
-    error_file = tmp_path / f"{key}.error"
-    error_file.touch()
 
-    result = cache.get("p", {"k": "v"})
+    assert len(cache.store) == 0
+    assert not list(tmp_path.glob("*.json")) and not list(tmp_path.glob("*.error"))
+
+
+def test_unrelated_files_in_cache_dir_are_kept(tmp_path):
+    # 缓存目录可配置，不符合旧格式的文件不能被删除
+    future = (datetime.now() + timedelta(hours=1)).isoformat()
+    kept = {
+        "settings.json": json.dumps({"theme": "dark"}),
+        "0123abcd.json": json.dumps({"data": 1, "expires_at": future}),
+        f"{'0' * 32}.json": json.dumps({"name": "not a cache entry"}),
+        f"{'1' * 32}.json": "not json",
+        "notes.error": "keep me",
+    }
+    for name, text in kept.items():
+        (tmp_path / name).write_text(text, encoding="utf-8")
+
+    assert len(ResponseCache(tmp_path).store) == 0
+
+    assert sorted(p.name for p in tmp_path.iterdir() if p.name in kept) == sorted(kept)
+
+
+@pytest.mark.asyncio
+async def test_store_opens_off_the_event_loop(tmp_path, monkeypatch):
+    opened_in = []
+
+    def recording_open(cache_dir):
+        opened_in.append(threading.current_thread().name)
+        return open_store(cache_dir)
+
+    monkeypatch.setattr(deepseek_http_client, "open_store", recording_open)
+    cache = ResponseCache(tmp_path)
+    assert opened_in == []  # 构造时不打开数据库
+
+    assert await cache.aget("p", {}) is None
+    assert len(opened_in) == 1 and opened_in[0].startswith("io")
+
+
+def test_memory_tier_is_bounded_lru(tmp_path):
+    cache = ResponseCache(tmp_path, max_entries=2)
+    cache.set("a", {}, "A")
+    cache.set("b", {}, "B")
+    assert cache.get("a", {}) == "A"  # a 变为最近使用
+    cache.set("c", {}, "C")
+
+    assert list(cache.memory_cache) == [cache._generate_key(p, {}) for p in ("a", "c")]
+    assert cache.stats.evictions == 1
+    assert cache.get("b", {}) == "B"  # 被淘汰的条目仍可从文件层读取
+    assert cache.stats.disk_hits == 1
+
+    small = ResponseCache(tmp_path / "bytes", max_bytes=10)
+    small.set("x", {}, "123456")
+    small.set("y", {}, "abcdef")
+    assert len(small.memory_cache) == 1 and small.memory_bytes <= 10
+
+
+def test_hot_hit_touches_no_files(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    cache.set("p", {"k": "v"}, {"result": True})
+
+    def fail(*args, **kwargs):
+        raise AssertionError("内存命中不应访问文件系统")
+
+    monkeypatch.setattr(Path, "exists", fail)
+    monkeypatch.setattr(Path, "open", fail)
+    monkeypatch.setattr(cache.store, "get", fail)
+    assert cache.get("p", {"k": "v"}) == {"result": True}
+    assert cache.metrics()["hits"] == 1
+
+
+def test_expired_entries_are_dropped_and_swept(tmp_path, monkeypatch):
+    cache = ResponseCache(tmp_path)
+    cache.set("old", {}, "stale", ttl=1)
+    cache.set("new", {}, "fresh", ttl=3600)
 
-    assert result is None
-    assert not error_file.exists()
+    later = time.monotonic() + 5
+    monkeypatch.setattr(time, "monotonic", lambda: later)
+    assert cache.purge_expired() == 1
+    assert list(cache.memory_cache) == [cache._generate_key("new", {})]
 
+    cache.store.flush()
+    assert cache.store.sweep(now=time.time() + 5) == 1
+    assert len(cache.store) == 1
+    assert sweep_cache_dir(tmp_path) == 0
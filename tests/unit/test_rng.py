@@ -0,0 +1,87 @@
+"""
+测试游戏随机数服务
+"""
+import random
+
+import pytest
+
+from src.core.game_state import GameStateManager
+from src.core.npc_behavior import NPCBehavior
+from src.core.rule_executor import RuleExecutor
+from src.utils.rng import GameRNG
+
+
+def test_same_seed_gives_same_streams():
+    a, b = GameRNG(42), GameRNG(42)
+
+    assert [a.rules.random() for _ in range(3)] == [b.rules.random() for _ in range(3)]
+    assert a.npc.random() != a.events.random()
+
+
+def test_streams_are_independent():
+    a, b = GameRNG(7), GameRNG(7)
+    for _ in range(10):
+        a.dialogue.random()  # 只消耗 a 的对话子流
+
+    assert a.rules.random() == b.rules.random()
+
+
+def test_serialize_and_restore_in_place():
+    rng = GameRNG(3)
+    stream = rng.events
+    stream.random()
+    data = rng.to_dict()
+    expected = [stream.random() for _ in range(3)]
+
+    rng.load_dict(data)
+
+    assert rng.events is stream
+    assert [stream.random() for _ in range(3)] == expected
+    assert GameRNG.from_dict(data).events.random() == expected[0]
+
+
+def test_game_manager_injects_streams_and_saves_state(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"seed": 11})
+    gm.new_game("rng_test")
+
+    assert RuleExecutor(gm).rng is gm.rng.rules
+    assert NPCBehavior(gm).rng is gm.rng.npc
+
+    gm.rng.npc.random()
+    gm.save_game()
+    expected = gm.rng.npc.random()
+
+    restored = GameStateManager(save_dir=str(tmp_path))
+    assert restored.load_game("rng_test")
+    assert restored.rng.seed_value == 11
+    assert restored.rng.npc.random() == expected
+
+
+class FailingNarrativeClient:
+    async def generate_narrative_text(self, **request):
+        raise RuntimeError("offline")
+
+
+async def template_narrative(seed):
+    from src.core.narrator import Narrator
+
+    narrator = Narrator(FailingNarrativeClient(), rng=GameRNG(seed).narrative)
+    events = [
+        {"type": "npc_action", "npc": "张三", "action": "搜索", "location": "走廊"},
+        {"type": "rule_triggered", "rule": "午夜照镜"},
+        {"type": "dialogue", "participants": ["张三", "李四"]},
+    ]
+    return [
+        await narrator.generate_narrative(events, {"time_of_day": "night"})
+        for _ in range(5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_narrator_templates_follow_game_seed():
+    random.seed(0)
+    first = await template_narrative(5)
+    global_state = random.getstate()
+
+    assert await template_narrative(5) == first
+    assert random.getstate() == global_state  # 不消耗全局 random
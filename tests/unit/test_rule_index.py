@@ -0,0 +1,325 @@
+"""
+测试规则分发索引
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.ai.turn_pipeline import AITurnPipeline
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.api.schemas import PlannedAction
+from src.core.game_state import GameStateManager
+from src.core.rule_executor import RuleContext, RuleExecutor
+from src.models.rule import EffectType, Rule, RuleEffect, TriggerCondition
+from src.models.rule_manager import RuleManager
+from web.backend.services.game_service import GameService
+
+
+class CooldownRule(Rule):
+    """触发后进入冷却的规则"""
+
+    cooldown_after_trigger: int = 1
+
+
+def make_rule(rule_id, action, location=None, probability=0.5):
+    return Rule(
+        id=rule_id,
+        name=rule_id,
+        trigger=TriggerCondition(
+            action=action, location=location, probability=probability
+        ),
+        effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+    )
+
+
+@pytest.fixture
+def game_manager(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path))
+    gm.new_game("rule_index_test")
+    gm.add_rule(make_rule("mirror", "look_mirror", ["bathroom"]))
+    gm.add_rule(make_rule("mirror_any", "look_mirror"))
+    gm.add_rule(make_rule("door", "open_door", ["corridor", "kitchen"]))
+    return gm
+
+
+def test_candidates_filter_by_action_and_location(game_manager):
+    index = game_manager.sync_rule_index()
+
+    ids = [r.id for r in index.candidates("look_mirror", "bathroom")]
+    assert ids == ["mirror", "mirror_any"]
+    assert [r.id for r in index.candidates("look_mirror", "kitchen")] == ["mirror_any"]
+    assert [r.id for r in index.candidates("open_door", "kitchen")] == ["door"]
+    assert index.candidates("talk", "kitchen") == []
+
+
+def test_toggle_and_update_keep_index_current(game_manager):
+    index = game_manager.sync_rule_index()
+
+    assert game_manager.toggle_rule("mirror_any") is False
+    assert [r.id for r in index.candidates("look_mirror", "kitchen")] == []
+    assert game_manager.toggle_rule("mirror_any") is True
+    assert [r.id for r in index.candidates("look_mirror", "kitchen")] == ["mirror_any"]
+
+    game_manager.update_rule(
+        "door", {"level": 2, "trigger": TriggerCondition(action="turn_around")}
+    )
+    assert index.candidates("open_door", "kitchen") == []
+    assert [r.id for r in index.candidates("turn_around", "attic")] == ["door"]
+    assert game_manager.get_rule("door").level == 2
+
+
+def test_direct_rule_list_replacement_resyncs(game_manager):
+    game_manager.rules = [make_rule("mirror", "look_mirror", ["bathroom"])]
+
+    index = game_manager.sync_rule_index()
+    assert len(index) == 1
+    assert game_manager.get_rule("door") is None
+
+
+def test_in_place_edits_rebuild_after_version_bump(game_manager):
+    index = game_manager.sync_rule_index()
+    assert [r.id for r in index.candidates("open_door", "kitchen")] == ["door"]
+
+    # 长度不变的就地替换：旧实现只比较列表身份和长度，会继续返回旧规则
+    position = next(i for i, r in enumerate(game_manager.rules) if r.id == "door")
+    game_manager.rules[position] = make_rule("door", "turn_around")
+    game_manager.mark_rules_changed()
+
+    index = game_manager.sync_rule_index()
+    assert index.candidates("open_door", "kitchen") == []
+    assert [r.id for r in index.candidates("turn_around", "attic")] == ["door"]
+
+
+def test_rule_field_edits_reach_the_index_without_marking(game_manager):
+    door = game_manager.get_rule("door")
+
+    door.trigger.location = ["attic"]
+    index = game_manager.sync_rule_index()
+    assert index.candidates("open_door", "kitchen") == []
+    assert [r.id for r in index.candidates("open_door", "attic")] == ["door"]
+
+    door.active = False
+    assert game_manager.sync_rule_index().candidates("open_door", "attic") == []
+
+
+def test_loaded_rules_are_rule_objects_in_the_index(tmp_path):
+    config = {"echo_log": False}
+    gm = GameStateManager(save_dir=str(tmp_path), config=config)
+    gm.new_game("rule_load")
+    gm.add_rule(make_rule("door", "open_door", ["kitchen"]))
+    gm.save_game("rule_load")
+
+    loaded = GameStateManager(save_dir=str(tmp_path), config=config)
+    assert loaded.load_game("rule_load")
+    rule = loaded.get_rule("door")
+    assert isinstance(rule, Rule)
+    assert loaded.sync_rule_index().candidates("open_door", "kitchen") == [rule]
+
+
+def test_rule_manager_swaps_reach_the_index(tmp_path):
+    service = GameService()
+    service.game_state_manager = GameStateManager(
+        save_dir=str(tmp_path), config={"echo_log": False}
+    )
+    service.game_state = service.game_state_manager.new_game("rule_swap")
+    service.rule_manager = RuleManager()
+    service.rule_manager.add_rule(make_rule("door", "open_door"))
+    service._sync_rules_to_manager()
+    assert service.game_state_manager.get_rule("door").trigger.action == "open_door"
+
+    # 先删后加，规则数不变
+    service.rule_manager.remove_rule("door")
+    service.rule_manager.add_rule(make_rule("door", "turn_around"))
+    service._sync_rules_to_manager()
+
+    index = service.game_state_manager.sync_rule_index()
+    assert [r.id for r in index.candidates("turn_around", None)] == ["door"]
+    assert index.candidates("open_door", None) == []
+
+
+def test_check_all_rules_uses_index(game_manager):
+    executor = RuleExecutor(game_manager)
+    actor = {"id": "npc_1", "name": "测试员", "location": "bathroom"}
+    context = RuleContext(actor, "look_mirror", game_manager.state.to_dict())
+
+    triggered = executor.check_all_rules(context)
+
+    assert [rule.id for rule, _ in triggered] == ["mirror", "mirror_any"]
+
+
+def test_check_rules_batch_matches_per_action_checks(game_manager):
+    executor = RuleExecutor(game_manager)
+    actors = [
+        {"id": "npc_1", "name": "甲", "location": "bathroom", "fear": 80},
+        {"id": "npc_2", "name": "乙", "location": "kitchen"},
+        {"id": "npc_3", "name": "丙", "location": "kitchen"},
+    ]
+    pairs = [(actors[0], "look_mirror"), (actors[1], "open_door"), (actors[2], "talk")]
+
+    batch = executor.check_rules_batch(pairs)
+
+    assert [rule.id for rule in batch.rules] == ["mirror", "mirror_any", "door"]
+    assert batch.trigger_matrix == [
+        [True, True, False],
+        [False, False, True],
+        [False, False, False],
+    ]
+    state = game_manager.state.to_dict()
+    for row, (actor, action) in enumerate(pairs):
+        expected = executor.check_all_rules(RuleContext(actor, action, state))
+        assert batch.triggered_for(row) == expected
+    assert batch.probabilities[0][0] == pytest.approx(0.7)  # 恐惧修正 +0.2
+
+
+def wave(gm, *actions):
+    """一轮行动及各自行动完成时的快照"""
+    return [
+        (action, gm.rule_executor.snapshot_actor(gm.get_npc_by_name(action.npc)))
+        for action in actions
+    ]
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False, "seed": 3})
+    gm.new_game("batch_recheck")
+    for npc_id, name in (("a", "甲"), ("b", "乙")):
+        gm.add_npc({"id": npc_id, "name": name, "hp": 100, "location": "bathroom"})
+    gm.rule_executor = RuleExecutor(gm)
+    return AITurnPipeline(gm, MockDeepSeekClient())
+
+
+@pytest.mark.asyncio
+async def test_rule_on_cooldown_does_not_fire_again_in_same_batch(pipeline):
+    gm = pipeline.game_mgr
+    gm.add_rule(
+        CooldownRule(
+            id="mirror",
+            name="mirror",
+            trigger=TriggerCondition(action="search", probability=1.0),
+            effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+        )
+    )
+
+    await pipeline._check_rule_triggers(
+        wave(gm, PlannedAction(npc="甲", action="search"), PlannedAction(npc="乙", action="search"))
+    )
+
+    history = gm.rule_executor.execution_history["mirror"]
+    assert [entry["actor"] for entry in history] == ["a"]
+    assert gm.rule_executor.cooldowns["mirror"] == 1
+
+
+@pytest.mark.asyncio
+async def test_actor_killed_earlier_in_turn_triggers_nothing(pipeline, monkeypatch):
+    gm = pipeline.game_mgr
+    gm.add_rule(make_rule("door", "investigate", probability=1.0))
+    gm.add_rule(make_rule("mirror", "search", probability=1.0))
+    executor = gm.rule_executor
+    execute = executor.execute_rule
+
+    def execute_and_kill(rule, context):
+        result = execute(rule, context)
+        if rule.id == "door":  # 甲调查时乙当场死亡
+            gm.update_npc("b", {"alive": False, "hp": 0})
+        return result
+
+    monkeypatch.setattr(executor, "execute_rule", execute_and_kill)
+    await pipeline._check_rule_triggers(
+        wave(
+            gm,
+            PlannedAction(npc="甲", action="investigate"),
+            PlannedAction(npc="乙", action="search"),
+        )
+    )
+
+    assert list(executor.execution_history) == ["door"]
+
+
+def test_batch_judges_actions_by_their_snapshots(pipeline):
+    gm = pipeline.game_mgr
+    gm.add_rule(make_rule("bath", "search", location=["bathroom"], probability=1.0))
+    gm.add_rule(
+        Rule(
+            id="alone",
+            name="alone",
+            trigger=TriggerCondition(
+                action="search", probability=1.0, extra_conditions=["alone"]
+            ),
+            effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+        )
+    )
+    actor = gm.get_npc_by_name("甲")
+    snapshot = gm.rule_executor.snapshot_actor(actor)
+    # 同一轮中之后的行动让甲离开了浴室
+    gm.move_npc("a", "kitchen")
+
+    batch = gm.rule_executor.check_rules_batch([(actor, "search")], snapshots=[snapshot])
+
+    assert [rule.id for rule, _ in batch.triggered_for(0)] == ["bath"]
+    assert batch.context_for(0).actor is actor
+    assert batch.context_for(0).actor_location == "kitchen"
+
+
+@pytest.mark.asyncio
+async def test_npc_killed_by_rule_does_not_take_later_actions(pipeline, monkeypatch):
+    gm = pipeline.game_mgr
+    gm.add_rule(
+        Rule(
+            id="death",
+            name="death",
+            trigger=TriggerCondition(action="search", probability=1.0),
+            effect=RuleEffect(type=EffectType.INSTANT_DEATH),
+        )
+    )
+    gm.add_rule(make_rule("door", "investigate", probability=1.0))
+    blocked = []
+    monkeypatch.setattr(pipeline, "_log_blocked_action", blocked.append)
+
+    await pipeline._process_actions(
+        [
+            PlannedAction(npc="甲", action="search"),
+            PlannedAction(npc="乙", action="search"),
+            PlannedAction(npc="甲", action="investigate"),
+        ]
+    )
+
+    # 甲的第二个行动在第一轮规则结算之后，甲已死亡
+    assert [action.action for action in blocked] == ["investigate"]
+    assert list(gm.rule_executor.execution_history) == ["death"]
+
+
+def test_column_and_row_evaluation_agree(game_manager, monkeypatch):
+    pytest.importorskip("numpy")
+    from src.core import rule_executor as rule_executor_module
+
+    game_manager.add_rule(
+        Rule(
+            id="brave",
+            name="brave",
+            trigger=TriggerCondition(
+                action="look_mirror", probability=0.3, extra_conditions=["high_fear"]
+            ),
+            effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+            requirements={"actor_traits": {"courage": {"min": 5}}, "items": ["镜子"]},
+        )
+    )
+    executor = RuleExecutor(game_manager)
+    actors = [
+        {"id": "npc_1", "location": "bathroom", "fear": 80, "courage": 7, "inventory": ["镜子"]},
+        {"id": "npc_2", "location": "bathroom", "fear": 80, "courage": 3, "inventory": ["镜子"]},
+        {"id": "npc_3", "location": "kitchen", "sanity": 20, "curiosity": 9},
+        {"id": "npc_4", "location": "bathroom", "fear": 10, "courage": 9},
+    ]
+    pairs = [(actor, action) for actor in actors for action in ("look_mirror", "open_door")]
+
+    columns = executor.check_rules_batch(pairs)
+    monkeypatch.setattr(rule_executor_module, "numpy_available", lambda: False)
+    rows = executor.check_rules_batch(pairs)
+
+    assert [rule.id for rule in columns.rules] == [rule.id for rule in rows.rules]
+    assert columns.probabilities == rows.probabilities
+    assert columns.trigger_matrix[0][-1] and not columns.trigger_matrix[2][-1]
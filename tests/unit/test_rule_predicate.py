@@ -0,0 +1,161 @@
+"""
+测试规则谓词编译
+"""
+import pytest
+
+from src.core.game_state import GameStateManager
+from src.core.rule_executor import RuleContext, RuleExecutor
+from src.core.rule_predicate import compile_rule
+from src.models.rule import (
+    EffectType,
+    Rule,
+    RuleEffect,
+    RuleRequirement,
+    TriggerCondition,
+    parse_clock,
+)
+
+
+def make_rule(rule_id="dark_mirror", **trigger_kwargs):
+    trigger_kwargs.setdefault("action", "look_mirror")
+    return Rule(
+        id=rule_id,
+        name=rule_id,
+        trigger=TriggerCondition(**trigger_kwargs),
+        effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+        requirements=RuleRequirement(
+            items=["candle"], actor_traits={"fear": {"min": 20, "max": 80}}
+        ),
+    )
+
+
+@pytest.fixture
+def game_manager(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path))
+    gm.new_game("rule_predicate_test")
+    return gm
+
+
+def make_context(gm, location="bathroom", fear=50, inventory=("candle",), **state):
+    actor = {
+        "id": "npc_1",
+        "name": "测试员",
+        "location": location,
+        "fear": fear,
+        "inventory": list(inventory),
+    }
+    game_state = gm.state.to_dict()
+    game_state.update(state)
+    return RuleContext(actor, "look_mirror", game_state)
+
+
+def test_compile_rule_flattens_conditions():
+    rule = make_rule(
+        location=["bathroom", "bedroom"],
+        time_range={"from": "23:00", "to": "02:00"},
+        extra_conditions=["lights_off", "unknown_condition"],
+    )
+
+    compiled = compile_rule(rule)
+
+    assert compiled.locations == frozenset({"bathroom", "bedroom"})
+    assert compiled.time_window == (23 * 60, 2 * 60)
+    assert compiled.items == ("candle",)
+    assert len(compiled.extra_checks) == 1  # 未知条件在编译时被忽略
+    assert parse_clock("25:00") is None
+
+
+def test_compiled_predicate_matches_like_interpreted_checks(game_manager):
+    rule = make_rule(
+        location=["bathroom"],
+        time_range={"from": "23:00", "to": "02:00"},
+        extra_conditions=["lights_off"],
+    )
+    game_manager.add_rule(rule)
+    executor = RuleExecutor(game_manager)
+
+    ok = dict(current_time="23:30", lights_on=False)
+    assert executor.can_rule_trigger(rule, make_context(game_manager, **ok))
+    assert not executor.can_rule_trigger(
+        rule, make_context(game_manager, location="kitchen", **ok)
+    )
+    assert not executor.can_rule_trigger(
+        rule, make_context(game_manager, fear=90, **ok)
+    )
+    assert not executor.can_rule_trigger(
+        rule, make_context(game_manager, inventory=(), **ok)
+    )
+    assert not executor.can_rule_trigger(
+        rule, make_context(game_manager, current_time="12:00", lights_on=False)
+    )
+    assert not executor.can_rule_trigger(
+        rule, make_context(game_manager, current_time="23:30", lights_on=True)
+    )
+
+
+def test_update_rule_invalidates_compiled_predicate(game_manager):
+    rule = make_rule(location=["bathroom"])
+    game_manager.add_rule(rule)
+    executor = RuleExecutor(game_manager)
+    context = make_context(game_manager, location="kitchen")
+
+    compiled = game_manager.rule_index.compiled(rule)
+    assert compiled is game_manager.rule_index.compiled(rule)
+    assert not executor.can_rule_trigger(rule, context)
+
+    game_manager.update_rule(
+        rule.id, {"trigger": TriggerCondition(action="look_mirror", location=["kitchen"])}
+    )
+
+    assert game_manager.rule_index.compiled(rule) is not compiled
+    assert executor.can_rule_trigger(rule, context)
+
+
+def test_context_reads_game_state_through_lazy_view(game_manager, monkeypatch):
+    rule = make_rule(location=["bathroom"])
+    game_manager.add_rule(rule)
+    executor = RuleExecutor(game_manager)
+    state = game_manager.state
+    actor = {
+        "id": "npc_1",
+        "name": "测试员",
+        "location": "bathroom",
+        "fear": 50,
+        "inventory": ["candle"],
+    }
+
+    def fail_to_dict():
+        raise AssertionError("规则判定不应序列化完整游戏状态")
+
+    monkeypatch.setattr(state, "to_dict", fail_to_dict)
+    context = RuleContext(actor, "look_mirror", state)
+    batch = executor.check_rules_batch([(actor, "look_mirror")])
+
+    assert executor.can_rule_trigger(rule, context)
+    assert batch.triggered_for(0)[0][0] is rule
+    assert context.game_state["phase"] == state.phase.value
+    assert context.game_state.get("lights_on", True) is True
+    assert context.game_state.events_history is state.events_history
+
+    state.current_turn = 7
+    assert context.game_state.get("turn") == 7
+    with pytest.raises(AttributeError):
+        context.game_state.turn = 8
+
+
+def test_in_place_trigger_edit_recompiles_predicate(game_manager):
+    rule = make_rule()
+    game_manager.add_rule(rule)
+    executor = RuleExecutor(game_manager)
+    index = game_manager.sync_rule_index()
+    assert index.compiled(rule).action == "look_mirror"
+
+    rule.trigger.action = "open_door"
+    rule.requirements.actor_traits = {}
+
+    assert index.compiled(rule).action == "open_door"
+    context = make_context(game_manager, fear=95)
+    context.action = "open_door"
+    assert [r.id for r, _ in executor.check_all_rules(context)] == ["dark_mirror"]
+    context.action = "look_mirror"
+    assert executor.check_all_rules(context) == []
@@ -0,0 +1,59 @@
+"""
+测试无界面批量模拟器
+"""
+from src.sim import HeadlessGame, SimulationConfig, run_simulations
+
+RULES = [
+    {
+        "id": "curious_eyes",
+        "name": "窥视之眼",
+        "trigger": {"action": "investigate", "probability": 0.5},
+        "effect": {"type": "fear_gain", "fear_gain": 10},
+    }
+]
+
+
+def make_config(**kwargs):
+    kwargs.setdefault("rules", RULES)
+    kwargs.setdefault("max_turns", 6)
+    return SimulationConfig(**kwargs)
+
+
+def test_headless_game_runs_to_completion():
+    result = HeadlessGame(make_config(), seed=1).run()
+
+    assert result.turns_played == 6
+    assert result.npcs_total == 4
+    assert 0 <= result.npcs_alive <= 4
+    assert result.rule_cost > 0
+    assert result.fear_gained == 10 * result.rules_fired.get("curious_eyes", 0)
+
+
+def test_same_seed_is_reproducible():
+    config = make_config(seed=5)
+
+    first = HeadlessGame(config, seed=5).run()
+    second = HeadlessGame(config, seed=5).run()
+
+    assert first == second
+
+
+def test_process_pool_matches_in_process_run():
+    config = make_config(seed=10, use_mock_llm=False)
+
+    serial = run_simulations(config, games=6, processes=1)
+    parallel = run_simulations(config, games=6, processes=2, chunk_size=2)
+
+    assert serial.to_dict() == parallel.to_dict()
+    assert serial.games == 6
+    assert serial.avg_turns <= 6
+
+
+def test_simulation_writes_no_saves_to_working_directory(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    game = HeadlessGame(make_config(max_turns=2), seed=3)
+    game.run()
+
+    assert game.game_manager.state.events_history.spill_path is None
+    assert not (tmp_path / "data").exists()
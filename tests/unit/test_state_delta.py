@@ -0,0 +1,168 @@
+"""
+测试脏字段跟踪和增量状态推送
+"""
+import copy
+import json
+
+import pytest
+
+from src.api.mock_deepseek_client import MockDeepSeekClient
+from src.core.game_state import GameStateManager
+from src.core.state_delta import REMOVE, DeltaLog, diff_ops
+from web.backend.services.game_service import GameService
+from web.backend.services.streaming_service import StreamingService
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        if message["type"] == "game_update":
+            self.sent.append(message["data"])
+
+    async def close(self):
+        pass
+
+
+def apply_ops(document, ops):
+    """按 JSON Patch 语义应用增量（测试用的最小实现）"""
+    for op in ops:
+        parts = [
+            part.replace("~1", "/").replace("~0", "~")
+            for part in op["path"][1:].split("/")
+        ]
+        parent = document
+        for key in parts[:-1]:
+            parent = parent[key]
+        if op["op"] == "remove":
+            del parent[parts[-1]]
+        else:
+            parent[parts[-1]] = op["value"]
+    return document
+
+
+def test_game_state_and_records_mark_dirty_fields(tmp_path):
+    gm = GameStateManager(save_dir=str(tmp_path), config={"echo_log": False})
+    gm.new_game("dirty_test")
+    gm.add_npc({"id": "npc_1", "name": "测试员", "hp": 100})
+    gm.add_npc({"id": "npc_2", "name": "路人", "hp": 100})
+    dirty = gm.state.dirty
+    dirty.clear()
+
+    gm.state.fear_points -= 10
+    gm.state.turn = 3  # 兼容属性记录到真实字段
+    gm.update_npc("npc_1", {"hp": 60})
+    gm.get_npc("npc_1")["fear"] = 20
+    gm.remove_npc("npc_2")
+
+    assert {"fear_points", "current_turn", "npcs_died"} <= dirty.fields
+    assert dirty.npcs == {"npc_1": {"hp", "fear"}}
+    assert dirty.removed == {"npc_2"}
+
+
+def test_diff_ops_and_delta_log():
+    document = {"fear_points": 100, "npcs": {"a/b": {"hp": 100}}}
+    ops = diff_ops(
+        document,
+        [
+            (("fear_points",), 100),
+            (("npcs", "a/b", "hp"), 90),
+            (("npcs", "c"), {"hp": 1}),
+            (("npcs", "missing"), REMOVE),
+        ],
+    )
+
+    assert ops == [
+        {"op": "replace", "path": "/npcs/a~1b/hp", "value": 90},
+        {"op": "add", "path": "/npcs/c", "value": {"hp": 1}},
+    ]
+    assert document["npcs"]["a/b"]["hp"] == 90
+
+    log = DeltaLog(history=2)
+    for i in range(3):
+        log.append([{"op": "replace", "path": "/x", "value": i}])
+    assert [v for v, _ in log.since(1)] == [2, 3]
+    assert log.since(3) == []
+    assert log.since(0) is None  # 版本1已被淘汰，只能发送快照
+
+
+@pytest.mark.asyncio
+async def test_service_sends_snapshot_then_versioned_deltas():
+    hub = StreamingService()
+    service = GameService(npc_count=3, seed=1, hub=hub)
+    await service.initialize(llm_client=MockDeepSeekClient())
+    service.game_state_manager.echo_log = False
+    ws = FakeWebSocket()
+
+    client_id = await service.add_websocket(ws)
+    hub.heartbeat_tasks[client_id].cancel()
+    await hub.broadcaster.drain()
+    snapshot = ws.sent[0]
+    assert snapshot["update_type"] == "snapshot"
+    client_state = copy.deepcopy(snapshot["data"]["state"])
+    npc_id = next(iter(client_state["npcs"]))
+
+    service.game_state_manager.update_npc(npc_id, {"hp": 0, "stamina": 10})
+    service.game_state.fear_points += 5
+    version = await service.publish_state()
+    await hub.broadcaster.drain()
+
+    delta = ws.sent[-1]
+    assert delta["update_type"] == "delta"
+    assert delta["data"]["version"] == version == snapshot["data"]["version"] + 1
+    paths = {op["path"] for op in delta["data"]["ops"]}
+    assert paths == {
+        "/fear_points",
+        f"/npcs/{npc_id}/hp",
+        f"/npcs/{npc_id}/is_alive",
+    }
+    apply_ops(client_state, delta["data"]["ops"])
+    assert client_state == service._state_document()
+
+    assert await service.publish_state() is None  # 没有变化时不推送
+    resync = await service.resync(since=snapshot["data"]["version"])
+    assert [u["data"]["version"] for u in resync] == [version]
+    resync = await service.resync(since=None)
+    assert resync[0]["update_type"] == "snapshot"
+    assert resync[0]["data"]["state"] == client_state
+    await service.cleanup()
+    assert not service.is_active()
+
+
+@pytest.mark.asyncio
+async def test_reconnect_with_from_seq_replays_missed_deltas():
+    hub = StreamingService()
+    service = GameService(npc_count=2, seed=2, hub=hub)
+    await service.initialize(llm_client=MockDeepSeekClient())
+    service.game_state_manager.echo_log = False
+
+    ws = FakeWebSocket()
+    client_id = await service.add_websocket(ws)
+    hub.heartbeat_tasks[client_id].cancel()
+    await hub.broadcaster.drain()
+    seq = ws.sent[0]["data"]["seq"]
+    await service.remove_websocket(client_id)
+
+    service.game_state.fear_points += 7
+    version = await service.publish_state()
+
+    ws2 = FakeWebSocket()
+    client_id = await service.add_websocket(ws2, from_seq=seq)
+    hub.heartbeat_tasks[client_id].cancel()
+    await hub.broadcaster.drain()
+    assert [u["update_type"] for u in ws2.sent] == ["delta"]
+    assert ws2.sent[0]["data"]["version"] == version
+
+    # 序号来自其他进程或已超出日志时发送快照
+    ws3 = FakeWebSocket()
+    client_id = await service.add_websocket(ws3, from_seq=seq + 100)
+    hub.heartbeat_tasks[client_id].cancel()
+    await hub.broadcaster.drain()
+    assert ws3.sent[0]["update_type"] == "snapshot"
+    assert ws3.sent[0]["data"]["seq"] == hub.topic_seq(service.game_id)
+    await service.cleanup()
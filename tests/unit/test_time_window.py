@@ -0,0 +1,55 @@
+"""
+测试预解析的时间窗口
+"""
+from src.models.rule import (
+    INVALID_TIME_WINDOW,
+    EffectType,
+    Rule,
+    RuleEffect,
+    TimeWindow,
+    TriggerCondition,
+    parse_time_window,
+    time_in_window,
+)
+
+
+def test_parse_time_window():
+    assert parse_time_window(None) is None
+    assert parse_time_window({"from": "09:00", "to": "12:30"}) == TimeWindow(540, 750)
+    assert parse_time_window({"from": "9:00", "to": "12:00"}) == INVALID_TIME_WINDOW
+    assert parse_time_window({"from": "09:00", "to": "24:00"}) == INVALID_TIME_WINDOW
+
+
+def test_window_containment_with_midnight_wraparound():
+    night = parse_time_window({"from": "22:00", "to": "06:00"})
+
+    assert time_in_window("23:30", night)
+    assert time_in_window("06:00", night)
+    assert not time_in_window("06:01", night)
+    assert not time_in_window("morning", night)
+    assert not time_in_window("12:00", INVALID_TIME_WINDOW)
+
+
+def test_trigger_condition_reparses_on_assignment():
+    trigger = TriggerCondition(
+        action="look_mirror", time_range={"from": "00:00", "to": "04:00"}
+    )
+    assert trigger.time_window == TimeWindow(0, 240)
+
+    trigger.time_range = {"from": "23:00", "to": "01:00"}
+    assert trigger.time_window == TimeWindow(1380, 60)
+
+
+def test_rule_can_trigger_uses_time_window():
+    rule = Rule(
+        id="midnight_mirror",
+        name="午夜照镜",
+        trigger=TriggerCondition(
+            action="look_mirror", time_range={"from": "23:00", "to": "02:00"}
+        ),
+        effect=RuleEffect(type=EffectType.FEAR_GAIN, fear_gain=10),
+    )
+
+    assert rule.can_trigger({"current_time": "01:30"})
+    assert not rule.can_trigger({"current_time": "12:00"})
+    assert not rule.can_trigger({"current_time": "1:30"})
@@ -6,7 +6,6 @@ from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import Dict, List, Optional
-import asyncio
 import logging
 from datetime import datetime
 import sys
@@ -28,6 +27,12 @@ from src.models.map import MapManager
 from src.core.npc_behavior import NPCBehavior
 from src.core.rule_executor import RuleExecutor
 from src.utils.logger import setup_logger
+from src.utils.config import load_config
+from src.utils.io_executor import io_executor
+from src.api.scheduler import llm_scheduler
+from src.api.http_pool import http_pool
+from src.api.deepseek_http_client import DEFAULT_CACHE_DIR, CacheSweeper
+from src.api.response_store import open_store
 
 # 导入数据模型
 from .models import (
@@ -49,15 +54,28 @@ logger = setup_logger("api")
 # 全局会话管理器
 session_manager = SessionManager()
 
+# 定期清理过期的API响应缓存文件
+cache_sweeper = CacheSweeper(DEFAULT_CACHE_DIR)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     logger.info("Starting RuleK Web API...")
     # 启动时的初始化
+    config = load_config()
+    llm_scheduler.configure(**config.get_scheduler_config())
+    http_pool.configure(**config.get_http_pool_config())
+    # 在I/O线程中打开响应缓存存储，避免首个请求在事件循环中打开数据库
+    await io_executor.run(open_store, DEFAULT_CACHE_DIR)
+    cache_sweeper.start()
     yield
     # 关闭时的清理
     logger.info("Shutting down RuleK Web API...")
+    await cache_sweeper.stop()
     await session_manager.cleanup()
+    await http_pool.aclose()
+    # 等待排队的日志追加写完
+    io_executor.flush()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -308,7 +326,7 @@ async def initialize_ai(game_id: str):
 
 @app.websocket("/ws/{game_id}")
 async def websocket_endpoint(websocket: WebSocket, game_id: str):
-    """WebSocket连接处理 - 使用StreamingService"""
+    """WebSocket连接处理 - 连接由StreamingService统一管理，客户端订阅本局主题"""
     # 验证游戏是否存在
     game_service = session_manager.get_game(game_id)
     if not game_service:
@@ -322,8 +340,18 @@ async def websocket_endpoint(websocket: WebSocket, game_id: str):
     # 通过StreamingService建立连接
     await streaming_service.connect(websocket, client_id)
     
-    # 将客户端ID关联到游戏
-    game_service.add_websocket_client(client_id)
+    async def send_updates(updates):
+        for update in updates:
+            await streaming_service.send_message(client_id, game_service.game_message(update))
+    
+    def parse_seq(value):
+        try:
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
+    
+    # 加入本局：重连时带 ?from_seq=N 只补发之后的主题消息，否则发送完整快照
+    await game_service.join(client_id, parse_seq(websocket.query_params.get("from_seq")))
     
     try:
         while True:
@@ -349,15 +377,22 @@ async def websocket_endpoint(websocket: WebSocket, game_id: str):
                         "data": result
                     })
                     
+                elif msg_type == "resume":
+                    # 客户端发现主题序号不连续时，补发缺失的消息或发送快照
+                    await game_service.catch_up(client_id, parse_seq(data.get("from_seq")))
+                    
+                elif msg_type == "resync":
+                    # 客户端发现版本号不连续时，按已持有的版本号补发增量或快照
+                    await send_updates(await game_service.resync(data.get("since")))
+                    
                 elif msg_type == "turn":
                     # 处理回合推进
                     result = await game_service.advance_turn()
                     
-                    # 流式发送回合结果
+                    # 逐条发送回合事件（对话已在生成时流式推送）
                     async def generate_turn_chunks():
-                        for event in result.get("events", []):
-                            yield json.dumps(event)
-                            await asyncio.sleep(0.1)  # 控制流速
+                        for event in result.events:
+                            yield json.dumps(event, ensure_ascii=False, default=str)
                     
                     await streaming_service.send_stream(client_id, generate_turn_chunks())
                     
@@ -382,7 +417,15 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "active_games": session_manager.get_active_game_count()
+        "active_games": session_manager.get_active_game_count(),
+        "websocket": {
+            key: value
+            for key, value in streaming_service.get_metrics().items()
+            if key != "per_connection"
+        },
+        "llm": llm_scheduler.metrics(),
+        "http": http_pool.metrics(),
+        "io": io_executor.metrics(),
     }
 
 if __name__ == "__main__":
@@ -404,13 +447,10 @@ async def get_rule_templates():
     try:
         # 加载规则模板
         template_file = Path("data/rule_templates.json")
-        if template_file.exists():
-            import json
-            with open(template_file, 'r', encoding='utf-8') as f:
-                templates = json.load(f)
-            return {"success": True, "templates": templates}
-        else:
-            return {"success": True, "templates": []}
+        templates = await io_executor.read_json(template_file)
+        return {"success": True, "templates": templates}
+    except FileNotFoundError:
+        return {"success": True, "templates": []}
     except Exception as e:
         logger.error(f"Failed to load rule templates: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -166,7 +166,9 @@ class WebSocketMessage(BaseModel):
 
 class GameUpdate(BaseModel):
     """游戏更新推送"""
-    update_type: Literal["state", "event", "npc", "rule", "dialogue"]
+    update_type: Literal[
+        "state", "snapshot", "delta", "event", "npc", "rule", "dialogue", "ai_turn"
+    ]
     game_id: str
     data: Dict[str, Any]
     timestamp: datetime = Field(default_factory=datetime.now)
@@ -0,0 +1,222 @@
+"""
+WebSocket广播
+消息只序列化一次，放入每个连接各自的有界发送队列，由独立的写任务发送；
+慢速连接按策略丢弃消息或断开，不会拖慢其他连接
+"""
+import asyncio
+import json
+import logging
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 每个连接默认最多积压的消息数
+DEFAULT_QUEUE_SIZE = 100
+
+
+class SlowConsumerPolicy(str, Enum):
+    """发送队列已满时的处理策略"""
+
+    DROP_OLDEST = "drop_oldest"  # 丢弃最早的消息，保留最新状态
+    DROP_NEWEST = "drop_newest"  # 丢弃新消息
+    DISCONNECT = "disconnect"  # 断开连接，由客户端重连后重新同步
+
+
+def encode_message(message: Any) -> str:
+    """序列化为发送用的JSON文本（与 send_json 的格式一致）"""
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+class ConnectionWriter:
+    """单个连接的发送队列和写任务
+
+    Args:
+        connection_id: 连接ID
+        websocket: 需要提供 send_text/close 的WebSocket对象
+        max_queue: 队列容量
+        policy: 队列满时的处理策略
+        on_close: 连接因发送失败或慢速被断开时的回调
+    """
+
+    def __init__(
+        self,
+        connection_id: str,
+        websocket: Any,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DISCONNECT,
+        on_close: Optional[Callable[[str], None]] = None,
+    ):
+        self.connection_id = connection_id
+        self.websocket = websocket
+        self.policy = policy
+        self.on_close = on_close
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self._sending = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    @property
+    def depth(self) -> int:
+        return self.queue.qsize()
+
+    def enqueue(self, payload: str) -> bool:
+        """非阻塞地放入一条已序列化的消息，返回是否入队"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            if self.policy is SlowConsumerPolicy.DISCONNECT:
+                logger.warning(f"Slow consumer disconnected: {self.connection_id}")
+                self._close()
+                return False
+            self.dropped += 1
+            if self.policy is SlowConsumerPolicy.DROP_NEWEST:
+                return False
+            self.queue.get_nowait()
+            self.queue.put_nowait(payload)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        return True
+
+    async def _run(self) -> None:
+        while True:
+            payload = await self.queue.get()
+            self._sending = True
+            try:
+                await self.websocket.send_text(payload)
+            except Exception as e:
+                logger.error(f"Failed to send to {self.connection_id}: {e}")
+                self._close()
+                return
+            finally:
+                self._sending = False
+            self.sent += 1
+
+    async def drain(self) -> None:
+        """等待队列中的消息全部发送（主要用于测试和关闭前）"""
+        while not self.closed and (self._sending or self.queue.qsize()):
+            await asyncio.sleep(0)
+
+    def _close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+        if self.on_close is not None:
+            self.on_close(self.connection_id)
+        asyncio.ensure_future(self._close_socket())
+
+    async def _close_socket(self) -> None:
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    async def close(self, close_socket: bool = False) -> None:
+        """主动关闭：停止写任务（不触发 on_close 回调）
+
+        Args:
+            close_socket: 是否同时关闭底层WebSocket
+        """
+        self.closed = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if close_socket:
+            await self._close_socket()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
+
+
+class Broadcaster:
+    """一组连接的广播器：每条消息只序列化一次，再分发到各连接的发送队列"""
+
+    def __init__(
+        self,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        policy: SlowConsumerPolicy = SlowConsumerPolicy.DISCONNECT,
+    ):
+        self.max_queue = max_queue
+        self.policy = policy
+        self.writers: Dict[str, ConnectionWriter] = {}
+        self.disconnected_slow = 0  # 因慢速或发送失败被断开的连接数
+
+    def __len__(self) -> int:
+        return len(self.writers)
+
+    def __contains__(self, connection_id: object) -> bool:
+        return connection_id in self.writers
+
+    def add(self, connection_id: str, websocket: Any) -> ConnectionWriter:
+        """登记连接并启动写任务（需要在事件循环中调用）"""
+        writer = ConnectionWriter(
+            connection_id,
+            websocket,
+            max_queue=self.max_queue,
+            policy=self.policy,
+            on_close=self._on_writer_closed,
+        )
+        self.writers[connection_id] = writer
+        writer.start()
+        return writer
+
+    async def remove(self, connection_id: str) -> None:
+        writer = self.writers.pop(connection_id, None)
+        if writer is not None:
+            await writer.close()
+
+    def _on_writer_closed(self, connection_id: str) -> None:
+        if self.writers.pop(connection_id, None) is not None:
+            self.disconnected_slow += 1
+
+    def send(self, connection_id: str, message: Any) -> bool:
+        """发送给单个连接"""
+        writer = self.writers.get(connection_id)
+        if writer is None:
+            return False
+        payload = message if isinstance(message, str) else encode_message(message)
+        return writer.enqueue(payload)
+
+    def broadcast(self, message: Any) -> int:
+        """序列化一次后放入所有连接的队列，返回成功入队的连接数"""
+        if not self.writers:
+            return 0
+        payload = message if isinstance(message, str) else encode_message(message)
+        return sum(writer.enqueue(payload) for writer in list(self.writers.values()))
+
+    async def drain(self) -> None:
+        for writer in list(self.writers.values()):
+            await writer.drain()
+
+    async def close(self) -> None:
+        """关闭所有连接"""
+        writers, self.writers = self.writers, {}
+        for writer in writers.values():
+            await writer.close(close_socket=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        """队列深度等指标"""
+        connections = {cid: w.metrics() for cid, w in self.writers.items()}
+        return {
+            "connections": len(connections),
+            "total_depth": sum(m["depth"] for m in connections.values()),
+            "max_depth": max((m["max_depth"] for m in connections.values()), default=0),
+            "dropped": sum(m["dropped"] for m in connections.values()),
+            "disconnected_slow": self.disconnected_slow,
+            "per_connection": connections,
+        }
@@ -2,14 +2,13 @@
 游戏服务层
 封装游戏逻辑，提供API接口
 """
-import asyncio
-from typing import Dict, List, Optional, Set, Any
+import copy
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from datetime import datetime
 from fastapi import WebSocket
 import json
 import uuid
 import logging
-import random
 from pathlib import Path
 import httpx
 
@@ -18,24 +17,64 @@ from src.ai.turn_pipeline import AITurnPipeline
 from src.models import NPC, NPCManager, Rule, RuleManager, MapManager
 from src.core.narrator import Narrator
 from src.core.dialogue_system import DialogueSystem
+from src.core.llm_fanout import LLMTaskGraph
 
 from src.core.npc_behavior import NPCBehavior
 from src.core.rule_executor import RuleExecutor
+from src.core.state_delta import REMOVE, DeltaLog, DirtyTracker, PatchOp, diff_ops
+
+from .streaming_service import StreamingService, streaming_service
 from src.api.llm_client import LLMClient
 from src.api.deepseek_client import DeepSeekClient
 from src.api.deepseek_http_client import APIConfig, DeepSeekHTTPClient
+from src.api.scheduler import request_scope
 from src.utils.config import load_config
+from src.utils.io_executor import io_executor
 
 from ..models import GameStateResponse, NPCStatus, RuleInfo, TurnResult, GameUpdate
 
 logger = logging.getLogger(__name__)
 
+# GameState 字段 -> 状态文档中的键
+STATE_DOC_FIELDS = {
+    "current_turn": "current_turn",
+    "fear_points": "fear_points",
+    "phase": "phase",
+    "mode": "mode",
+    "time_of_day": "time_of_day",
+    "active_rules": "active_rules",
+    "total_fear_gained": "total_fear_gained",
+    "npcs_died": "npcs_died",
+}
+
+# NPC字段 -> 状态文档中受影响的 NPCStatus 键
+NPC_DOC_FIELDS = {
+    "name": ("name",),
+    "hp": ("hp", "is_alive"),
+    "sanity": ("sanity",),
+    "fear": ("fear",),
+    "location": ("location",),
+    "status_effects": ("status_effects",),
+}
+
 
 class GameService:
     """游戏服务类"""
     
-    def __init__(self, game_id: str = None, difficulty: str = "normal", npc_count: int = 4):
-        """初始化游戏服务"""
+    def __init__(
+        self,
+        game_id: str = None,
+        difficulty: str = "normal",
+        npc_count: int = 4,
+        seed: Optional[int] = None,
+        hub: Optional[StreamingService] = None,
+    ):
+        """初始化游戏服务
+
+        Args:
+            seed: 随机数种子，相同种子的对局可以复现
+            hub: 连接中心，默认使用全局的 streaming_service
+        """
         self.game_id = game_id or f"game_{uuid.uuid4().hex[:8]}"
         self.created_at = datetime.now()
         self.last_accessed = datetime.now()
@@ -43,14 +82,21 @@ class GameService:
         # 游戏配置
         self.difficulty = difficulty
         self.npc_count = npc_count
+        self.seed = seed
         
-        # WebSocket连接管理
-        self.websockets: Dict[str, WebSocket] = {}
-        self._ws_lock = asyncio.Lock()
+        # WebSocket连接管理：连接由连接中心统一管理，
+        # 本局的客户端订阅以游戏ID为名的主题
+        self.hub = hub or streaming_service
         
         # 初始化标志
         self._initialized = False
         
+        # 增量状态推送：客户端持有的状态文档和带版本号的增量历史
+        self.delta_log = DeltaLog()
+        self._state_doc: Optional[Dict[str, Any]] = None
+        self._doc_state: Optional[GameState] = None  # 状态文档对应的游戏状态对象
+        self._synced_rules_version = -1  # 上次同步到GameStateManager时的规则版本
+        
         # AI相关
         self.ai_enabled = False
         self.ai_pipeline = None
@@ -64,7 +110,8 @@ class GameService:
         """异步初始化游戏组件
 
         Args:
-            http_client: 可注入的HTTP客户端
+            http_client: 可注入的HTTP客户端，默认使用进程共享的连接池
+            llm_client: 可注入的LLM客户端
         """
         if self._initialized:
             return
@@ -81,19 +128,26 @@ class GameService:
         game_config = {
             'initial_fear_points': game_cfg.get('initial_fear_points', 1000),
             'ai_enabled': game_cfg.get('ai_enabled', False),
-            'difficulty': self.difficulty
+            'difficulty': self.difficulty,
+            'seed': self.seed
         }
         self.game_state_manager = GameStateManager(save_dir=save_dir, config=game_config)
         self.game_state_manager.new_game(self.game_id)
         self.game_state = self.game_state_manager.state
         
-        # 初始化地图
+        # 从存档恢复随机数状态
+        saved_managers = getattr(self, "_save_data", None) or {}
+        if saved_managers.get("rng"):
+            self.game_state_manager.rng.load_dict(saved_managers["rng"])
+        
+        # 初始化地图（区域的NPC列表由NPC位置索引提供）
         self.map_manager = MapManager()
         self.map_manager.create_default_map()
+        self.game_state_manager.attach_map(self.map_manager)
         
         # 初始化管理器
         self.rule_manager = RuleManager()
-        self.npc_manager = NPCManager()
+        self.npc_manager = NPCManager(rng=self.game_state_manager.rng.npc)
         self.npc_behavior = NPCBehavior(self.game_state_manager)
         self.rule_executor = RuleExecutor(self.game_state_manager)
         
@@ -104,8 +158,12 @@ class GameService:
             cfg = APIConfig()
             http = DeepSeekHTTPClient(cfg, http_client=http_client)
             self.deepseek_client = DeepSeekClient(cfg, http)
-        self.dialogue_system = DialogueSystem(self.deepseek_client)
-        self.narrator = Narrator(self.deepseek_client)
+        self.dialogue_system = DialogueSystem(
+            self.deepseek_client, rng=self.game_state_manager.rng.dialogue
+        )
+        self.narrator = Narrator(
+            self.deepseek_client, rng=self.game_state_manager.rng.narrative
+        )
         
         # 创建NPC
         self._create_npcs()
@@ -126,33 +184,51 @@ class GameService:
             areas = list(self.map_manager.areas.keys())
             npc.location = areas[i % len(areas)]
             
-            # 添加到游戏状态
-            self.game_state.npcs[npc.id] = npc.to_dict()
+            # 添加到游戏状态（以紧凑记录保存，与GameStateManager共享）
+            self.game_state_manager.add_npc(npc.to_dict())
             # Also add to npc_manager tracking
             self.npc_manager.npcs[npc.id] = npc
     
+    def _npc_model(self, record: Dict[str, Any]) -> NPC:
+        """NPC记录的模型视图，只在需要模型接口的地方（如对话）按需构造"""
+        npc = self.npc_manager.get_npc(record["id"])
+        if npc is None:
+            data = record.to_dict() if hasattr(record, "to_dict") else dict(record)
+            npc = NPC.model_validate(data)
+            self.npc_manager.npcs[npc.id] = npc
+        for key in ("hp", "sanity", "fear", "location"):
+            if key in record:
+                setattr(npc, key, record[key])
+        return npc
+    
+    @staticmethod
+    def _npc_status(npc_id: str, npc_data: Dict[str, Any]) -> NPCStatus:
+        """API响应中的NPC状态视图"""
+        return NPCStatus(
+            id=npc_id,
+            name=npc_data.get("name", "Unknown"),
+            hp=npc_data.get("hp", 100),
+            sanity=npc_data.get("sanity", 100),
+            fear=npc_data.get("fear", 0),
+            location=npc_data.get("location", "unknown"),
+            status_effects=npc_data.get("status_effects", []),
+            is_alive=npc_data.get("hp", 100) > 0
+        )
+    
     def update_last_accessed(self):
         """更新最后访问时间"""
         self.last_accessed = datetime.now()
     
     def is_active(self) -> bool:
         """检查游戏是否活跃（有WebSocket连接）"""
-        return len(self.websockets) > 0
+        return bool(self.hub.subscribers(self.game_id))
     
     def get_state_response(self) -> GameStateResponse:
         """获取游戏状态响应"""
-        npcs_status = []
-        for npc_id, npc_data in self.game_state.npcs.items():
-            npcs_status.append(NPCStatus(
-                id=npc_id,
-                name=npc_data.get("name", "Unknown"),
-                hp=npc_data.get("hp", 100),
-                sanity=npc_data.get("sanity", 100),
-                fear=npc_data.get("fear", 0),
-                location=npc_data.get("location", "unknown"),
-                status_effects=npc_data.get("status_effects", []),
-                is_alive=npc_data.get("hp", 100) > 0
-            ))
+        npcs_status = [
+            self._npc_status(npc_id, npc_data)
+            for npc_id, npc_data in self.game_state.npcs.items()
+        ]
         
         return GameStateResponse(
             game_id=self.game_id,
@@ -174,154 +250,70 @@ class GameService:
         
         # 更新回合数
         self.game_state.current_turn += 1
-        events = []
-        fear_gained = 0
-        npcs_affected = []
-        rules_triggered = []
         
-        # 1. 对话阶段（早晚各一次）
+        # 对话阶段（早晚各一次）的参与者在行动前确定，对话生成与行动、
+        # 规则阶段并发进行；叙事依赖两者的事件，最后生成
+        dialogue_npcs = []
         if self.game_state.time_of_day in ["morning", "evening"]:
-            dialogue_events = await self._run_dialogue_phase()
-            events.extend(dialogue_events)
-        
-        # 2. NPC行动阶段
-        for npc_id, npc_data in self.game_state.npcs.items():
-            if npc_data.get("hp", 0) > 0:
-                npc = self.npc_manager.get_npc(npc_id)
-                if not npc:
-                    # Recreate NPC from data if missing
-                    from src.models.npc import NPC, NPCPersonality, NPCMemory
-                    # Prepare data for NPC creation
-                    npc_data_copy = npc_data.copy()
-                    npc_data_copy.pop('id', None)  # Remove id to avoid duplicate
-                    
-                    # Convert personality and memory to objects if they're dicts
-                    if 'personality' in npc_data_copy and isinstance(npc_data_copy['personality'], dict):
-                        npc_data_copy['personality'] = NPCPersonality(**npc_data_copy['personality'])
-                    if 'memory' in npc_data_copy and isinstance(npc_data_copy['memory'], dict):
-                        npc_data_copy['memory'] = NPCMemory(**npc_data_copy['memory'])
-                    
-                    # Create NPC with proper types
-                    npc = NPC(id=npc_id, **npc_data_copy)
-                    self.npc_manager.npcs[npc_id] = npc
-                if npc:
-                    # 确保传递字典格式给decide_action
-                    if hasattr(npc, 'to_dict'):
-                        npc_dict = npc.to_dict()
-                    elif hasattr(npc, 'model_dump'):
-                        npc_dict = npc.model_dump()
-                    elif hasattr(npc, 'dict'):
-                        npc_dict = npc.dict()
-                    elif isinstance(npc, dict):
-                        npc_dict = npc
-                    else:
-                        # 如果是NPC对象，手动构建字典
-                        npc_dict = {
-                            'id': npc_id,
-                            'name': getattr(npc, 'name', npc_data.get('name', 'Unknown')),
-                            'hp': getattr(npc, 'hp', npc_data.get('hp', 100)),
-                            'sanity': getattr(npc, 'sanity', npc_data.get('sanity', 100)),
-                            'fear': getattr(npc, 'fear', npc_data.get('fear', 0)),
-                            'location': getattr(npc, 'location', npc_data.get('location', 'unknown')),
-                            'alive': getattr(npc, 'hp', npc_data.get('hp', 100)) > 0,
-                            'rationality': getattr(npc, 'rationality', 5),
-                            'courage': getattr(npc, 'courage', 5),
-                            'curiosity': getattr(npc, 'curiosity', 5),
-                            'sociability': getattr(npc, 'sociability', 5),
-                            'stamina': getattr(npc, 'stamina', 100),
-                            'suspicion': getattr(npc, 'suspicion', 0)
-                        }
-                    action = self.npc_behavior.decide_action(npc_dict)
-                    if action:
-                        events.append({
-                            "type": "npc_action",
-                            "npc": npc.name if hasattr(npc, 'name') else npc_data.get('name', 'Unknown'),
-                            "action": action.action.value if hasattr(action, 'action') else str(action)
-                        })
-        
-        # 3. 规则判定阶段
-        for rule in self.rule_manager.active_rules:
-            result = self.rule_executor.execute(rule, self.game_state)
-            if result:
-                rules_triggered.append(rule.id)
-                fear_gained += result.get("fear_gain", 0)
-                npcs_affected.extend(result.get("affected_npcs", []))
-                events.append({
-                    "type": "rule_triggered",
-                    "rule": rule.name,
-                    "result": result
-                })
-        
-        # 4. 随机事件
-        random_events = [
-            "窗外传来诡异声响",
-            "远处传来微弱的哭泣声",
-            "突然一阵冷风袭来",
-        ]
-        if random.random() < 0.25:
-            description = random.choice(random_events)
-            event = {"type": "ambient", "description": description}
-            events.append(event)
-            if self.game_state_manager:
-                self.game_state_manager.log(description)
+            dialogue_npcs = self._dialogue_participants()
+        
+        graph = LLMTaskGraph(self.game_state_manager.llm_semaphore)
+        phases = ["actions"]
+        if len(dialogue_npcs) >= 2:
+            graph.add("dialogue", lambda _: self._run_dialogue_phase(dialogue_npcs))
+            phases.insert(0, "dialogue")
+        graph.add("actions", lambda _: self._run_action_phase(), limited=False)
+        graph.add(
+            "narrative",
+            lambda results: self._generate_turn_narrative(self._merge_turn_events(results)),
+            deps=phases,
+        )
+        with request_scope(game_id=self.game_id):
+            results = await graph.run()
         
-        # 5. 生成叙事
-        narrative = None
-        if events:
-            narrative = await self.narrator.generate_narrative(events, self.game_state)
+        events = self._merge_turn_events(results)
+        outcome = results["actions"]
+        narrative = results["narrative"]
         
-        # 更新游戏状态
-        self.game_state.fear_points += fear_gained
-        self.game_state.total_fear_gained += fear_gained
+        # 恐惧点数已由规则执行器计入游戏状态
         
         # 推进时间
         self._advance_time()
         
-        # 广播更新
-        await self.broadcast_update({
-            "update_type": "state",
-            "data": self.get_state_response().model_dump()
-        })
+        # 只推送本回合变化的字段
+        await self.publish_state()
         
         return TurnResult(
             turn=self.game_state.current_turn,
             events=events,
-            fear_gained=fear_gained,
-            npcs_affected=list(set(npcs_affected)),
-            rules_triggered=rules_triggered,
+            fear_gained=outcome["fear_gained"],
+            npcs_affected=list(set(outcome["npcs_affected"])),
+            rules_triggered=outcome["rules_triggered"],
             narrative=narrative
         )
     
-    async def _run_dialogue_phase(self) -> List[Dict]:
+    @staticmethod
+    def _merge_turn_events(results: Dict[str, Any]) -> List[Dict]:
+        """按阶段顺序合并事件（对话在前），与完成先后无关"""
+        return results.get("dialogue", []) + results["actions"]["events"]
+    
+    def _dialogue_participants(self) -> List[NPC]:
+        """对话阶段的参与者：前两个存活的NPC"""
+        self.game_state_manager.sync_npcs_from_state()
+        return [
+            self._npc_model(record)
+            for record in self.game_state_manager.get_active_npcs()[:2]
+        ]
+    
+    async def _run_dialogue_phase(self, npcs: List[NPC]) -> List[Dict]:
         """运行对话阶段"""
         events = []
-        npcs = []
-        for npc_id in self.game_state.npcs:
-            if self.game_state.npcs[npc_id].get("hp", 0) > 0:
-                npc = self.npc_manager.get_npc(npc_id)
-                if not npc:
-                    # Recreate from data if missing
-                    from src.models.npc import NPC, NPCPersonality, NPCMemory
-                    npc_data = self.game_state.npcs[npc_id].copy()
-                    npc_data.pop('id', None)  # Remove id to avoid duplicate
-                    
-                    # Convert personality and memory to objects if they're dicts
-                    if 'personality' in npc_data and isinstance(npc_data['personality'], dict):
-                        npc_data['personality'] = NPCPersonality(**npc_data['personality'])
-                    if 'memory' in npc_data and isinstance(npc_data['memory'], dict):
-                        npc_data['memory'] = NPCMemory(**npc_data['memory'])
-                    
-                    # Create NPC with proper types
-                    npc = NPC(id=npc_id, **npc_data)
-                    self.npc_manager.npcs[npc_id] = npc
-                if npc:
-                    npcs.append(npc)
-        
         if len(npcs) >= 2:
-            # 生成对话
+            # 生成对话，AI输出的增量逐段推送给客户端
             dialogue = await self.dialogue_system.generate_dialogue(
                 npcs[:2],  # 选择前两个NPC对话
-                {"time": self.game_state.time_of_day}
+                {"time": self.game_state.time_of_day},
+                on_delta=self._stream_callback("dialogue"),
             )
             
             events.append({
@@ -333,11 +325,90 @@ class GameService:
             # 广播对话更新
             await self.broadcast_update({
                 "update_type": "dialogue",
-                "data": dialogue
+                "data": {
+                    "participants": [npc.name for npc in npcs[:2]],
+                    "dialogue": dialogue
+                }
             })
         
         return events
     
+    async def _run_action_phase(self) -> Dict[str, Any]:
+        """NPC行动、规则判定和随机事件阶段（不调用LLM）"""
+        events = []
+        fear_gained = 0
+        npcs_affected = []
+        rules_triggered = []
+        action_pairs = []
+        snapshots = []
+        
+        # NPC行动：直接使用共享的NPC记录，不再逐回合重建模型和字典
+        self.game_state_manager.sync_npcs_from_state()
+        for npc in list(self.game_state_manager.get_active_npcs()):
+            action = self.npc_behavior.decide_action(npc)
+            if action:
+                if hasattr(action, 'action'):
+                    action_pairs.append((npc, action.action.value))
+                    snapshots.append(self.rule_executor.snapshot_actor(npc))
+                events.append({
+                    "type": "npc_action",
+                    "npc": npc.get("name", "Unknown"),
+                    "action": action.action.value if hasattr(action, 'action') else str(action)
+                })
+        
+        # 规则判定：按行动时的快照批量检查本回合所有行动
+        self._sync_rules_to_manager()
+        batch = self.rule_executor.check_rules_batch(action_pairs, snapshots=snapshots)
+        for row in range(len(batch)):
+            context = batch.context_for(row)
+            for rule, probability in batch.triggered_for(row):
+                if not self.rule_executor.can_fire(rule, context):
+                    continue
+                if self.rule_executor.rng.random() > probability:
+                    continue
+                result = self.rule_executor.execute_rule(rule, context)
+                rules_triggered.append(rule.id)
+                fear_gained += result.get("fear_gained", 0)
+                npcs_affected.append(context.actor_id)
+                events.append({
+                    "type": "rule_triggered",
+                    "rule": rule.name,
+                    "result": result
+                })
+        
+        # 随机事件
+        random_events = [
+            "窗外传来诡异声响",
+            "远处传来微弱的哭泣声",
+            "突然一阵冷风袭来",
+        ]
+        events_rng = self.game_state_manager.rng.events
+        if events_rng.random() < 0.25:
+            description = events_rng.choice(random_events)
+            event = {"type": "ambient", "description": description}
+            events.append(event)
+            if self.game_state_manager:
+                self.game_state_manager.log(description)
+        
+        return {
+            "events": events,
+            "fear_gained": fear_gained,
+            "npcs_affected": npcs_affected,
+            "rules_triggered": rules_triggered,
+        }
+    
+    async def _generate_turn_narrative(self, events: List[Dict]) -> Optional[str]:
+        """根据本回合事件生成叙事"""
+        if not events:
+            return None
+        survivors = sum(1 for npc in self.game_state.npcs.values() if npc.get("hp", 100) > 0)
+        on_delta = self._stream_callback("narrative")
+        narrative = await self.narrator.generate_narrative(
+            events, self.game_state, survivor_count=survivors, on_delta=on_delta
+        )
+        await on_delta({"done": True})
+        return narrative
+    
     def _advance_time(self):
         """推进游戏时间"""
         time_sequence = ["morning", "afternoon", "evening", "night"]
@@ -429,14 +500,21 @@ class GameService:
         # 扣除积分
         self.game_state.fear_points -= rule_data["cost"]
         
-        # 广播更新
+        # 广播规则摘要，积分和规则数量的变化随增量推送
         await self.broadcast_update({
             "update_type": "rule",
             "data": {
                 "action": "created",
-                "rule": rule.model_dump()
+                "rule": {
+                    "id": rule.id,
+                    "name": rule.name,
+                    "description": rule.description,
+                    "level": rule.level,
+                    "cost": rule.base_cost,
+                }
             }
         })
+        await self.publish_state()
         
         return rule.id
     
@@ -458,24 +536,14 @@ class GameService:
     
     def get_npcs(self) -> List[NPCStatus]:
         """获取NPC列表"""
-        npcs = []
-        for npc_id, npc_data in self.game_state.npcs.items():
-            npcs.append(NPCStatus(
-                id=npc_id,
-                name=npc_data.get("name", "Unknown"),
-                hp=npc_data.get("hp", 100),
-                sanity=npc_data.get("sanity", 100),
-                fear=npc_data.get("fear", 0),
-                location=npc_data.get("location", "unknown"),
-                status_effects=npc_data.get("status_effects", []),
-                is_alive=npc_data.get("hp", 100) > 0
-            ))
-        return npcs
+        return [
+            self._npc_status(npc_id, npc_data)
+            for npc_id, npc_data in self.game_state.npcs.items()
+        ]
     
     async def save_game(self) -> str:
         """保存游戏"""
         save_dir = Path("data/saves")
-        save_dir.mkdir(exist_ok=True)
         
         filename = f"save_{self.game_id}_{datetime.now():%Y%m%d_%H%M%S}.json"
         save_path = save_dir / filename
@@ -490,10 +558,14 @@ class GameService:
             "managers": {
                 "rules": [],
                 "npcs": {},
-                "map": {}
+                "map": {},
+                "rng": self.game_state_manager.rng.to_dict()
             }
         }
         
+        # 存档保存完整历史，已写盘的旧事件在I/O线程中读回
+        save_data["game_state"]["events_history"] = await self.game_state.events_history.ahistory()
+        
         # 安全序列化规则
         for rule in self.rule_manager.active_rules:
             try:
@@ -585,15 +657,17 @@ class GameService:
         except Exception:
             save_data["managers"]["map"] = {}
         
-        with open(save_path, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+        # 在事件循环中序列化（状态快照一致），写盘交给I/O线程
+        await io_executor.write_text(
+            save_path, json.dumps(save_data, ensure_ascii=False, indent=2)
+        )
         
         logger.info(f"Game saved: {filename}")
         return filename
     
     @classmethod
     def load_from_file(cls, filename: str) -> "GameService":
-        """从文件加载游戏"""
+        """从文件加载游戏（读取文件，异步代码中应在I/O线程调用）"""
         save_path = Path("data/saves") / filename
         if not save_path.exists():
             raise FileNotFoundError(f"Save file not found: {filename}")
@@ -613,46 +687,226 @@ class GameService:
         
         return game_service
     
+    # ==================== 增量状态推送 ====================
+    
+    def _state_document(self) -> Dict[str, Any]:
+        """完整状态文档：GameStateResponse 的JSON形式，NPC按ID索引便于按路径更新"""
+        document = self.get_state_response().model_dump(mode="json")
+        document["npcs"] = {npc["id"]: npc for npc in document["npcs"]}
+        return document
+    
+    def _npc_document(self, npc_id: str, npc: Dict[str, Any]) -> Dict[str, Any]:
+        return self._npc_status(npc_id, npc).model_dump(mode="json")
+    
+    def _dirty_updates(
+        self, tracker: DirtyTracker
+    ) -> Iterator[Tuple[Tuple[Any, ...], Any]]:
+        """根据脏字段生成 (路径, 新值)，只为被修改的NPC构造状态视图"""
+        if tracker.fields & STATE_DOC_FIELDS.keys():
+            summary = self._state_document_summary()
+            for name in tracker.fields & STATE_DOC_FIELDS.keys():
+                key = STATE_DOC_FIELDS[name]
+                yield (key,), summary[key]
+        
+        npcs = self.game_state.npcs
+        known = self._state_doc["npcs"] if self._state_doc else {}
+        for npc_id in tracker.removed:
+            yield ("npcs", npc_id), REMOVE
+        for npc_id in tracker.added | tracker.npcs.keys():
+            npc = npcs.get(npc_id)
+            if npc is None:
+                continue
+            if npc_id not in known:
+                yield ("npcs", npc_id), self._npc_document(npc_id, npc)
+                continue
+            keys = {
+                doc_key
+                for field_name in tracker.npcs.get(npc_id, ())
+                for doc_key in NPC_DOC_FIELDS.get(field_name, ())
+            }
+            if keys:
+                document = self._npc_document(npc_id, npc)
+                for doc_key in keys:
+                    yield ("npcs", npc_id, doc_key), document[doc_key]
+    
+    def _state_document_summary(self) -> Dict[str, Any]:
+        """状态文档的顶层字段（不含NPC）"""
+        return {
+            "current_turn": self.game_state.current_turn,
+            "fear_points": self.game_state.fear_points,
+            "phase": self.game_state.phase.value,
+            "mode": self.game_state.mode.value,
+            "time_of_day": self.game_state.time_of_day,
+            "active_rules": len(self.rule_manager.active_rules),
+            "total_fear_gained": self.game_state.total_fear_gained,
+            "npcs_died": self.game_state.npcs_died,
+        }
+    
+    @staticmethod
+    def _full_updates(
+        document: Dict[str, Any], previous: Dict[str, Any]
+    ) -> Iterator[Tuple[Tuple[Any, ...], Any]]:
+        """整份文档对比时的 (路径, 新值)"""
+        for key, value in document.items():
+            if key != "npcs":
+                yield (key,), value
+        for npc_id in previous.get("npcs", {}).keys() - document["npcs"].keys():
+            yield ("npcs", npc_id), REMOVE
+        for npc_id, npc in document["npcs"].items():
+            yield ("npcs", npc_id), npc
+    
+    def collect_state_ops(self, full: bool = False) -> List[PatchOp]:
+        """收集自上次推送以来的状态变化并清空脏字段
+        
+        还没有客户端持有状态文档时不生成增量；full 为 True、NPC字典被整体
+        替换或游戏状态对象被替换时对比整份文档，用于兜底未被跟踪的修改。
+        """
+        if self._state_doc is None:
+            self.game_state.dirty.clear()
+            return []
+        self._sync_rules_to_manager()
+        tracker = self.game_state.dirty
+        if full or "npcs" in tracker.fields or self._doc_state is not self.game_state:
+            updates = list(self._full_updates(self._state_document(), self._state_doc))
+        else:
+            updates = list(self._dirty_updates(tracker))
+        tracker.clear()
+        self._doc_state = self.game_state
+        return diff_ops(self._state_doc, updates)
+    
+    async def publish_state(self, full: bool = False) -> Optional[int]:
+        """把状态变化作为带版本号的增量推送给所有连接，没有变化时不推送
+        
+        Returns:
+            新的版本号，没有推送时返回 None
+        """
+        ops = self.collect_state_ops(full)
+        if not ops:
+            return None
+        version = self.delta_log.append(ops)
+        await self.broadcast_update({
+            "update_type": "delta",
+            "data": {"version": version, "ops": ops}
+        })
+        return version
+    
+    async def state_snapshot(self) -> Dict[str, Any]:
+        """完整状态快照（连接建立或客户端请求重新同步时发送）
+        
+        生成快照前先对比整份文档，把未被跟踪的修改作为增量推送给其他连接，
+        保证所有客户端看到同一个版本序列。
+        """
+        if self._state_doc is None:
+            self._state_doc = self._state_document()
+            self._doc_state = self.game_state
+            self.game_state.dirty.clear()
+        else:
+            await self.publish_state(full=True)
+        return {
+            "version": self.delta_log.version,
+            "state": copy.deepcopy(self._state_doc),
+        }
+    
+    async def resync(self, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按客户端已持有的版本号补发增量，无法补齐时返回完整快照
+        
+        Args:
+            since: 客户端已应用的最后一个版本号，None 表示需要完整快照
+        
+        Returns:
+            待发送的更新列表（update_type 为 delta 或 snapshot）
+        """
+        if since is not None:
+            await self.publish_state()
+            entries = self.delta_log.since(since)
+            if entries is not None:
+                return [
+                    {"update_type": "delta", "data": {"version": version, "ops": ops}}
+                    for version, ops in entries
+                ]
+        return [{"update_type": "snapshot", "data": await self.state_snapshot()}]
+    
     # ==================== WebSocket管理 ====================
     
-    async def add_websocket(self, websocket: WebSocket) -> str:
-        """添加WebSocket连接"""
-        connection_id = str(uuid.uuid4())
-        async with self._ws_lock:
-            self.websockets[connection_id] = websocket
-        logger.info(f"WebSocket connected: {connection_id}")
-        return connection_id
-    
-    async def remove_websocket(self, connection_id: str):
-        """移除WebSocket连接"""
-        async with self._ws_lock:
-            if connection_id in self.websockets:
-                del self.websockets[connection_id]
-        logger.info(f"WebSocket disconnected: {connection_id}")
+    def add_websocket_client(self, client_id: str) -> None:
+        """已连接到连接中心的客户端订阅本局的更新"""
+        self.hub.subscribe(client_id, self.game_id)
+        logger.info(f"WebSocket client joined {self.game_id}: {client_id}")
     
-    async def broadcast_update(self, update: Dict):
-        """广播更新给所有连接的客户端"""
-        if not self.websockets:
-            return
+    def remove_websocket_client(self, client_id: str) -> None:
+        """客户端取消订阅本局的更新"""
+        self.hub.unsubscribe(client_id, self.game_id)
+    
+    async def join(self, client_id: str, from_seq: Optional[int] = None) -> bool:
+        """已连接的客户端加入本局
+        
+        带着上次收到的主题序号重连时，只补发之后错过的消息；没有序号或
+        主题日志中已无法补齐时，发送带当前主题序号的完整状态快照。
         
-        message = GameUpdate(
+        Returns:
+            是否通过补发完成同步（False 表示发送了快照）
+        """
+        snapshot = None
+        if from_seq is None or not self.hub.can_resume(client_id, self.game_id, from_seq):
+            snapshot = await self.state_snapshot()
+        # 订阅和补发之间没有 await，补发的消息与之后的新消息不会交错
+        self.add_websocket_client(client_id)
+        if snapshot is None:
+            return self.hub.resume(client_id, self.game_id, from_seq)
+        await self._send_snapshot(client_id, snapshot)
+        return False
+    
+    async def catch_up(self, client_id: str, from_seq: Optional[int]) -> bool:
+        """客户端发现主题序号不连续时补发缺失的消息，无法补齐时发送快照"""
+        if from_seq is not None and self.hub.resume(client_id, self.game_id, from_seq):
+            return True
+        await self._send_snapshot(client_id, await self.state_snapshot())
+        return False
+    
+    async def _send_snapshot(self, client_id: str, snapshot: Dict[str, Any]) -> None:
+        # 快照附带主题序号，客户端忽略序号不大于它的主题消息
+        data = dict(snapshot, seq=self.hub.topic_seq(self.game_id))
+        await self.hub.send_message(
+            client_id, self.game_message({"update_type": "snapshot", "data": data})
+        )
+    
+    async def add_websocket(self, websocket: WebSocket, from_seq: Optional[int] = None) -> str:
+        """建立WebSocket连接、加入本局，并补发消息或发送完整状态快照"""
+        client_id = f"{self.game_id}_{uuid.uuid4().hex[:8]}"
+        await self.hub.connect(websocket, client_id)
+        await self.join(client_id, from_seq)
+        return client_id
+    
+    def update_message(self, update: Dict) -> Dict[str, Any]:
+        """构造可直接发送的JSON消息"""
+        return GameUpdate(
             update_type=update["update_type"],
             game_id=self.game_id,
             data=update.get("data", {})
-        )
-        
-        disconnected = []
-        async with self._ws_lock:
-            for conn_id, ws in self.websockets.items():
-                try:
-                    await ws.send_json(message.model_dump())
-                except Exception as e:
-                    logger.error(f"Failed to send to {conn_id}: {e}")
-                    disconnected.append(conn_id)
+        ).model_dump(mode="json")
+    
+    def game_message(self, update: Dict) -> Dict[str, Any]:
+        """包装为连接中心的 game_update 消息"""
+        return {"type": "game_update", "data": self.update_message(update)}
+    
+    async def remove_websocket(self, client_id: str):
+        """断开WebSocket连接"""
+        self.remove_websocket_client(client_id)
+        await self.hub.disconnect(client_id)
+    
+    async def broadcast_update(self, update: Dict):
+        """广播更新给本局的所有客户端
         
-        # 清理断开的连接
-        for conn_id in disconnected:
-            await self.remove_websocket(conn_id)
+        更新只路由一次：由连接中心序列化一次、记录到主题日志后放入
+        各订阅者的发送队列，不等待发送完成。
+        """
+        if not self.hub.is_open(self.game_id):
+            return
+        await self.hub.publish(self.game_id, self.game_message(update))
+    
+    def connection_metrics(self) -> Dict[str, Any]:
+        """本局连接和发送队列指标"""
+        return self.hub.get_metrics(self.game_id)
     
     async def handle_action(self, action_data: Dict) -> Dict:
         """处理客户端动作"""
@@ -671,14 +925,8 @@ class GameService:
     
     async def cleanup(self):
         """清理资源"""
-        # 关闭所有WebSocket连接
-        async with self._ws_lock:
-            for ws in self.websockets.values():
-                try:
-                    await ws.close()
-                except:
-                    pass
-            self.websockets.clear()
+        # 关闭本局的所有WebSocket连接
+        await self.hub.close_topic(self.game_id)
         
         logger.info(f"Game service cleaned up: {self.game_id}")
     
@@ -696,8 +944,8 @@ class GameService:
                 return False
             
             # 同步游戏状态
-            self.game_state_manager.rules = self.rule_manager.active_rules
-            self.game_state_manager.npcs = list(self.npc_manager.npcs.values())
+            self._sync_rules_to_manager()
+            self.game_state_manager.sync_npcs_from_state()
             
             # 初始化AI管线
             self.ai_pipeline = AITurnPipeline(self.game_state_manager, self.deepseek_client)
@@ -728,8 +976,12 @@ class GameService:
             # 同步最新状态
             self._sync_state_to_manager()
             
-            # 执行AI回合
-            plan = await self.ai_pipeline.run_turn_ai()
+            # 执行AI回合，对话边生成边推送
+            with request_scope(game_id=self.game_id):
+                plan = await self.ai_pipeline.run_turn_ai(
+                    force_dialogue=force_dialogue,
+                    on_dialogue=self._stream_callback("dialogue"),
+                )
             
             # 同步状态回游戏
             self._sync_state_from_manager()
@@ -763,11 +1015,12 @@ class GameService:
                 atmosphere=self.game_state.time_of_day
             )
             
-            # 广播AI生成的内容
+            # 广播AI生成的内容和状态变化
             await self.broadcast_update({
                 "update_type": "ai_turn",
                 "data": response.model_dump()
             })
+            await self.publish_state()
             
             return response.model_dump()
             
@@ -781,7 +1034,8 @@ class GameService:
             raise ValueError("AI not initialized")
         
         try:
-            result = await self.ai_pipeline.evaluate_player_rule(rule_description)
+            with request_scope(game_id=self.game_id):
+                result = await self.ai_pipeline.evaluate_player_rule(rule_description)
             
             from ..models import AIRuleEvaluationResponse
             response = AIRuleEvaluationResponse(
@@ -806,7 +1060,12 @@ class GameService:
             raise ValueError("AI not initialized")
         
         try:
-            narrative = await self.ai_pipeline.generate_turn_narrative()
+            on_delta = self._stream_callback("narrative")
+            with request_scope(game_id=self.game_id):
+                narrative = await self.ai_pipeline.generate_turn_narrative(
+                    include_hidden, on_delta=on_delta
+                )
+            await on_delta({"done": True})
             
             # 如果不包含隐藏事件，过滤掉某些内容
             if not include_hidden:
@@ -819,6 +1078,29 @@ class GameService:
             logger.error(f"Narrative generation failed: {e}")
             raise
     
+    def _stream_callback(self, stream: str):
+        """生成把AI输出增量推送给本局客户端的回调
+        
+        增量以 stream_chunk 消息发送，不写入主题日志；没有客户端时不构造消息。
+        """
+        stream_id = f"{stream}_{uuid.uuid4().hex[:8]}"
+        
+        async def on_chunk(chunk: Dict[str, Any]) -> None:
+            if not self.hub.subscribers(self.game_id):
+                return
+            await self.hub.publish_transient(self.game_id, {
+                "type": "stream_chunk",
+                "data": {
+                    "stream": stream,
+                    "stream_id": stream_id,
+                    "speaker": chunk.get("speaker"),
+                    "content": chunk.get("delta", ""),
+                    "is_final": chunk.get("done", False),
+                }
+            })
+        
+        return on_chunk
+    
     def _sync_state_to_manager(self):
         """同步游戏状态到GameStateManager"""
         if not self.game_state_manager:
@@ -828,42 +1110,31 @@ class GameService:
         self.game_state_manager.state = self.game_state
         
         # 同步规则
-        self.game_state_manager.rules = self.rule_manager.active_rules
-        
-        # 同步NPC（转换格式）
-        npcs = []
-        for npc_id, npc_data in self.game_state.npcs.items():
-            npc_dict = {
-                'id': npc_id,
-                'name': npc_data.get('name', 'Unknown'),
-                'hp': npc_data.get('hp', 100),
-                'sanity': npc_data.get('sanity', 100),
-                'fear': npc_data.get('fear', 0),
-                'location': npc_data.get('location', 'unknown'),
-                'traits': npc_data.get('traits', []),
-                'status': npc_data.get('status', 'normal'),
-                'is_alive': npc_data.get('hp', 100) > 0
-            }
-            npcs.append(npc_dict)
-        self.game_state_manager.npcs = npcs
+        self._sync_rules_to_manager()
+        
+        # 同步NPC：管理器与游戏状态共享同一批NPC记录，只在不一致时重建
+        self.game_state_manager.sync_npcs_from_state()
+    
+    def _sync_rules_to_manager(self):
+        """同步规则到GameStateManager，供规则执行器使用"""
+        if not self.game_state_manager:
+            return
+        
+        active_rules = self.rule_manager.active_rules
+        if self.game_state_manager.rules is not active_rules:
+            self.game_state_manager.rules = active_rules
+        elif self._synced_rules_version != self.rule_manager.version:
+            # 共享的规则列表被就地增删（可能长度不变），让规则索引重建
+            self.game_state_manager.mark_rules_changed()
+        self._synced_rules_version = self.rule_manager.version
+        active_ids = [rule.id for rule in active_rules]
+        if self.game_state.active_rules != active_ids:
+            self.game_state.active_rules = active_ids
     
     def _sync_state_from_manager(self):
         """从GameStateManager同步状态回游戏"""
         if not self.game_state_manager:
             return
         
-        # 同步事件历史
+        # 同步事件历史；NPC记录是共享的，状态变化无需逐个回写
         self.game_state = self.game_state_manager.state
-        
-        # 同步NPC状态变化
-        for npc in self.game_state_manager.npcs:
-            if isinstance(npc, dict):
-                npc_id = npc.get('id')
-                if npc_id and npc_id in self.game_state.npcs:
-                    self.game_state.npcs[npc_id].update({
-                        'hp': npc.get('hp', 100),
-                        'sanity': npc.get('sanity', 100),
-                        'fear': npc.get('fear', 0),
-                        'location': npc.get('location', 'unknown'),
-                        'status': npc.get('status', 'normal')
-                    })
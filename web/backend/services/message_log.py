@@ -0,0 +1,46 @@
+"""
+主题消息日志
+每个游戏主题一份只追加的消息日志，序号单调递增；保存已序列化的消息文本，
+断线重连的客户端按已收到的最后序号补发缺失的消息，无需重新序列化
+"""
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+# 每个主题默认保留的消息数，超出后重连只能发送完整快照
+DEFAULT_LOG_SIZE = 100
+
+
+class TopicLog:
+    """带序号的主题消息日志
+
+    Args:
+        history: 保留的消息数
+    """
+
+    def __init__(self, history: int = DEFAULT_LOG_SIZE) -> None:
+        self.seq = 0
+        self._frames: Deque[Tuple[int, str]] = deque(maxlen=history)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def next_seq(self) -> int:
+        """下一条消息的序号"""
+        return self.seq + 1
+
+    def append(self, frame: str) -> int:
+        """记录一条已序列化的消息（消息中应包含 next_seq），返回其序号"""
+        self.seq += 1
+        self._frames.append((self.seq, frame))
+        return self.seq
+
+    def since(self, seq: int) -> Optional[List[str]]:
+        """某序号之后的全部消息；日志中已无法补齐时返回 None"""
+        if seq > self.seq or seq < 0:
+            return None
+        if seq == self.seq:
+            return []
+        if not self._frames or self._frames[0][0] > seq + 1:
+            return None
+        return [frame for s, frame in self._frames if s > seq]
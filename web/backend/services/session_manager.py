@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 import uuid
 import logging
 
+from src.utils.io_executor import io_executor
+
 from .game_service import GameService
 
 logger = logging.getLogger(__name__)
@@ -118,7 +120,7 @@ class SessionManager:
                 await self._cleanup_expired_sessions()
 
             # 创建新的游戏服务并加载存档
-            game_service = GameService.load_from_file(str(relative))
+            game_service = await io_executor.run(GameService.load_from_file, str(relative))
             await game_service.initialize()
 
             game_id = game_service.game_state.game_id
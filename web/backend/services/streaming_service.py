@@ -1,16 +1,19 @@
 """
 WebSocket流式推送服务
-实现实时消息推送、断线重连、心跳检测等功能
+所有WebSocket连接的统一入口：实现实时消息推送、按游戏划分的主题广播、
+按序号断线续传、心跳检测等功能
 """
 import asyncio
 import json
 import logging
-from typing import Dict, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any
 from datetime import datetime
-from collections import deque
 from fastapi import WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
+from .broadcaster import Broadcaster, encode_message
+from .message_log import DEFAULT_LOG_SIZE, TopicLog
+
 logger = logging.getLogger(__name__)
 
 
@@ -35,24 +38,35 @@ class Message(BaseModel):
 
 
 class StreamingService:
-    """流式推送服务"""
+    """流式推送服务（连接中心）
+    
+    直接发给某个客户端的消息使用该客户端自己的序号；主题消息（游戏更新）
+    使用主题日志中的序号，每条消息只序列化一次，所有订阅者收到相同的文本。
+    客户端重连时带上收到的最后一个主题序号，通过 resume 只补发缺失的消息。
+    """
     
     def __init__(self):
         # 活跃连接管理
         self.active_connections: Dict[str, ConnectionInfo] = {}
         # WebSocket实例映射
         self.websockets: Dict[str, WebSocket] = {}
-        # 消息队列（每个客户端一个队列）
-        self.message_queues: Dict[str, deque] = {}
-        # 消息序号计数器
+        # 消息序号计数器（直接发送的消息）
         self.sequence_counters: Dict[str, int] = {}
         # 心跳检测任务
         self.heartbeat_tasks: Dict[str, asyncio.Task] = {}
+        # 主题订阅：主题（游戏ID）-> 客户端ID集合
+        self.topics: Dict[str, Set[str]] = {}
+        self.client_topics: Dict[str, Set[str]] = {}
+        # 主题消息日志：主题 -> 带序号的消息，用于断线续传
+        self.topic_logs: Dict[str, TopicLog] = {}
         # 配置
         self.heartbeat_interval = 30  # 心跳间隔（秒）
         self.heartbeat_timeout = 60   # 心跳超时（秒）
         self.max_queue_size = 100     # 最大队列长度
         self.reconnect_window = 300   # 重连窗口（秒）
+        self.log_size = DEFAULT_LOG_SIZE  # 每个主题保留的消息数
+        # 发送队列：每个连接独立排队，消息数据只序列化一次
+        self.broadcaster = Broadcaster(max_queue=self.max_queue_size)
         
     async def connect(self, websocket: WebSocket, client_id: str) -> None:
         """
@@ -73,11 +87,9 @@ class StreamingService:
             websocket=websocket
         )
         self.websockets[client_id] = websocket
+        self.broadcaster.add(client_id, websocket)
         
-        # 初始化消息队列
-        if client_id not in self.message_queues:
-            self.message_queues[client_id] = deque(maxlen=self.max_queue_size)
-            self.sequence_counters[client_id] = 0
+        self.sequence_counters[client_id] = 0
         
         # 启动心跳检测
         if client_id in self.heartbeat_tasks:
@@ -115,29 +127,12 @@ class StreamingService:
             del self.active_connections[client_id]
         if client_id in self.websockets:
             del self.websockets[client_id]
-            
-        # 保留消息队列一段时间，以支持重连
-        asyncio.create_task(self._cleanup_queue_later(client_id))
+        await self.broadcaster.remove(client_id)
+        self.unsubscribe(client_id)
+        self.sequence_counters.pop(client_id, None)
         
         logger.info(f"Client {client_id} disconnected")
         
-    async def _cleanup_queue_later(self, client_id: str) -> None:
-        """
-        延迟清理消息队列（支持重连）
-        
-        Args:
-            client_id: 客户端ID
-        """
-        await asyncio.sleep(self.reconnect_window)
-        
-        # 如果客户端没有重连，清理队列
-        if client_id not in self.active_connections:
-            if client_id in self.message_queues:
-                del self.message_queues[client_id]
-            if client_id in self.sequence_counters:
-                del self.sequence_counters[client_id]
-            logger.info(f"Cleaned up queue for {client_id}")
-            
     async def send_message(self, client_id: str, message_data: Dict[str, Any]) -> bool:
         """
         发送消息给特定客户端
@@ -150,43 +145,194 @@ class StreamingService:
             是否发送成功
         """
         if client_id not in self.websockets:
-            # 客户端未连接，加入队列
-            if client_id in self.message_queues:
-                self.message_queues[client_id].append(message_data)
             return False
-            
-        websocket = self.websockets[client_id]
-        
-        # 生成消息
-        self.sequence_counters[client_id] += 1
-        message = Message(
-            id=f"{client_id}_{self.sequence_counters[client_id]}",
-            type=message_data.get("type", "unknown"),
-            data=message_data.get("data", {}),
-            timestamp=datetime.now(),
-            sequence=self.sequence_counters[client_id]
-        )
         
-        try:
-            await websocket.send_json(message.dict())
-            return True
-        except Exception as e:
-            logger.error(f"Failed to send message to {client_id}: {e}")
-            # 发送失败，加入队列
-            self.message_queues[client_id].append(message_data)
-            return False
+        data_json = encode_message(message_data.get("data", {}))
+        return self._enqueue(client_id, message_data, data_json)
+    
+    def _envelope(self, client_id: str, msg_type: str, data_json: str) -> str:
+        """为已序列化的数据加上该客户端的消息序号，不重复序列化数据本身"""
+        self.sequence_counters[client_id] = self.sequence_counters.get(client_id, 0) + 1
+        sequence = self.sequence_counters[client_id]
+        head = encode_message({
+            "id": f"{client_id}_{sequence}",
+            "type": msg_type,
+            "timestamp": datetime.now().isoformat(),
+            "sequence": sequence,
+        })
+        return f'{head[:-1]},"data":{data_json}}}'
+    
+    def _enqueue(self, client_id: str, message_data: Dict[str, Any], data_json: str) -> bool:
+        payload = self._envelope(client_id, message_data.get("type", "unknown"), data_json)
+        return self.broadcaster.send(client_id, payload)
             
     async def broadcast(self, message_data: Dict[str, Any]) -> None:
         """
         广播消息给所有连接的客户端
         
+        消息数据只序列化一次，各客户端只拼接自己的消息序号。
+        
         Args:
             message_data: 消息数据
         """
-        tasks = []
+        data_json = encode_message(message_data.get("data", {}))
         for client_id in list(self.active_connections.keys()):
-            tasks.append(self.send_message(client_id, message_data))
-        await asyncio.gather(*tasks, return_exceptions=True)
+            if client_id in self.websockets:
+                self._enqueue(client_id, message_data, data_json)
+    
+    # ========== 主题 ==========
+    
+    def subscribe(self, client_id: str, topic: str) -> None:
+        """客户端订阅主题（通常是游戏ID），主题的消息日志从第一次订阅开始记录"""
+        if topic not in self.topic_logs:
+            self.topic_logs[topic] = TopicLog(self.log_size)
+        self.topics.setdefault(topic, set()).add(client_id)
+        self.client_topics.setdefault(client_id, set()).add(topic)
+        
+    def unsubscribe(self, client_id: str, topic: Optional[str] = None) -> None:
+        """取消订阅，topic 为 None 时取消该客户端的全部订阅"""
+        topics = self.client_topics.get(client_id, set())
+        for name in [topic] if topic is not None else list(topics):
+            topics.discard(name)
+            subscribers = self.topics.get(name)
+            if subscribers is not None:
+                subscribers.discard(client_id)
+                if not subscribers:
+                    del self.topics[name]
+        if not topics:
+            self.client_topics.pop(client_id, None)
+            
+    def subscribers(self, topic: str) -> Set[str]:
+        """主题当前的订阅者"""
+        return self.topics.get(topic, set())
+    
+    def is_open(self, topic: str) -> bool:
+        """主题是否在记录消息（有过订阅者且尚未关闭）"""
+        return topic in self.topic_logs
+    
+    def topic_seq(self, topic: str) -> int:
+        """主题最后一条消息的序号"""
+        log = self.topic_logs.get(topic)
+        return log.seq if log is not None else 0
+    
+    async def publish(self, topic: str, message_data: Dict[str, Any]) -> int:
+        """
+        向主题发送消息：记录到主题日志并放入所有订阅者的发送队列
+        
+        消息只序列化一次，所有订阅者收到相同的文本（序号为主题序号），
+        暂时没有订阅者时也会记录，供重连的客户端补发。
+        
+        Args:
+            topic: 主题
+            message_data: 消息数据
+            
+        Returns:
+            成功放入发送队列的客户端数
+        """
+        log = self.topic_logs.get(topic)
+        if log is None:
+            return 0
+        seq = log.next_seq
+        head = encode_message({
+            "id": f"{topic}_{seq}",
+            "type": message_data.get("type", "unknown"),
+            "timestamp": datetime.now().isoformat(),
+            "topic": topic,
+            "sequence": seq,
+        })
+        frame = f'{head[:-1]},"data":{encode_message(message_data.get("data", {}))}}}'
+        log.append(frame)
+        delivered = 0
+        for client_id in list(self.topics.get(topic, ())):
+            delivered += self.broadcaster.send(client_id, frame)
+        return delivered
+    
+    def _resume_frames(self, client_id: str, topic: str, from_seq: int) -> Optional[List[str]]:
+        log = self.topic_logs.get(topic)
+        writer = self.broadcaster.writers.get(client_id)
+        if log is None or writer is None:
+            return None
+        frames = log.since(from_seq)
+        # 缺口超过发送队列的剩余容量时，发送快照比逐条补发更便宜
+        if frames is None or len(frames) > writer.queue.maxsize - writer.depth:
+            return None
+        return frames
+    
+    def can_resume(self, client_id: str, topic: str, from_seq: int) -> bool:
+        """能否只补发 from_seq 之后的主题消息"""
+        return self._resume_frames(client_id, topic, from_seq) is not None
+    
+    def resume(self, client_id: str, topic: str, from_seq: int) -> bool:
+        """
+        补发客户端在 from_seq 之后错过的主题消息
+        
+        Args:
+            client_id: 客户端ID
+            topic: 主题
+            from_seq: 客户端已收到的最后一个主题序号
+            
+        Returns:
+            是否已补发；返回 False 时调用方应发送完整快照
+        """
+        frames = self._resume_frames(client_id, topic, from_seq)
+        if frames is None:
+            return False
+        for frame in frames:
+            self.broadcaster.send(client_id, frame)
+        logger.info(f"Resumed {client_id} on {topic} from seq {from_seq}: {len(frames)} messages")
+        return True
+    
+    async def publish_transient(self, topic: str, message_data: Dict[str, Any]) -> int:
+        """
+        向主题的订阅者发送不记录到日志的消息（如逐字输出的增量）
+        
+        增量消息数量多、过时快，不占用主题日志和序号；对应的完整结果
+        会作为普通主题消息发布，断线重连的客户端从日志中得到完整结果。
+        
+        Returns:
+            成功放入发送队列的客户端数
+        """
+        subscribers = self.topics.get(topic)
+        if not subscribers:
+            return 0
+        frame = encode_message({
+            "type": message_data.get("type", "unknown"),
+            "timestamp": datetime.now().isoformat(),
+            "data": message_data.get("data", {}),
+        })
+        return sum(self.broadcaster.send(client_id, frame) for client_id in list(subscribers))
+    
+    async def close_topic(self, topic: str) -> None:
+        """断开主题的全部订阅者（游戏结束或被清理时）"""
+        for client_id in list(self.topics.get(topic, ())):
+            websocket = self.websockets.get(client_id)
+            await self.disconnect(client_id)
+            if websocket is not None:
+                try:
+                    await websocket.close()
+                except Exception:
+                    pass
+        self.topics.pop(topic, None)
+        self.topic_logs.pop(topic, None)
+    
+    def get_metrics(self, topic: Optional[str] = None) -> Dict[str, Any]:
+        """连接数和发送队列深度等指标，可只统计某个主题的订阅者"""
+        metrics = self.broadcaster.metrics()
+        if topic is not None:
+            clients = self.topics.get(topic, set())
+            per_connection = {
+                cid: m for cid, m in metrics["per_connection"].items() if cid in clients
+            }
+            return {
+                "connections": len(per_connection),
+                "total_depth": sum(m["depth"] for m in per_connection.values()),
+                "max_depth": max((m["max_depth"] for m in per_connection.values()), default=0),
+                "dropped": sum(m["dropped"] for m in per_connection.values()),
+                "per_connection": per_connection,
+            }
+        metrics["topics"] = {name: len(clients) for name, clients in self.topics.items()}
+        metrics["logged_messages"] = sum(len(log) for log in self.topic_logs.values())
+        return metrics
         
     async def send_stream(self, client_id: str, data_generator) -> None:
         """
@@ -207,8 +353,6 @@ class StreamingService:
                     "is_final": False
                 }
             })
-            # 控制发送速率
-            await asyncio.sleep(0.05)
             
         # 发送结束标记
         await self.send_message(client_id, {
@@ -265,10 +409,6 @@ class StreamingService:
                 # 更新心跳时间
                 if client_id in self.active_connections:
                     self.active_connections[client_id].last_ping = datetime.now()
-                    
-            elif msg_type == "reconnect":
-                # 处理重连，发送队列中的消息
-                await self._handle_reconnect(client_id)
                 
             else:
                 # 其他消息类型，交给业务处理
@@ -278,22 +418,6 @@ class StreamingService:
             logger.error(f"Invalid JSON from {client_id}: {message}")
         except Exception as e:
             logger.error(f"Error handling message from {client_id}: {e}")
-            
-    async def _handle_reconnect(self, client_id: str) -> None:
-        """
-        处理客户端重连
-        
-        Args:
-            client_id: 客户端ID
-        """
-        if client_id in self.message_queues:
-            # 发送队列中的消息
-            queue = self.message_queues[client_id]
-            while queue:
-                message_data = queue.popleft()
-                await self.send_message(client_id, message_data)
-                
-            logger.info(f"Sent {len(queue)} queued messages to {client_id}")
 
 
 # 全局流式服务实例
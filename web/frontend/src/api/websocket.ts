@@ -16,6 +16,7 @@ class WebSocketClient implements WebSocketManager {
   private handlers: Map<string, Set<(data: any) => void>> = new Map()
   private reconnectTimer: number | null = null
   private pingTimer: number | null = null
+  private lastSeq: number | null = null  // 已收到的最后一个主题序号，重连时用于续传
   private _isConnected = ref(false)
   
   get isConnected() {
@@ -30,11 +31,15 @@ class WebSocketClient implements WebSocketManager {
       this.disconnect()
     }
     
+    if (this.gameId !== gameId) {
+      this.lastSeq = null
+    }
     this.gameId = gameId
     
     return new Promise((resolve, reject) => {
       const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:'
-      const wsUrl = `${protocol}//${window.location.host}/ws/${gameId}`
+      const resume = this.lastSeq !== null ? `?from_seq=${this.lastSeq}` : ''
+      const wsUrl = `${protocol}//${window.location.host}/ws/${gameId}${resume}`
       
       this.ws = new WebSocket(wsUrl)
       
@@ -86,11 +91,12 @@ class WebSocketClient implements WebSocketManager {
     }
     
     this.gameId = null
+    this.lastSeq = null
     this._isConnected.value = false
     this.handlers.clear()
   }
   
-  send(type: string, data?: any): void {
+  send(type: string, data?: any, extra?: Record<string, any>): void {
     if (!this.ws || this.ws.readyState !== WebSocket.OPEN) {
       console.error('WebSocket is not connected')
       return
@@ -99,6 +105,7 @@ class WebSocketClient implements WebSocketManager {
     const message = {
       type,
       data,
+      ...extra,
       timestamp: new Date().toISOString()
     }
     
@@ -122,12 +129,25 @@ class WebSocketClient implements WebSocketManager {
     }
   }
   
-  private handleMessage(message: GameUpdate): void {
-    const handlers = this.handlers.get(message.update_type)
+  private handleMessage(message: any): void {
+    // 游戏更新由服务端连接中心包装为 { type: 'game_update', sequence, data: GameUpdate }
+    const update: GameUpdate = message.type === 'game_update' ? message.data : message
+    if (message.topic) {
+      // 主题消息序号连续递增：跳过重复的，发现缺口时请求补发
+      if (this.lastSeq !== null && message.sequence <= this.lastSeq) return
+      if (this.lastSeq !== null && message.sequence > this.lastSeq + 1) {
+        this.send('resume', undefined, { from_seq: this.lastSeq })
+        return
+      }
+      this.lastSeq = message.sequence
+    } else if (update?.update_type === 'snapshot') {
+      this.lastSeq = update.data.seq ?? this.lastSeq
+    }
+    const handlers = this.handlers.get(update.update_type)
     if (handlers) {
       handlers.forEach(handler => {
         try {
-          handler(message.data)
+          handler(update.data)
         } catch (e) {
           console.error('Error in WebSocket handler:', e)
         }